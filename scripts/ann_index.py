@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbour index (HNSW) over chunk embeddings of the converted documents.
+
+Each policy and guide in VECTOR_JSON / VECTOR_GUIDES_JSON is split into chunks of a few
+paragraphs, embedded, and inserted into a Hierarchical Navigable Small World graph.
+Vectors are stored as int8 with one float32 scale per vector (about a quarter of the
+float32 size) in memory-mapped .npy files, together with the base-layer adjacency:
+
+    ANN_Index/vectors.npy     int8   [capacity, dimensions]
+    ANN_Index/scales.npy      float32[capacity]
+    ANN_Index/neighbors.npy   int32  [capacity, 2 * M]   (-1 = empty slot)
+    ANN_Index/meta.json       upper layers, chunk table, document hashes
+
+`sync` is incremental: chunks of documents whose text changed or that were removed are
+deleted (tombstoned), new chunks are inserted, and unchanged documents are not
+re-embedded. `benchmark` compares recall@k and latency against an exact float32 scan.
+
+    python scripts/ann_index.py sync --local
+    python scripts/ann_index.py search "how do I add a quick note" --local
+    python scripts/ann_index.py benchmark --local
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import heapq
+import random
+import hashlib
+import zlib
+import argparse
+
+import numpy as np
+
+import jsonl_io
+import answer_snippets
+import dedupe_documents
+
+# Paths
+INDEX_DIR = "ANN_Index"
+SOURCE_DIRS = {"Policy": "VECTOR_JSON", "Guide": "VECTOR_GUIDES_JSON"}
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+
+# HNSW parameters
+M = 16
+EF_CONSTRUCTION = 100
+EF_SEARCH = 64
+INITIAL_CAPACITY = 1024
+
+# Chunking: consecutive paragraphs up to this many characters
+CHUNK_CHARS = 800
+
+# A chunk also ends after any paragraph whose hash is divisible by this, so chunk
+# boundaries depend on content and an edit only reshapes the chunks around it
+CHUNK_CUT_EVERY = 8
+
+# Rebuild from scratch once this share of nodes are tombstones
+COMPACT_RATIO = 0.3
+
+# Offline embedding size (the OpenAI model's size comes from its responses)
+LOCAL_DIMENSIONS = 512
+
+def chunk_text(text, limit=CHUNK_CHARS):
+    """Split text into (start, end) spans of whole paragraphs up to `limit` characters"""
+    chunks = []
+    start = end = None
+    for match in re.finditer(r"[^\n]+", text):
+        if not match.group().strip():
+            continue
+        if start is not None and match.end() - start > limit:
+            chunks.append((start, end))
+            start = None
+        if start is None:
+            start = match.start()
+        end = match.end()
+        if zlib.crc32(match.group().encode("utf-8")) % CHUNK_CUT_EVERY == 0:
+            chunks.append((start, end))
+            start = None
+    if start is not None:
+        chunks.append((start, end))
+    return chunks
+
+def iter_corpus():
+    """Yield (document key, text) for every converted policy and guide, except known duplicates"""
+    for document_type, directory in SOURCE_DIRS.items():
+        if not os.path.isdir(directory):
+            continue
+        # The index builders leave these out too (see dedupe_documents.py)
+        duplicates = dedupe_documents.load_skip_list(document_type.lower())
+        for json_file, raw, _path in jsonl_io.iter_raw_documents(directory):
+            if json_file in duplicates:
+                continue
+            fields = jsonl_io.project_fields(raw, ("full_text", "sections"))
+            text = answer_snippets.source_text(fields)
+            if text.strip():
+                yield f"{document_type}/{json_file}", text
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _open_array(path, dtype, shape, fill=0):
+    """Create a zero- (or `fill`-) initialised .npy file and return it memory-mapped"""
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    array[:] = fill
+    return array
+
+class HNSWIndex:
+    """HNSW graph over int8-quantised, unit-length vectors; similarity is the dot product"""
+
+    def __init__(self, directory=INDEX_DIR, dimensions=None, embedder_name=None, m=M,
+                 ef_construction=EF_CONSTRUCTION):
+        self.directory = directory
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+            # JSON keys are strings; upper-layer adjacency is keyed by node then level
+            self.upper = {int(node): {int(level): links for level, links in levels.items()}
+                          for node, levels in self.meta.pop("upper").items()}
+            mode = "r+"
+        else:
+            if dimensions is None:
+                raise ValueError(f"No index in {directory}; dimensions are needed to create one")
+            self.meta = {
+                "dimensions": dimensions, "embedder": embedder_name, "m": m,
+                "ef_construction": ef_construction, "count": 0, "entry_point": None,
+                "max_level": -1, "levels": [], "nodes": [], "deleted": 0, "documents": {}
+            }
+            self.upper = {}
+            mode = None
+
+        self.m = self.meta["m"]
+        self.m0 = 2 * self.m
+        self.level_factor = 1 / math.log(self.m)
+        self.random = random.Random(len(self.meta["nodes"]))
+        self._open(mode)
+
+    # Storage
+
+    def _paths(self):
+        return {name: os.path.join(self.directory, f"{name}.npy") for name in ("vectors", "scales", "neighbors")}
+
+    def _open(self, mode):
+        paths = self._paths()
+        if mode:
+            self.vectors = np.load(paths["vectors"], mmap_mode=mode)
+            self.scales = np.load(paths["scales"], mmap_mode=mode)
+            self.neighbors = np.load(paths["neighbors"], mmap_mode=mode)
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        dimensions = self.meta["dimensions"]
+        self.vectors = _open_array(paths["vectors"], np.int8, (INITIAL_CAPACITY, dimensions))
+        self.scales = _open_array(paths["scales"], np.float32, (INITIAL_CAPACITY,))
+        self.neighbors = _open_array(paths["neighbors"], np.int32, (INITIAL_CAPACITY, self.m0), fill=-1)
+
+    def _grow(self):
+        """Double the capacity of the memory-mapped arrays"""
+        capacity = len(self.scales) * 2
+        paths = self._paths()
+        grown = {}
+        for name, old in (("vectors", self.vectors), ("scales", self.scales), ("neighbors", self.neighbors)):
+            temp_path = paths[name] + ".tmp.npy"
+            array = _open_array(temp_path, old.dtype, (capacity,) + old.shape[1:], fill=-1 if name == "neighbors" else 0)
+            array[:len(old)] = old
+            array.flush()
+            grown[name] = (temp_path, array)
+        del self.vectors, self.scales, self.neighbors
+        for name, (temp_path, _array) in grown.items():
+            os.replace(temp_path, paths[name])
+        self._open("r+")
+
+    def save(self):
+        """Flush the arrays and write the metadata"""
+        for array in (self.vectors, self.scales, self.neighbors):
+            array.flush()
+        meta = dict(self.meta, upper={str(node): {str(level): links for level, links in levels.items()}
+                                      for node, levels in self.upper.items()})
+        meta_path = os.path.join(self.directory, "meta.json")
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def bytes_per_vector(self):
+        """Stored bytes per vector, excluding the graph"""
+        return self.vectors.shape[1] * self.vectors.itemsize + self.scales.itemsize
+
+    # Distances
+
+    def _similarities(self, query, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        return (self.vectors[nodes].astype(np.float32) @ query) * self.scales[nodes]
+
+    def _vector(self, node):
+        return self.vectors[node].astype(np.float32) * self.scales[node]
+
+    def _links(self, node, level):
+        if level == 0:
+            row = self.neighbors[node]
+            return row[row >= 0].tolist()
+        return self.upper.get(node, {}).get(level, [])
+
+    def _set_links(self, node, level, links):
+        if level == 0:
+            self.neighbors[node, :] = -1
+            self.neighbors[node, :len(links)] = links
+        else:
+            self.upper.setdefault(node, {})[level] = links
+
+    def _search_layer(self, query, entry_points, ef, level):
+        """Best-first search of one layer; returns [(similarity, node)] best first"""
+        visited = set(entry_points)
+        similarities = self._similarities(query, entry_points)
+        candidates = [(-s, n) for s, n in zip(similarities.tolist(), entry_points)]
+        heapq.heapify(candidates)
+        results = [(s, n) for s, n in zip(similarities.tolist(), entry_points)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative, node = heapq.heappop(candidates)
+            if -negative < results[0][0] and len(results) >= ef:
+                break
+            fresh = [n for n in self._links(node, level) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for similarity, neighbor in zip(self._similarities(query, fresh).tolist(), fresh):
+                if len(results) < ef or similarity > results[0][0]:
+                    heapq.heappush(candidates, (-similarity, neighbor))
+                    heapq.heappush(results, (similarity, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _select(self, candidates, limit):
+        """HNSW neighbour-selection heuristic: prefer candidates that are not already covered"""
+        selected, skipped = [], []
+        for similarity, node in candidates:
+            if len(selected) >= limit:
+                break
+            if selected and (self._similarities(self._vector(node), selected) > similarity).any():
+                skipped.append(node)
+            else:
+                selected.append(node)
+        # Keep the degree up with the closest skipped candidates
+        selected.extend(skipped[:limit - len(selected)])
+        return selected
+
+    # Updates
+
+    def insert(self, vector, payload):
+        """Quantise and insert a unit vector; `payload` is stored in the chunk table"""
+        vector = np.asarray(vector, dtype=np.float32)
+        node = self.meta["count"]
+        if node >= len(self.scales):
+            self._grow()
+
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        self.vectors[node] = np.clip(np.round(vector / scale), -127, 127).astype(np.int8)
+        self.scales[node] = scale
+        query = self._vector(node)
+
+        level = int(-math.log(1.0 - self.random.random()) * self.level_factor)
+        self.meta["count"] += 1
+        self.meta["levels"].append(level)
+        self.meta["nodes"].append(payload)
+
+        entry = self.meta["entry_point"]
+        if entry is None:
+            self.meta["entry_point"], self.meta["max_level"] = node, level
+            return node
+
+        entry_points = [entry]
+        for current in range(self.meta["max_level"], level, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, current)[0][1]]
+
+        for current in range(min(level, self.meta["max_level"]), -1, -1):
+            found = self._search_layer(query, entry_points, self.meta["ef_construction"], current)
+            limit = self.m0 if current == 0 else self.m
+            links = self._select(found, self.m)
+            self._set_links(node, current, links)
+            for neighbor in links:
+                neighbor_links = self._links(neighbor, current) + [node]
+                if len(neighbor_links) > limit:
+                    base = self._vector(neighbor)
+                    scored = sorted(zip(self._similarities(base, neighbor_links).tolist(), neighbor_links), reverse=True)
+                    neighbor_links = self._select(scored, limit)
+                self._set_links(neighbor, current, neighbor_links)
+            entry_points = [n for _, n in found]
+
+        if level > self.meta["max_level"]:
+            self.meta["entry_point"], self.meta["max_level"] = node, level
+        return node
+
+    def delete(self, node):
+        """Tombstone a node: it still routes searches but is never returned"""
+        if self.meta["nodes"][node] is not None:
+            self.meta["nodes"][node] = None
+            self.meta["deleted"] += 1
+
+    def live_nodes(self):
+        return [node for node, payload in enumerate(self.meta["nodes"]) if payload is not None]
+
+    def search(self, query, k=10, ef=EF_SEARCH):
+        """Return [(similarity, node)] for the k nearest live nodes"""
+        entry = self.meta["entry_point"]
+        if entry is None:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        entry_points = [entry]
+        for level in range(self.meta["max_level"], 0, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, level)[0][1]]
+        found = self._search_layer(query, entry_points, max(ef, k), 0)
+        return [(s, n) for s, n in found if self.meta["nodes"][n] is not None][:k]
+
+def embed_chunks(embedder, texts, batch_size=100):
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embedder.embed(texts[start:start + batch_size]))
+    return vectors
+
+def get_embedder(local):
+    import query_cache
+    if local:
+        return query_cache.LocalEmbedder(LOCAL_DIMENSIONS)
+    import openai_client
+    return query_cache.OpenAIEmbedder(openai_client.get_client())
+
+def compact(index, embedder_name, directory):
+    """Rebuild the graph from the live nodes, dropping tombstones"""
+    live = index.live_nodes()
+    vectors = [index._vector(node) for node in live]
+    payloads = [index.meta["nodes"][node] for node in live]
+    documents = {key: {"hash": value["hash"], "nodes": []} for key, value in index.meta["documents"].items()}
+
+    temp_dir = directory + ".compact"
+    if os.path.isdir(temp_dir):
+        for name in os.listdir(temp_dir):
+            os.remove(os.path.join(temp_dir, name))
+    rebuilt = HNSWIndex(temp_dir, index.meta["dimensions"], embedder_name, index.m, index.meta["ef_construction"])
+    for vector, payload in zip(vectors, payloads):
+        documents[payload[0]]["nodes"].append(rebuilt.insert(vector / np.linalg.norm(vector), payload))
+    rebuilt.meta["documents"] = documents
+    rebuilt.save()
+    del rebuilt, index
+
+    for name in os.listdir(temp_dir):
+        os.replace(os.path.join(temp_dir, name), os.path.join(directory, name))
+    os.rmdir(temp_dir)
+    return HNSWIndex(directory)
+
+def sync_index(directory, embedder, rebuild=False):
+    """Bring the index in line with the converted documents; returns (inserted, deleted) chunk counts"""
+    if rebuild and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+    corpus = dict(iter_corpus())
+    index = HNSWIndex(directory) if os.path.exists(os.path.join(directory, "meta.json")) else None
+    if index is not None and index.meta["embedder"] != embedder.name:
+        raise ValueError(f"Index was built with {index.meta['embedder']}; rerun with --rebuild to switch embedders")
+
+    documents = index.meta["documents"] if index else {}
+    changed = [key for key, text in corpus.items() if documents.get(key, {}).get("hash") != text_hash(text)]
+    removed = [key for key in documents if key not in corpus]
+
+    # Chunks whose text survives an edit keep their vectors instead of being re-embedded
+    reusable = {}
+    deleted = 0
+    for key in removed + [key for key in changed if key in documents]:
+        for node in documents.pop(key)["nodes"]:
+            payload = index.meta["nodes"][node]
+            if key in corpus and payload and len(payload) > 3:
+                vector = index._vector(node)
+                reusable.setdefault(key, {})[payload[3]] = vector / (np.linalg.norm(vector) or 1.0)
+            index.delete(node)
+            deleted += 1
+
+    inserted = reused = 0
+    for key in changed:
+        text = corpus[key]
+        spans = chunk_text(text)
+        hashes = [text_hash(text[start:end]) for start, end in spans]
+        previous = reusable.get(key, {})
+        missing = [i for i, chunk_hash in enumerate(hashes) if chunk_hash not in previous]
+        embedded = dict(zip(missing, embed_chunks(embedder, [text[spans[i][0]:spans[i][1]] for i in missing])))
+        vectors = [embedded[i] if i in embedded else previous[hashes[i]] for i in range(len(spans))]
+        if not vectors:
+            continue
+        if index is None:
+            index = HNSWIndex(directory, len(vectors[0]), embedder.name)
+            documents = index.meta["documents"]
+        nodes = [index.insert(vector, [key, start, end, chunk_hash])
+                 for vector, (start, end), chunk_hash in zip(vectors, spans, hashes)]
+        documents[key] = {"hash": text_hash(text), "nodes": nodes}
+        inserted += len(nodes)
+        reused += len(nodes) - len(missing)
+        print(f"Indexed {key}: {len(nodes)} chunks ({len(missing)} embedded)")
+    if reused:
+        print(f"Reused vectors for {reused} unchanged chunks")
+
+    if index is None:
+        return 0, 0
+    index.save()
+    if index.meta["count"] and index.meta["deleted"] / index.meta["count"] > COMPACT_RATIO:
+        print("Compacting index to drop deleted chunks...")
+        compact(index, embedder.name, directory)
+    return inserted, deleted
+
+def load_chunk_text(payload):
+    """Read the text of a chunk from its converted document"""
+    key, start, end = payload[:3]
+    document_type, json_file = key.split("/", 1)
+    with open(os.path.join(SOURCE_DIRS[document_type], json_file), 'r', encoding='utf-8') as f:
+        return answer_snippets.source_text(json.load(f))[start:end]
+
+def percentile(sorted_values, fraction):
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank] if sorted_values else 0.0
+
+def benchmark(index, embedder, k=10, ef_values=(16, 32, 64, 128), query_limit=200):
+    """Compare ANN search over int8 vectors with an exact float32 scan of the same chunks"""
+    live = index.live_nodes()
+    print(f"Re-embedding {len(live)} chunks at full precision for the exact baseline...")
+    texts = [load_chunk_text(index.meta["nodes"][node]) for node in live]
+    exact_vectors = np.asarray(embed_chunks(embedder, texts), dtype=np.float32)
+
+    with open(COMBINED_INDEX_FILE, 'r', encoding='utf-8') as f:
+        questions = [q for entry in json.load(f).get("MHA Documents", []) for q in entry.get("Questions Answered", [])]
+    questions = questions[:query_limit]
+    queries = np.asarray(embed_chunks(embedder, questions), dtype=np.float32)
+
+    exact_latencies, truth = [], []
+    for query in queries:
+        started = time.perf_counter()
+        scores = exact_vectors @ query
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        exact_latencies.append(time.perf_counter() - started)
+        truth.append({live[i] for i in top})
+
+    report = {
+        "chunks": len(live), "queries": len(queries), "k": k,
+        "bytes_per_vector": {"float32": exact_vectors.shape[1] * 4, "int8": index.bytes_per_vector()},
+        "exact": {"p50_ms": round(percentile(sorted(exact_latencies), 0.5) * 1000, 3),
+                  "p95_ms": round(percentile(sorted(exact_latencies), 0.95) * 1000, 3)},
+        "hnsw": []
+    }
+    for ef in ef_values:
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            found = {node for _, node in index.search(query, k, ef)}
+            latencies.append(time.perf_counter() - started)
+            hits += len(found & expected)
+        latencies.sort()
+        report["hnsw"].append({
+            "ef": ef, f"recall@{k}": round(hits / (len(truth) * k), 4),
+            "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3)
+        })
+    return report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HNSW index over document chunk embeddings")
+    parser.add_argument("command", choices=("sync", "search", "benchmark"))
+    parser.add_argument("query", nargs="?", help="Query text for search")
+    parser.add_argument("--dir", default=INDEX_DIR, help="Index directory (default: %(default)s)")
+    parser.add_argument("--local", action="store_true", help="Use the offline n-gram embedder instead of OpenAI")
+    parser.add_argument("--rebuild", action="store_true", help="With sync: rebuild the index from scratch")
+    parser.add_argument("-k", type=int, default=10, help="Results to return (default: %(default)s)")
+    parser.add_argument("--ef", type=int, default=EF_SEARCH, help="Search beam width (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    try:
+        embedder = get_embedder(args.local)
+    except Exception as e:
+        print(f"Failed to initialize embedder: {e}")
+        sys.exit(1)
+
+    if args.command == "sync":
+        inserted, deleted = sync_index(args.dir, embedder, args.rebuild)
+        print(f"Sync complete. Inserted {inserted} chunks, deleted {deleted}.")
+        return
+
+    if not os.path.exists(os.path.join(args.dir, "meta.json")):
+        print(f"Error: No index in {args.dir}; run sync first")
+        sys.exit(1)
+    index = HNSWIndex(args.dir)
+    if index.meta["embedder"] != embedder.name:
+        print(f"Error: Index was built with {index.meta['embedder']}, not {embedder.name}")
+        sys.exit(1)
+
+    if args.command == "search":
+        if not args.query:
+            print("Error: search needs a query")
+            sys.exit(1)
+        query = embedder.embed([args.query])[0]
+        for similarity, node in index.search(query, args.k, args.ef):
+            key, start, end = index.meta["nodes"][node][:3]
+            print(f"{similarity:.3f}  {key} [{start}:{end}]")
+        return
+
+    print(json.dumps(benchmark(index, embedder, args.k), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Locate the passage in each source document that answers its "Questions Answered".
+
+For every question, the document's full_text (or its sections, when there is no full
+text) is split into candidate passages of one to a few consecutive paragraphs, and the
+passage sharing the most rare terms with the question is chosen. Its character offsets
+are stored on the index entry as "Answer Snippets", so a matched question can return a
+cited snippet without a retrieval or LLM round trip:
+
+    "Answer Snippets": [
+        {"Question": "...", "Start": 1520, "End": 1874}
+    ]
+
+The index builders and the AI question scripts call this module; it can also be run on
+its own to (re)align the existing indexes, spreading documents across processes:
+
+    python scripts/answer_snippets.py --workers 4
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import jsonl_io
+
+# Index files and where their source JSON lives; policy entries name .txt files
+INDEXES = {
+    "policy": ("Policy_Documents_Metadata_Index.json", "Policy Documents", "VECTOR_JSON"),
+    "guide": ("Guide_Documents_Metadata_Index.json", "Guide Documents", "VECTOR_GUIDES_JSON"),
+}
+
+# Candidate passages are up to this many consecutive paragraphs and characters
+MAX_PASSAGE_PARAGRAPHS = 3
+MAX_PASSAGE_CHARS = 800
+
+MAX_WORKERS = os.cpu_count() or 1
+
+# Documents queued per worker process while streaming
+IN_FLIGHT_PER_WORKER = 4
+
+# Common words that carry no signal when matching a question to a passage
+STOPWORDS = {
+    "a", "about", "after", "all", "an", "and", "any", "are", "as", "at", "be", "before", "by",
+    "can", "do", "does", "for", "from", "how", "i", "if", "in", "into", "is", "it", "its", "mha",
+    "must", "my", "of", "on", "or", "should", "that", "the", "their", "there", "these", "this",
+    "to", "used", "using", "was", "were", "what", "when", "where", "which", "who", "why", "will",
+    "with", "within", "you", "your"
+}
+
+def source_text(document_json):
+    """The text the offsets refer to: full_text, or the sections joined by blank lines"""
+    if document_json.get("full_text"):
+        return document_json["full_text"]
+    sections = document_json.get("sections")
+    if isinstance(sections, dict):
+        return "\n\n".join(text for text in sections.values() if text)
+    return ""
+
+def tokenize(text):
+    """Lower-cased content words, with a crude plural strip so 'checks' matches 'check'"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [w[:-1] if len(w) > 3 and w.endswith("s") else w for w in words if w not in STOPWORDS]
+
+def split_passages(text):
+    """Return (start, end) spans of one to MAX_PASSAGE_PARAGRAPHS consecutive paragraphs"""
+    paragraphs = [(m.start(), m.end()) for m in re.finditer(r"[^\n]+", text) if m.group().strip()]
+    passages = []
+    for i, (start, _) in enumerate(paragraphs):
+        for end_index in range(i, min(i + MAX_PASSAGE_PARAGRAPHS, len(paragraphs))):
+            end = paragraphs[end_index][1]
+            if end - start > MAX_PASSAGE_CHARS and end_index > i:
+                break
+            passages.append((start, end))
+    return passages
+
+def align_questions(questions, text):
+    """Return one {"Question", "Start", "End"} snippet per question that can be located in text"""
+    passages = split_passages(text)
+    if not passages:
+        return []
+
+    passage_terms = [set(tokenize(text[start:end])) for start, end in passages]
+    document_frequency = {}
+    for terms in passage_terms:
+        for term in terms:
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+    total = len(passages)
+
+    snippets = []
+    for question in questions:
+        query = set(tokenize(question))
+        best_score, best_span = 0.0, None
+        for (start, end), terms in zip(passages, passage_terms):
+            shared = query & terms
+            if not shared:
+                continue
+            score = sum(math.log(1 + total / document_frequency[t]) for t in shared)
+            # Prefer the shorter passage when adding paragraphs does not add matches
+            score -= (end - start) / (MAX_PASSAGE_CHARS * 100)
+            if score > best_score:
+                best_score, best_span = score, (start, end)
+        if best_span:
+            snippets.append({"Question": question, "Start": best_span[0], "End": best_span[1]})
+    return snippets
+
+def attach_snippets(entry, document_json):
+    """Align an index entry's questions against its source document in place"""
+    entry["Answer Snippets"] = align_questions(entry.get("Questions Answered", []), source_text(document_json))
+    return entry
+
+def snippet_text(document_json, snippet):
+    """Return the passage a stored snippet points at"""
+    return source_text(document_json)[snippet["Start"]:snippet["End"]]
+
+def load_source(source):
+    """Return a source document given as a dict, a JSON file path or raw JSON text"""
+    if isinstance(source, dict):
+        return source
+    if source.lstrip().startswith("{"):
+        return json.loads(source)
+    with open(source, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _align_job(job):
+    questions, source = job
+    return align_questions(questions, source_text(load_source(source)))
+
+def _collect(entry, future):
+    try:
+        entry["Answer Snippets"] = future.result()
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not align snippets for {entry.get('File')}: {e}")
+    return entry
+
+def align_entries(pairs, workers=MAX_WORKERS):
+    """Yield entries with Answer Snippets from (entry, source) pairs, in order.
+
+    A source is a loaded document, a JSON file path or raw JSON text; paths and text are
+    parsed in the worker processes. Only a few documents per worker are in flight at
+    once, so memory stays flat however many documents are streamed through.
+    """
+    if workers <= 1:
+        for entry, source in pairs:
+            try:
+                attach_snippets(entry, load_source(source))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not align snippets for {entry.get('File')}: {e}")
+            yield entry
+        return
+
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for entry, source in pairs:
+            in_flight.append((entry, executor.submit(_align_job, (entry.get("Questions Answered", []), source))))
+            if len(in_flight) >= workers * IN_FLIGHT_PER_WORKER:
+                yield _collect(*in_flight.popleft())
+        while in_flight:
+            yield _collect(*in_flight.popleft())
+
+def source_path(entry, input_dir):
+    """Converted JSON for an index entry (policy entries name the .txt export)"""
+    file_name = entry.get("File", "")
+    if file_name.endswith(".txt"):
+        file_name = file_name[:-4] + ".json"
+    return os.path.join(input_dir, file_name)
+
+def align_index(kind, workers=MAX_WORKERS):
+    """Add Answer Snippets to an existing index file in place"""
+    index_file, key, input_dir = INDEXES[kind]
+    if not os.path.exists(index_file):
+        print(f"SKIPPING: {index_file} not found")
+        return 0
+    pairs = [(entry, source_path(entry, input_dir)) for entry in jsonl_io.read_index_entries(index_file, key)]
+    count = jsonl_io.write_index_entries(index_file, key, align_entries(pairs, workers))
+    print(f"Aligned answer snippets for {count} entries in {index_file}")
+    return count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Store answer-snippet offsets for each indexed question")
+    parser.add_argument("--kind", choices=("policy", "guide", "all"), default="all",
+                        help="Which index to align (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Worker processes for alignment (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    kinds = list(INDEXES) if args.kind == "all" else [args.kind]
+    if not any(os.path.exists(INDEXES[kind][0]) for kind in kinds):
+        print("Error: No index files found; run the index builders first")
+        sys.exit(1)
+    for kind in kinds:
+        align_index(kind, args.workers)
+
+if __name__ == "__main__":
+    main()
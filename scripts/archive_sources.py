@@ -0,0 +1,148 @@
+"""
+Read DOCX sources straight out of zipped exports.
+
+The converters accept a .zip export (SharePoint or a plain zip of the raw folders) in
+place of their input directory. Each DOCX member is decompressed into memory and handed
+to python-docx as a file object, so nothing is unpacked to disk. Members are read ahead on
+a thread pool (zlib releases the GIL while inflating) while the converter parses the
+previous ones.
+
+When the archive has a folder named like the converter's input directory ("raw policies",
+"raw_guides"), only the DOCX files under it are converted; otherwise every DOCX member is.
+
+Every member's CRC-32 and size are recorded in Archive_Members.json after it converts, so
+a later run over a newer export converts only the members whose CRC changed:
+
+    {"policy": {"HR7.4 Annual Leave Holiday Arrangements Policy.docx": {"CRC": "5d1e07a2", "Size": 48213}}}
+"""
+
+import io
+import os
+import json
+import zipfile
+import posixpath
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+import doc_catalog
+
+# Paths
+ARCHIVE_STATE_FILE = "Archive_Members.json"
+
+# Threads reading members; up to twice as many members are held in memory ahead of the parser
+READ_WORKERS = 4
+
+def is_archive(path):
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+def is_docx_member(info):
+    name = posixpath.basename(info.filename)
+    return (not info.is_dir() and name.lower().endswith(".docx") and not name.startswith(("~$", "._"))
+            and not info.filename.startswith("__MACOSX/"))
+
+def load_state(path=ARCHIVE_STATE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_state(state, path=ARCHIVE_STATE_FILE):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=4, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def member_key(info):
+    return {"CRC": f"{info.CRC:08x}", "Size": info.file_size}
+
+class ArchiveSource:
+    """The DOCX members of one zip export for one converter kind ("policy" or "guide")"""
+
+    def __init__(self, path, kind, folder=None, state_path=ARCHIVE_STATE_FILE):
+        self.path = path
+        self.kind = kind
+        self.state_path = state_path
+        with zipfile.ZipFile(path) as archive:
+            members = [info for info in archive.infolist() if is_docx_member(info)]
+        if folder:
+            in_folder = [info for info in members if folder in info.filename.split("/")[:-1]]
+            members = in_folder or members
+        self.members = members
+        self.by_name = {posixpath.basename(info.filename): info for info in members}
+        self.state = load_state(state_path)
+        self.seen = self.state.setdefault(kind, {})
+
+    def changed(self, output_dir):
+        """Members whose CRC or size differ from the last conversion, or whose JSON is missing"""
+        changed = []
+        for info in self.members:
+            name = posixpath.basename(info.filename)
+            output_file = os.path.join(output_dir, os.path.splitext(name)[0] + ".json")
+            if self.seen.get(name) != member_key(info) or not os.path.exists(output_file):
+                changed.append(info)
+        return changed
+
+    def documents(self, members, workers=READ_WORKERS):
+        """Yield (member name, in-memory DOCX file) in archive order, reading ahead on threads"""
+        members = iter(members)
+        with zipfile.ZipFile(self.path) as archive, ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = collections.deque()
+
+            def submit():
+                info = next(members, None)
+                if info is not None:
+                    pending.append((info, pool.submit(archive.read, info)))
+
+            for _ in range(2 * workers):
+                submit()
+            while pending:
+                info, future = pending.popleft()
+                submit()
+                try:
+                    data = future.result()
+                except (zipfile.BadZipFile, OSError) as e:
+                    print(f"Error reading {info.filename} from {self.path}: {e}")
+                    continue
+                yield info.filename, io.BytesIO(data)
+
+    def mark_converted(self, filename):
+        """Record the CRC of the member a converted record came from"""
+        info = self.by_name.get(filename)
+        if info is not None:
+            self.seen[filename] = member_key(info)
+
+    def track(self, records):
+        """Pass converted records through, recording each one's member CRC"""
+        for record in records:
+            self.mark_converted(record["filename"])
+            yield record
+
+    def save(self):
+        save_state(self.state, self.state_path)
+
+def list_documents(input_path, kind, output_dir, folder=None, force=False, workers=READ_WORKERS):
+    """Return (change tracker, (file path, source) pairs, count) for a converter's input.
+
+    A zip export yields its changed members as in-memory files, tracked by CRC in
+    Archive_Members.json. A directory yields the paths of its changed DOCX files with no
+    source, tracked by document properties in the doc_catalog file. `force` yields every
+    document. The tracker's mark_converted/track and save record what was converted.
+    """
+    if is_archive(input_path):
+        archive = ArchiveSource(input_path, kind, folder)
+        members = archive.members if force else archive.changed(output_dir)
+        print(f"Found {len(archive.members)} DOCX members in {input_path}, "
+              f"{len(archive.members) - len(members)} unchanged since the last conversion.")
+        return archive, archive.documents(members, workers), len(members)
+
+    docx_files = []
+    for file in os.listdir(input_path):
+        file_path = os.path.join(input_path, file)
+        if file.endswith('.docx') and os.path.isfile(file_path):
+            docx_files.append(file_path)
+    catalog = doc_catalog.CatalogSource(input_path, kind)
+    changed = docx_files if force else catalog.changed(output_dir, docx_files)
+    if len(changed) < len(docx_files):
+        print(f"Skipping {len(docx_files) - len(changed)} DOCX files unchanged since the last conversion.")
+    return catalog, ((file_path, None) for file_path in changed), len(changed)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Prefix autocomplete over document titles, policy IDs and indexed questions.
+
+combine_indexes.py regenerates MHA_Documents_Autocomplete.bin from the combined index.
+Every "Document" title, policy ID (HR4.13, CP05...) and "Questions Answered" string is a
+suggestion with a stored weight (IDs and titles rank above questions). The suggestions are
+inserted into a path-compressed byte trie whose nodes each keep their best TOP_K_STORED
+suggestions, so a lookup walks the typed prefix once and reads a precomputed list; its cost
+depends on the prefix length, not on how many questions are indexed.
+
+The trie is written in the shared_index segment format (flat arrays behind a JSON header)
+and memory-mapped read-only, so loading it is instant and processes share its pages:
+
+    python scripts/autocomplete.py "how to create a t"
+    python scripts/autocomplete.py "HR4." -k 5
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+import numpy as np
+
+import jsonl_io
+import shared_index
+
+# Paths
+AUTOCOMPLETE_FILE = "MHA_Documents_Autocomplete.bin"
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+
+# Suggestions kept at each trie node, i.e. the largest useful k
+TOP_K_STORED = 10
+
+# Suggestion kinds and their base weights
+KIND_WEIGHTS = {"id": 3.0, "title": 2.0, "question": 1.0}
+KINDS = list(KIND_WEIGHTS)
+
+# Policy ID at the start of a policy file name, as convert_to_json.extract_policy_info reads it
+# (HR4.13, CP008a, HR6.7a), in any case
+POLICY_ID = re.compile(r"^([A-Z]+\d+(?:\.\d+)?[a-z]*)\s", re.IGNORECASE)
+
+def normalise(text):
+    """Lower-case and collapse whitespace; keys and typed prefixes are compared this way"""
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+def collect_suggestions(entries):
+    """Return [(key, text, kind, weight, entry position)] for the combined index entries"""
+    suggestions = []
+    for position, entry in enumerate(entries):
+        title = (entry.get("Document") or "").strip()
+        if title:
+            suggestions.append((normalise(title), title, "title", KIND_WEIGHTS["title"], position))
+        id_match = POLICY_ID.match(entry.get("File") or "") if entry.get("Document Type") == "Policy" else None
+        if id_match:
+            label = f"{id_match.group(1)} {title}".strip()
+            suggestions.append((normalise(id_match.group(1)), label, "id", KIND_WEIGHTS["id"], position))
+        for question in entry.get("Questions Answered", []):
+            suggestions.append((normalise(question), question, "question", KIND_WEIGHTS["question"], position))
+    return [s for s in suggestions if s[0]]
+
+def build_trie(suggestions):
+    """Build the path-compressed trie; returns the node arrays and the top-suggestion array"""
+    # Rank once: heavier first, then shorter, then alphabetical
+    order = sorted(range(len(suggestions)),
+                   key=lambda i: (-suggestions[i][3], len(suggestions[i][1]), suggestions[i][1]))
+    rank = {suggestion_id: r for r, suggestion_id in enumerate(order)}
+
+    # Plain byte trie of dicts: {byte: child}, with terminal suggestion ids under None
+    root = {}
+    for suggestion_id, suggestion in enumerate(suggestions):
+        node = root
+        for byte in suggestion[0].encode("utf-8"):
+            node = node.setdefault(byte, {})
+        node.setdefault(None, []).append(suggestion_id)
+
+    # Compress single-child chains without terminals into one labelled edge
+    def compress(node):
+        children = []
+        for byte in sorted(b for b in node if b is not None):
+            label, child = bytes([byte]), node[byte]
+            while None not in child and len(child) == 1:
+                (next_byte, next_child), = child.items()
+                label += bytes([next_byte])
+                child = next_child
+            children.append((label, compress(child)))
+        return {"terminals": node.get(None, []), "children": children}
+
+    tree = compress(root)
+
+    # Best suggestions per node, bottom-up
+    def rank_tops(node):
+        candidates = list(node["terminals"])
+        for _label, child in node["children"]:
+            candidates.extend(rank_tops(child))
+        node["top"] = sorted(candidates, key=rank.__getitem__)[:TOP_K_STORED]
+        return node["top"]
+
+    rank_tops(tree)
+
+    # Breadth-first layout so each node's children are contiguous and sorted by first byte
+    labels, label_starts, label_lengths = bytearray(), [], []
+    first_children, child_counts, first_bytes = [], [], []
+    top_starts, top_counts, tops = [], [], []
+    queue = [(b"", tree)]
+    head = 0
+    while head < len(queue):
+        label, node = queue[head]
+        head += 1
+        label_starts.append(len(labels))
+        label_lengths.append(len(label))
+        labels += label
+        first_bytes.append(label[0] if label else 0)
+        first_children.append(len(queue))
+        child_counts.append(len(node["children"]))
+        queue.extend(node["children"])
+        top_starts.append(len(tops))
+        top_counts.append(len(node["top"]))
+        tops.extend(node["top"])
+
+    return {
+        "labels": bytes(labels),
+        "label_starts": np.asarray(label_starts, dtype=np.int64),
+        "label_lengths": np.asarray(label_lengths, dtype=np.int32),
+        "first_bytes": np.asarray(first_bytes, dtype=np.uint8),
+        "first_children": np.asarray(first_children, dtype=np.int32),
+        "child_counts": np.asarray(child_counts, dtype=np.int32),
+        "top_starts": np.asarray(top_starts, dtype=np.int64),
+        "top_counts": np.asarray(top_counts, dtype=np.int8),
+        "tops": np.asarray(tops, dtype=np.int32),
+    }
+
+def build_autocomplete(entries, path=AUTOCOMPLETE_FILE):
+    """Write the autocomplete file for the combined index entries; returns the suggestion count"""
+    entries = list(entries)
+    suggestions = collect_suggestions(entries)
+    sections = build_trie(suggestions)
+    sections["text_offsets"], sections["texts"] = shared_index.pack_strings(s[1] for s in suggestions)
+    sections["file_offsets"], sections["files"] = shared_index.pack_strings(e.get("File") or "" for e in entries)
+    sections["kinds"] = np.asarray([KINDS.index(s[2]) for s in suggestions], dtype=np.uint8)
+    sections["weights"] = np.asarray([s[3] for s in suggestions], dtype=np.float32)
+    sections["suggestion_entries"] = np.asarray([s[4] for s in suggestions], dtype=np.int32)
+
+    temp_path = f"{path}.tmp"
+    shared_index.write_segment(temp_path, sections, {"suggestions": len(suggestions), "top_k": TOP_K_STORED})
+    os.replace(temp_path, path)
+    return len(suggestions)
+
+class Autocomplete:
+    """Memory-mapped autocomplete file; suggest() returns the top-k completions of a prefix"""
+
+    def __init__(self, path=AUTOCOMPLETE_FILE):
+        self.buffer, self.header, self.sections = shared_index.map_segment(path)
+
+    def _string(self, offsets_name, blob_name, i):
+        offsets = self.sections[offsets_name]
+        return bytes(self.sections[blob_name][offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def _label(self, node):
+        start = self.sections["label_starts"][node]
+        return bytes(self.sections["labels"][start:start + self.sections["label_lengths"][node]])
+
+    def find_node(self, prefix):
+        """Node whose subtree holds every key starting with `prefix`, or None"""
+        key = normalise(prefix).encode("utf-8")
+        # Keep a trailing space the user typed: "how to " should not match "how tos"
+        if prefix[-1:].isspace() and key:
+            key += b" "
+        node, position = 0, 0
+        first_bytes = self.sections["first_bytes"]
+        while position < len(key):
+            start = self.sections["first_children"][node]
+            end = start + self.sections["child_counts"][node]
+            child = start + int(np.searchsorted(first_bytes[start:end], key[position]))
+            if child >= end or first_bytes[child] != key[position]:
+                return None
+            label = self._label(child)
+            remaining = key[position:position + len(label)]
+            if not label.startswith(remaining):
+                return None
+            position += len(label)
+            node = child
+        return node
+
+    def suggest(self, prefix, k=TOP_K_STORED):
+        """Return up to k suggestions as {"text", "kind", "weight", "File"}, best first"""
+        node = self.find_node(prefix) if prefix.strip() else None
+        if node is None:
+            return []
+        start = self.sections["top_starts"][node]
+        suggestion_ids = self.sections["tops"][start:start + min(k, int(self.sections["top_counts"][node]))]
+        results = []
+        for suggestion_id in suggestion_ids.tolist():
+            results.append({
+                "text": self._string("text_offsets", "texts", suggestion_id),
+                "kind": KINDS[self.sections["kinds"][suggestion_id]],
+                "weight": float(self.sections["weights"][suggestion_id]),
+                "File": self._string("file_offsets", "files", int(self.sections["suggestion_entries"][suggestion_id]))
+            })
+        return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Autocomplete titles, policy IDs and indexed questions")
+    parser.add_argument("prefixes", nargs="*", help="Typed prefixes to complete")
+    parser.add_argument("--file", default=AUTOCOMPLETE_FILE, help="Autocomplete file (default: %(default)s)")
+    parser.add_argument("--index", default=COMBINED_INDEX_FILE,
+                        help="Combined index, used with --rebuild (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the file from the combined index first")
+    parser.add_argument("-k", type=int, default=8, help="Suggestions per prefix (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.rebuild:
+        count = build_autocomplete(jsonl_io.read_index_entries(args.index, "MHA Documents"), args.file)
+        print(f"Wrote {count} suggestions to {args.file}")
+
+    try:
+        autocomplete = Autocomplete(args.file)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}; run combine_indexes.py first")
+        sys.exit(1)
+
+    for prefix in args.prefixes:
+        started = time.perf_counter()
+        suggestions = autocomplete.suggest(prefix, args.k)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{prefix!r} ({elapsed_ms:.2f} ms)")
+        for suggestion in suggestions:
+            print(f"  [{suggestion['kind']}] {suggestion['text']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Script to build Policy_Cross_References.json, a link graph of which policies refer to which.
+
+Policies often reference each other by code ("see HR7.3", "refer to CP002b"). The known
+policy IDs (as extracted by extract_policy_info during conversion) are compiled into an
+Aho-Corasick automaton, and each converted policy's text is scanned once to find every
+known ID it mentions. The result is stored as a forward (references) and backward
+(referenced by) adjacency list over integer node numbers.
+
+Query a policy's links with:
+
+    python scripts/build_cross_references.py --query HR7.3
+"""
+
+import sys
+import json
+import argparse
+from collections import deque
+from datetime import datetime
+
+import jsonl_io
+
+# Paths
+INPUT_DIR = "VECTOR_JSON"
+OUTPUT_FILE = "Policy_Cross_References.json"
+
+def build_automaton(patterns):
+    """Compile patterns into Aho-Corasick goto/fail/output tables"""
+    goto = [{}]
+    fail = [0]
+    output = [[]]
+
+    # Build the trie of patterns
+    for pattern_index, pattern in enumerate(patterns):
+        node = 0
+        for ch in pattern:
+            child = goto[node].get(ch)
+            if child is None:
+                child = len(goto)
+                goto[node][ch] = child
+                goto.append({})
+                fail.append(0)
+                output.append([])
+            node = child
+        output[node].append(pattern_index)
+
+    # Breadth-first pass to fill in failure links
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for ch, child in goto[node].items():
+            queue.append(child)
+            fallback = fail[node]
+            while fallback and ch not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[child] = goto[fallback].get(ch, 0) if node else 0
+            output[child] = output[child] + output[fail[child]]
+
+    return goto, fail, output
+
+def find_matches(automaton, text):
+    """Yield (pattern index, end offset) for every pattern occurrence in text"""
+    goto, fail, output = automaton
+    node = 0
+    for position, ch in enumerate(text):
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        for pattern_index in output[node]:
+            yield pattern_index, position
+
+def is_code_boundary(text, start, end):
+    """Reject matches that are part of a longer code, e.g. HR4.1 inside HR4.13 or CP002 inside CP002b"""
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    if end + 1 < len(text):
+        following = text[end + 1]
+        if following.isalnum():
+            return False
+        # "HR4.1.2" continues the code, but "see HR4.1. Next" does not
+        if following == "." and end + 2 < len(text) and text[end + 2].isdigit():
+            return False
+    return True
+
+def document_text(policy_json):
+    """Text to scan for references: the full text, or the sections if it is missing"""
+    if policy_json.get("full_text"):
+        return policy_json["full_text"]
+    return "\n".join(policy_json.get("sections", {}).values())
+
+def build_cross_references(input_dir=INPUT_DIR):
+    """Scan every converted policy once and return the compact link graph"""
+    # Load the known policy IDs; the text itself is streamed in a second pass
+    nodes = []
+    files = []
+    for json_file, policy_json in jsonl_io.iter_documents(input_dir):
+        policy_id = policy_json.get("id")
+        if not policy_id or policy_id == "unknown" or policy_id in nodes:
+            continue
+        nodes.append(policy_id)
+        files.append(json_file)
+
+    node_numbers = {policy_id: number for number, policy_id in enumerate(nodes)}
+    automaton = build_automaton(nodes)
+    forward = [set() for _ in nodes]
+
+    for json_file, policy_json in jsonl_io.iter_documents(input_dir):
+        source = node_numbers.get(policy_json.get("id"))
+        if source is None or files[source] != json_file:
+            continue
+        text = document_text(policy_json)
+        for target, end in find_matches(automaton, text):
+            start = end - len(nodes[target]) + 1
+            if target != source and is_code_boundary(text, start, end):
+                forward[source].add(target)
+
+    backward = [[] for _ in nodes]
+    for source, targets in enumerate(forward):
+        for target in targets:
+            backward[target].append(source)
+
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "nodes": nodes,
+        "files": files,
+        "forward": [sorted(targets) for targets in forward],
+        "backward": [sorted(sources) for sources in backward]
+    }
+
+class CrossReferenceGraph:
+    """O(1) lookups over a saved cross-reference file"""
+
+    def __init__(self, data):
+        self.nodes = data["nodes"]
+        self.files = data["files"]
+        self.numbers = {policy_id: number for number, policy_id in enumerate(self.nodes)}
+        self.forward = data["forward"]
+        self.backward = data["backward"]
+
+    def references(self, policy_id):
+        """Policies that `policy_id` refers to"""
+        number = self.numbers.get(policy_id)
+        return [self.nodes[n] for n in self.forward[number]] if number is not None else []
+
+    def referenced_by(self, policy_id):
+        """Policies that refer to `policy_id`, i.e. those affected when it changes"""
+        number = self.numbers.get(policy_id)
+        return [self.nodes[n] for n in self.backward[number]] if number is not None else []
+
+    def related(self, policy_id):
+        """Policies linked in either direction"""
+        return sorted(set(self.references(policy_id)) | set(self.referenced_by(policy_id)))
+
+    def file_for(self, policy_id):
+        number = self.numbers.get(policy_id)
+        return self.files[number] if number is not None else None
+
+def load_cross_references(path=OUTPUT_FILE):
+    """Load the saved cross-reference graph"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return CrossReferenceGraph(json.load(f))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build or query the policy cross-reference graph")
+    parser.add_argument("--input", default=INPUT_DIR,
+                        help="Directory of converted policy JSON or a JSONL stream (default: %(default)s)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Graph file (default: %(default)s)")
+    parser.add_argument("--query", metavar="POLICY_ID", help="Print the links for one policy instead of building")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.query:
+        graph = load_cross_references(args.output)
+        if args.query not in graph.numbers:
+            print(f"Unknown policy ID: {args.query}")
+            sys.exit(1)
+        print(f"{args.query} ({graph.file_for(args.query)})")
+        print(f"  References:    {', '.join(graph.references(args.query)) or '-'}")
+        print(f"  Referenced by: {', '.join(graph.referenced_by(args.query)) or '-'}")
+        return
+
+    print(f"Building cross-references from {args.input}...")
+    graph = build_cross_references(args.input)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(graph, f, ensure_ascii=False, separators=(",", ":"))
+
+    link_count = sum(len(targets) for targets in graph["forward"])
+    print(f"Cross-reference build complete. {len(graph['nodes'])} policies, {link_count} links written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,14 @@ import os
 import json
 import re
 import shutil
+import argparse
 from datetime import datetime
 from collections import defaultdict
 
+import jsonl_io
+import answer_snippets
+import dedupe_documents
+
 # Paths
 INPUT_DIR = "VECTOR_JSON"
 OUTPUT_FILE = "Policy_Documents_Metadata_Index.json"
@@ -77,29 +82,61 @@ def generate_questions(policy_id, title):
     questions = [template.format(topic=topic) for template in templates]
     return questions
 
-def generate_description(policy_json):
+class PolicyRecord:
+    """The few fields of a converted policy the index needs, without its full text"""
+    
+    __slots__ = ("id", "title", "purpose", "summary", "full_text_head")
+    
+    # Dotted paths decoded from the policy JSON; everything else is skipped
+    FIELDS = ("id", "title", "sections.purpose", "sections.summary")
+    
+    def __init__(self, values):
+        self.id = values.get("id", "unknown")
+        self.title = values.get("title", "")
+        self.purpose = values.get("sections.purpose")
+        self.summary = values.get("sections.summary")
+        self.full_text_head = (values.get("full_text") or "")[:200]
+    
+    @classmethod
+    def from_text(cls, text):
+        """Project a record from raw policy JSON, decoding full_text only if no section can describe it"""
+        values = jsonl_io.project_fields(text, cls.FIELDS)
+        if not values.get("sections.purpose") and not values.get("sections.summary"):
+            values.update(jsonl_io.project_fields(text, ("full_text",)))
+        return cls(values)
+    
+    @classmethod
+    def from_json(cls, policy_json):
+        """Build a record from an already loaded policy JSON"""
+        sections = policy_json.get("sections")
+        sections = sections if isinstance(sections, dict) else {}
+        values = {key: policy_json[key] for key in ("id", "title", "full_text") if key in policy_json}
+        values.update({f"sections.{key}": sections[key] for key in ("purpose", "summary") if key in sections})
+        return cls(values)
+
+def generate_description(policy):
     """Generate a description based on the policy content"""
     description = ""
     
     # Try to use the purpose section if available
-    if policy_json.get("sections", {}).get("purpose"):
-        description = policy_json["sections"]["purpose"]
+    if policy.purpose:
+        description = policy.purpose
         # Truncate if too long
         if len(description) > 200:
             description = description[:197] + "..."
     
     # Fallback to summary if purpose not available
-    elif policy_json.get("sections", {}).get("summary"):
-        description = policy_json["sections"]["summary"]
+    elif policy.summary:
+        description = policy.summary
         if len(description) > 200:
             description = description[:197] + "..."
     
     # Last resort: use the first 200 characters of full text
-    elif policy_json.get("full_text"):
-        description = policy_json["full_text"][:197] + "..."
+    elif policy.full_text_head:
+        description = policy.full_text_head[:197] + "..."
     
     if not description:
-        description = f"Guidelines for {policy_json.get('title', 'policy implementation')}."
+        description = f"Guidelines for {policy.title or 'policy implementation'}."
     
     return description
 
@@ -138,8 +175,74 @@ def load_existing_index():
     
     return existing_data, existing_lookup
 
+def build_entry(json_file, policy, existing_lookup):
+    """Build the index entry for one converted policy record, reusing an existing entry where possible"""
+    # Extract basic info
+    policy_id = policy.id
+    title = policy.title
+    
+    # Create output txt filename (for consistency with existing index)
+    txt_filename = json_file.replace('.json', '.txt')
+    
+    # Check if this policy already exists in the index
+    if txt_filename in existing_lookup:
+        # Use existing entry but ensure it has all required fields
+        entry = existing_lookup[txt_filename]
+        if "Document" not in entry:
+            entry["Document"] = title
+        if "Description" not in entry:
+            entry["Description"] = generate_description(policy)
+        if "Questions Answered" not in entry:
+            entry["Questions Answered"] = generate_questions(policy_id, title)
+    else:
+        # Create new entry
+        entry = {
+            "Document": title,
+            "File": txt_filename,
+            "Description": generate_description(policy),
+            "Questions Answered": generate_questions(policy_id, title)
+        }
+    
+    return entry
+
+def build_entries(documents, existing_lookup, duplicates=None):
+    """Yield (index entry, source) pairs, one per converted policy.
+
+    `documents` yields (json filename, raw JSON text, path) as from jsonl_io.iter_raw_documents;
+    the source is the file path, or the raw text for JSONL input, for answer-snippet alignment.
+    Files listed in `duplicates` (duplicate -> kept version) are skipped.
+    """
+    duplicates = duplicates or {}
+    for json_file, text, path in documents:
+        if json_file in duplicates:
+            print(f"SKIPPING duplicate: {json_file} (keeping {duplicates[json_file]})")
+            continue
+        try:
+            entry = build_entry(json_file, PolicyRecord.from_text(text), existing_lookup)
+            print(f"Processed: {json_file}")
+            yield entry, path or text
+        except Exception as e:
+            print(f"Error processing {json_file}: {str(e)}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--input", default=INPUT_DIR,
+                        help="Directory of converted JSON files or a JSONL stream of converted policies (default: %(default)s)")
+    parser.add_argument("--jsonl", metavar="PATH",
+                        help="Also write index entries to a JSONL file (.jsonl or .jsonl.zst)")
+    parser.add_argument("--workers", type=int, default=answer_snippets.MAX_WORKERS,
+                        help="Worker processes for answer-snippet alignment (default: %(default)s)")
+    parser.add_argument("--include-duplicates", action="store_true",
+                        help="Index documents listed in Duplicate_Documents.json as well")
+    parser.add_argument("--no-snippets", action="store_true",
+                        help="Skip locating the answer passage for each question")
+    parser.add_argument("--no-extractive", action="store_true",
+                        help="Keep the template descriptions instead of extractive descriptions and keywords")
+    return parser.parse_args()
+
 def main():
-    print(f"Building policy index from JSON files in {INPUT_DIR}...")
+    args = parse_args()
+    print(f"Building policy index from {args.input}...")
     
     # Backup existing index before proceeding
     backup_existing_index()
@@ -147,63 +250,33 @@ def main():
     # Load existing index if available
     existing_data, existing_lookup = load_existing_index()
     
-    # Initialize new index
-    policy_documents = []
+    # Stream converted documents through the entry builder, decoding only the fields it needs
+    duplicates = {} if args.include_duplicates else dedupe_documents.load_skip_list("policy")
+    pairs = build_entries(jsonl_io.iter_raw_documents(args.input), existing_lookup, duplicates)
     
-    # Process each JSON file
-    json_files = [f for f in os.listdir(INPUT_DIR) if f.endswith('.json')]
-    print(f"Found {len(json_files)} JSON files to process.")
+    # Replace template descriptions with the most representative sentence and add keywords
+    if not args.no_extractive:
+        # Deferred import: the summariser pulls in numpy, which --no-extractive runs do not need
+        import extractive_summary
+        summaries = extractive_summary.summarise_source(args.input)
+        pairs = ((extractive_summary.annotate(entry, summaries), source) for entry, source in pairs)
     
-    for json_file in json_files:
-        file_path = os.path.join(INPUT_DIR, json_file)
-        
-        try:
-            # Load JSON data
-            with open(file_path, 'r', encoding='utf-8') as f:
-                policy_json = json.load(f)
-            
-            # Extract basic info
-            policy_id = policy_json.get("id", "unknown")
-            title = policy_json.get("title", "")
-            
-            # Create output txt filename (for consistency with existing index)
-            txt_filename = json_file.replace('.json', '.txt')
-            
-            # Check if this policy already exists in the index
-            if txt_filename in existing_lookup:
-                # Use existing entry but ensure it has all required fields
-                entry = existing_lookup[txt_filename]
-                if "Document" not in entry:
-                    entry["Document"] = title
-                if "Description" not in entry:
-                    entry["Description"] = generate_description(policy_json)
-                if "Questions Answered" not in entry:
-                    entry["Questions Answered"] = generate_questions(policy_id, title)
-            else:
-                # Create new entry
-                entry = {
-                    "Document": title,
-                    "File": txt_filename,
-                    "Description": generate_description(policy_json),
-                    "Questions Answered": generate_questions(policy_id, title)
-                }
-            
-            policy_documents.append(entry)
-            print(f"Processed: {json_file}")
-            
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
+    # Locate the supporting passage for each question, spread across worker processes
+    if args.no_snippets:
+        entries = (entry for entry, _ in pairs)
+    else:
+        entries = answer_snippets.align_entries(pairs, args.workers)
     
-    # Create final output
-    output_data = {
-        "Policy Documents": policy_documents
-    }
+    if args.jsonl:
+        # Write the JSONL stream first, then export the pretty index from it
+        jsonl_io.write_records(args.jsonl, entries)
+        print(f"Wrote JSONL index to {args.jsonl}")
+        entries = jsonl_io.read_records(args.jsonl)
     
     # Write to file
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=4, ensure_ascii=False)
+    count = jsonl_io.write_pretty_index(OUTPUT_FILE, "Policy Documents", entries)
     
-    print(f"\nIndex build complete. Created {OUTPUT_FILE} with {len(policy_documents)} policy entries.")
+    print(f"\nIndex build complete. Created {OUTPUT_FILE} with {count} policy entries.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
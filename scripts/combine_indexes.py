@@ -3,19 +3,120 @@
 import json
 import os
 import sys
+import argparse
+import itertools
+from datetime import datetime
 
-def combine_indexes():
+import jsonl_io
+import facets
+
+# Paths
+AUTOCOMPLETE_FILE = "MHA_Documents_Autocomplete.bin"
+
+def normalise_entry(doc, document_type):
+    """Ensure an entry's File ends with .json and it has a Document Type field"""
+    # Ensure file ends with .json
+    if "File" in doc:
+        # Replace .txt with .json if present
+        if doc["File"].endswith(".txt"):
+            doc["File"] = doc["File"].replace(".txt", ".json")
+        # Add .json if no extension
+        elif not doc["File"].endswith(".json"):
+            doc["File"] += ".json"
+    
+    # Add Document Type if not present
+    if "Document Type" not in doc:
+        doc["Document Type"] = document_type
+    
+    return doc
+
+def normalise_entries(entries, document_type, counts):
+    """Yield normalised entries, counting them by document type"""
+    for doc in entries:
+        counts[document_type] += 1
+        yield normalise_entry(doc, document_type)
+
+def entry_key(doc):
+    """Key combined index entries by File, falling back to the Document title"""
+    return doc.get("File") or doc.get("Document")
+
+def load_combined_map(path):
+    """Load the existing combined index as an ordered map keyed by File"""
+    combined = {}
+    if not os.path.exists(path):
+        return combined
+    try:
+        for doc in jsonl_io.read_index_entries(path, "MHA Documents"):
+            combined[entry_key(doc)] = doc
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Warning: Could not load existing combined index, rebuilding it: {e}")
+        combined = {}
+    return combined
+
+def merge_entries(combined, entries):
+    """
+    Apply inserts, updates and deletes from the source entries to the combined map in place.
+    Existing entries keep their position and new entries are appended.
+    Returns a change log of added, modified and removed Files.
+    """
+    changes = {"added": [], "modified": [], "removed": []}
+    seen = set()
+    
+    for doc in entries:
+        key = entry_key(doc)
+        seen.add(key)
+        current = combined.get(key)
+        if current is None:
+            combined[key] = doc
+            changes["added"].append(key)
+        elif current != doc:
+            combined[key] = doc
+            changes["modified"].append(key)
+    
+    # Anything no longer present in either source index has been deleted
+    for key in [key for key in combined if key not in seen]:
+        del combined[key]
+        changes["removed"].append(key)
+    
+    return changes
+
+def save_change_log(path, changes):
+    """Write the change log for downstream steps such as the vector store sync"""
+    change_log = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "added": changes["added"],
+        "modified": changes["modified"],
+        "removed": changes["removed"]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(change_log, f, indent=4, ensure_ascii=False)
+
+def combine_indexes(guide_index_path='Guide_Documents_Metadata_Index.json',
+                    policy_index_path='Policy_Documents_Metadata_Index.json',
+                    output_index_path='MHA_Documents_Metadata_Index.json',
+                    export_path=None,
+                    changes_path='MHA_Documents_Changes.json',
+                    facets_path=facets.FACETS_FILE,
+                    autocomplete_path=AUTOCOMPLETE_FILE):
     """
     Combines the Guide and Policy indexes into one MHA Documents index.
     Ensures all file extensions are .json and adds Document Type field.
+    
+    The existing combined index is loaded as a map keyed by File and only the
+    inserts, updates and deletes from the source indexes are applied. The output
+    is rewritten only when something changed, and the added/modified/removed
+    Files are written to changes_path.
+    
+    Any of the paths may be pretty JSON or JSONL (.jsonl / .jsonl.zst); source
+    entries are streamed one at a time. When the output is JSONL, export_path
+    optionally receives a pretty JSON copy.
+    
+    Facet bitsets (Document Type, policy prefix, guide family, audience) are
+    rebuilt alongside the index and written to facets_path, and the title /
+    policy ID / question autocomplete trie is written to autocomplete_path.
     """
     print("Starting index combination process...")
     
-    # Define file paths
-    guide_index_path = 'Guide_Documents_Metadata_Index.json'
-    policy_index_path = 'Policy_Documents_Metadata_Index.json'
-    output_index_path = 'MHA_Documents_Metadata_Index.json'
-    
     # Check if input files exist
     if not os.path.exists(guide_index_path):
         print(f"Error: {guide_index_path} not found")
@@ -25,70 +126,47 @@ def combine_indexes():
         print(f"Error: {policy_index_path} not found")
         sys.exit(1)
     
-    # Load guide index
-    with open(guide_index_path, 'r', encoding='utf-8') as f:
-        try:
-            guide_data = json.load(f)
-            print(f"Successfully loaded {guide_index_path}")
-        except json.JSONDecodeError as e:
-            print(f"Error loading {guide_index_path}: {e}")
-            sys.exit(1)
-    
-    # Load policy index
-    with open(policy_index_path, 'r', encoding='utf-8') as f:
-        try:
-            policy_data = json.load(f)
-            print(f"Successfully loaded {policy_index_path}")
-        except json.JSONDecodeError as e:
-            print(f"Error loading {policy_index_path}: {e}")
-            sys.exit(1)
-    
-    # Create combined structure
-    combined_data = {
-        "MHA Documents": []
-    }
+    # Stream guide documents first, then policy documents
+    counts = {"Guide": 0, "Policy": 0}
+    combined_entries = itertools.chain(
+        normalise_entries(jsonl_io.read_index_entries(guide_index_path, "Guide Documents"), "Guide", counts),
+        normalise_entries(jsonl_io.read_index_entries(policy_index_path, "Policy Documents"), "Policy", counts)
+    )
     
-    # Process guide documents
-    guide_count = 0
-    for doc in guide_data.get("Guide Documents", []):
-        # Ensure file ends with .json
-        if "File" in doc:
-            # Replace .txt with .json if present
-            if doc["File"].endswith(".txt"):
-                doc["File"] = doc["File"].replace(".txt", ".json")
-            # Add .json if no extension
-            elif not doc["File"].endswith(".json"):
-                doc["File"] += ".json"
-        
-        # Add Document Type if not present
-        if "Document Type" not in doc:
-            doc["Document Type"] = "Guide"
-        
-        combined_data["MHA Documents"].append(doc)
-        guide_count += 1
-    
-    # Process policy documents
-    policy_count = 0
-    for doc in policy_data.get("Policy Documents", []):
-        # Ensure file ends with .json
-        if "File" in doc:
-            # Replace .txt with .json if present
-            if doc["File"].endswith(".txt"):
-                doc["File"] = doc["File"].replace(".txt", ".json")
-            # Add .json if no extension
-            elif not doc["File"].endswith(".json"):
-                doc["File"] += ".json"
-        
-        # Add Document Type if not present
-        if "Document Type" not in doc:
-            doc["Document Type"] = "Policy"
-        
-        combined_data["MHA Documents"].append(doc)
-        policy_count += 1
+    # Merge the source entries into the existing combined index
+    combined = load_combined_map(output_index_path)
+    try:
+        changes = merge_entries(combined, combined_entries)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error loading source index: {e}")
+        sys.exit(1)
+    guide_count, policy_count = counts["Guide"], counts["Policy"]
+    
+    save_change_log(changes_path, changes)
+    print(f"Changes: {len(changes['added'])} added, {len(changes['modified'])} modified, "
+          f"{len(changes['removed'])} removed (written to {changes_path})")
+    
+    # Only rewrite the combined index when something changed
+    if any(changes.values()) or not os.path.exists(output_index_path):
+        jsonl_io.write_index_entries(output_index_path, "MHA Documents", combined.values())
+    else:
+        print(f"No changes; {output_index_path} left untouched")
+    
+    # Facet bits follow the combined index order, so rebuild them whenever it changes
+    if facets_path and (any(changes.values()) or not os.path.exists(facets_path)):
+        facet_files, facet_bits = facets.build_facets(combined.values())
+        facets.save_facets(facets_path, facet_files, facet_bits)
+        print(f"Facet bitsets for {len(facet_files)} documents written to {facets_path}")
     
-    # Save the combined index
-    with open(output_index_path, 'w', encoding='utf-8') as f:
-        json.dump(combined_data, f, indent=4, ensure_ascii=False)
+    if autocomplete_path and (any(changes.values()) or not os.path.exists(autocomplete_path)):
+        # Deferred import: the trie builder pulls in numpy, which runs that change nothing do not need
+        import autocomplete
+        suggestion_count = autocomplete.build_autocomplete(combined.values(), autocomplete_path)
+        print(f"Autocomplete with {suggestion_count} suggestions written to {autocomplete_path}")
+    
+    if export_path:
+        jsonl_io.write_pretty_index(export_path, "MHA Documents", combined.values())
+        print(f"Exported pretty JSON index to {export_path}")
     
     print(f"Combined index created successfully at {output_index_path}")
     print(f"Added {guide_count} guides and {policy_count} policies")
@@ -97,17 +175,15 @@ def combine_indexes():
     # Verify the output file
     print("Verifying output file...")
     try:
-        with open(output_index_path, 'r', encoding='utf-8') as f:
-            verification_data = json.load(f)
+        # Stream the entries back, collecting only the problem cases
+        missing_json = []
+        missing_type = []
+        for doc in jsonl_io.read_index_entries(output_index_path, "MHA Documents"):
+            if "File" in doc and not doc["File"].endswith(".json"):
+                missing_json.append(doc["File"])
+            if "Document Type" not in doc:
+                missing_type.append(doc.get("Document"))
             
-        # Check for missing .json extensions
-        missing_json = [doc["File"] for doc in verification_data["MHA Documents"] 
-                        if "File" in doc and not doc["File"].endswith(".json")]
-        
-        # Check for missing Document Type
-        missing_type = [doc["Document"] for doc in verification_data["MHA Documents"] 
-                        if "Document Type" not in doc]
-        
         if missing_json:
             print(f"Warning: {len(missing_json)} files still don't have .json extension")
             for file in missing_json[:5]:  # Show first 5 examples
@@ -132,5 +208,25 @@ def combine_indexes():
     except Exception as e:
         print(f"Error during verification: {e}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Combine the guide and policy indexes into the MHA Documents index")
+    parser.add_argument("--guide-index", default='Guide_Documents_Metadata_Index.json',
+                        help="Guide index, pretty JSON or JSONL (default: %(default)s)")
+    parser.add_argument("--policy-index", default='Policy_Documents_Metadata_Index.json',
+                        help="Policy index, pretty JSON or JSONL (default: %(default)s)")
+    parser.add_argument("--output", default='MHA_Documents_Metadata_Index.json',
+                        help="Combined index, pretty JSON or JSONL (default: %(default)s)")
+    parser.add_argument("--export", metavar="PATH",
+                        help="Also export a pretty JSON copy when --output is JSONL")
+    parser.add_argument("--changes", default='MHA_Documents_Changes.json',
+                        help="Where to write the added/modified/removed change log (default: %(default)s)")
+    parser.add_argument("--facets", default=facets.FACETS_FILE,
+                        help="Where to write the facet bitsets (default: %(default)s)")
+    parser.add_argument("--autocomplete", default=AUTOCOMPLETE_FILE,
+                        help="Where to write the autocomplete trie (default: %(default)s)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    combine_indexes() 
\ No newline at end of file
+    args = parse_args()
+    combine_indexes(args.guide_index, args.policy_index, args.output, args.export, args.changes, args.facets,
+                     args.autocomplete) 
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Content fingerprints of converted documents.
+
+The question generators store each document's fingerprint with its questions and only
+regenerate them when it changes. section_diff records the fingerprint of the version a
+change report replaces, so the generators can tell whether the stored questions were made
+from it. Both sides must hash the same way, and this module has no dependencies so the
+converters can use it without loading the LLM stages.
+"""
+
+import json
+import hashlib
+
+# Fields ignored when fingerprinting: they change on every conversion or, like the
+# extracted guide image links, do not affect the generated questions
+POLICY_VOLATILE_FIELDS = {"extracted_date"}
+GUIDE_VOLATILE_FIELDS = {"extracted_date", "images"}
+
+def compute_fingerprint(document_json, volatile_fields=POLICY_VOLATILE_FIELDS):
+    """Hash the document content, ignoring the volatile fields"""
+    content = {k: v for k, v in document_json.items() if k not in volatile_fields}
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
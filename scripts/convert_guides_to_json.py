@@ -6,16 +6,21 @@ Script to convert DOCX guide files to structured JSON format
 import os
 import json
 import re
-import docx
+import argparse
 from datetime import datetime
 
+import jsonl_io
+import archive_sources
+import guide_images
+
 # Paths
 INPUT_DIR = "raw_guides"
 OUTPUT_DIR = "VECTOR_GUIDES_JSON"
 
-# Ensure output directory exists
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
+# Ensure output directory exists (called before writing rather than at import time)
+def ensure_output_dir():
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
 
 # Helper function to extract guide information from filename
 def extract_guide_info(filename):
@@ -78,51 +83,66 @@ def identify_sections(paragraphs):
     
     return {k: clean_text(v) for k, v in sections.items() if v}
 
+# Function to convert a single document into a guide record
+# `source` is an optional file object with the DOCX content (an archive member); file_path then only names it
+def convert_document(file_path, images=True, source=None):
+    # Get filename without path
+    filename = os.path.basename(file_path)
+    
+    # Skip non-docx files
+    if not filename.endswith('.docx'):
+        return None
+        
+    # Extract guide number and title
+    guide_number, title = extract_guide_info(filename)
+    
+    # Parse document (python-docx pulls in lxml, so import it only when converting)
+    import docx
+    doc = docx.Document(source or file_path)
+    
+    # Get document properties
+    doc_properties = {}
+    for prop in doc.core_properties.__dict__.items():
+        if prop[0].startswith('_'):
+            continue
+        if prop[1] and hasattr(prop[1], 'strftime'):
+            doc_properties[prop[0]] = prop[1].strftime('%Y-%m-%d')
+        elif prop[1]:
+            doc_properties[prop[0]] = str(prop[1])
+    
+    # Extract document text
+    full_text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
+    
+    # Identify sections in the document
+    sections = identify_sections(doc.paragraphs)
+    
+    # Create structured JSON
+    guide_json = {
+        "guide_number": guide_number if guide_number else "unknown",
+        "title": title,
+        "filename": filename,
+        "extracted_date": datetime.now().strftime('%Y-%m-%d'),
+        "metadata": doc_properties,
+        "full_text": full_text,
+        "sections": sections
+    }
+    
+    # Store screenshots content-addressed and link them at their paragraphs
+    if images:
+        guide_json["images"] = guide_images.extract_images(source or file_path, doc.paragraphs)
+    
+    return guide_json
+
 # Function to process a single document
-def process_document(file_path):
+def process_document(file_path, images=True, source=None):
     try:
-        # Get filename without path
-        filename = os.path.basename(file_path)
-        
-        # Skip non-docx files
-        if not filename.endswith('.docx'):
+        guide_json = convert_document(file_path, images, source)
+        if guide_json is None:
             return None
-            
-        # Extract guide number and title
-        guide_number, title = extract_guide_info(filename)
-        
-        # Parse document
-        doc = docx.Document(file_path)
-        
-        # Get document properties
-        doc_properties = {}
-        for prop in doc.core_properties.__dict__.items():
-            if prop[0].startswith('_'):
-                continue
-            if prop[1] and hasattr(prop[1], 'strftime'):
-                doc_properties[prop[0]] = prop[1].strftime('%Y-%m-%d')
-            elif prop[1]:
-                doc_properties[prop[0]] = str(prop[1])
-        
-        # Extract document text
-        full_text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
-        
-        # Identify sections in the document
-        sections = identify_sections(doc.paragraphs)
-        
-        # Create structured JSON
-        guide_json = {
-            "guide_number": guide_number if guide_number else "unknown",
-            "title": title,
-            "filename": filename,
-            "extracted_date": datetime.now().strftime('%Y-%m-%d'),
-            "metadata": doc_properties,
-            "full_text": full_text,
-            "sections": sections
-        }
         
         # Create output filename
-        output_file = os.path.join(OUTPUT_DIR, f"{filename.replace('.docx', '.json')}")
+        ensure_output_dir()
+        output_file = os.path.join(OUTPUT_DIR, guide_json['filename'].replace('.docx', '.json'))
         
         # Write to JSON file
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -134,33 +154,102 @@ def process_document(file_path):
         print(f"Error processing {file_path}: {str(e)}")
         return None
 
+# Generator that converts documents one at a time for streaming to JSONL
+# `documents` yields (file path, source) pairs as for convert_document
+def stream_documents(documents, write_json=True, images=True):
+    for file_path, source in documents:
+        print(f"Processing: {os.path.basename(file_path)}")
+        try:
+            guide_json = convert_document(file_path, images, source)
+        except Exception as e:
+            print(f"Error processing {file_path}: {str(e)}")
+            guide_json = None
+        if guide_json is None:
+            print(f"  ✗ Failed to process")
+            continue
+        
+        # Keep the per-document pretty JSON as an export target
+        if write_json:
+            ensure_output_dir()
+            output_file = os.path.join(OUTPUT_DIR, guide_json['filename'].replace('.docx', '.json'))
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(guide_json, f, indent=2, ensure_ascii=False)
+        yield guide_json
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--input", default=INPUT_DIR,
+                        help="Directory of DOCX files or a .zip export containing them (default: %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help="Convert documents whose CRC (zip input) or catalog properties are unchanged as well "
+                             "(always with --jsonl)")
+    parser.add_argument("--read-workers", type=int, default=archive_sources.READ_WORKERS,
+                        help="Threads reading members of a .zip input (default: %(default)s)")
+    parser.add_argument("--jsonl", metavar="PATH",
+                        help="Also stream converted records into a JSONL file (.jsonl or .jsonl.zst)")
+    parser.add_argument("--skip-json", action="store_true",
+                        help="With --jsonl, do not write the per-document pretty JSON files")
+    parser.add_argument("--no-images", action="store_true",
+                        help=f"Do not extract embedded images into {guide_images.IMAGE_DIR}")
+    parser.add_argument("--thumbnails", action="store_true",
+                        help="Also render image thumbnails (requires Pillow)")
+    parser.add_argument("--workers", type=int,
+                        help="Worker processes for thumbnail rendering (default: CPU count)")
+    return parser.parse_args()
+
+# Render thumbnails for every stored image that does not have one yet
+def render_thumbnails(workers=None):
+    if not os.path.isdir(guide_images.IMAGE_DIR):
+        return
+    names = [name for name in os.listdir(guide_images.IMAGE_DIR)
+             if os.path.isfile(os.path.join(guide_images.IMAGE_DIR, name))]
+    try:
+        created = guide_images.make_thumbnails(names, workers)
+    except RuntimeError as e:
+        print(f"Warning: {e}")
+        return
+    print(f"Created {created} thumbnails in {guide_images.THUMBNAIL_DIR}")
+
 # Main function
 def main():
+    args = parse_args()
     print(f"Starting conversion of guide DOCX files to JSON format...")
-    print(f"Input directory: {INPUT_DIR}")
+    print(f"Input: {args.input}")
     print(f"Output directory: {OUTPUT_DIR}")
     
-    # Get list of all docx files
-    docx_files = []
-    for file in os.listdir(INPUT_DIR):
-        file_path = os.path.join(INPUT_DIR, file)
-        if file.endswith('.docx') and os.path.isfile(file_path):
-            docx_files.append(file_path)
+    # Get the changed docx files, from the input directory or straight out of a zip export
+    tracker, documents, document_count = archive_sources.list_documents(
+        args.input, "guide", OUTPUT_DIR, os.path.basename(INPUT_DIR), args.force or bool(args.jsonl), args.read_workers)
     
-    print(f"Found {len(docx_files)} DOCX files to process.")
+    print(f"Found {document_count} DOCX files to process.")
+    
+    # Stream records straight into the JSONL interchange file
+    if args.jsonl:
+        records = stream_documents(documents, not args.skip_json, not args.no_images)
+        processed_files = jsonl_io.write_records(args.jsonl, tracker.track(records))
+        tracker.save()
+        print(f"\nConversion complete. Streamed {processed_files} of {document_count} files to {args.jsonl}.")
+        if args.thumbnails:
+            render_thumbnails(args.workers)
+        return
     
     # Process each file
     processed_files = 0
-    for file_path in docx_files:
+    for file_path, source in documents:
         print(f"Processing: {os.path.basename(file_path)}")
-        output_file = process_document(file_path)
+        output_file = process_document(file_path, not args.no_images, source)
         if output_file:
             processed_files += 1
+            tracker.mark_converted(os.path.basename(file_path))
             print(f"  ✓ Created: {output_file}")
         else:
             print(f"  ✗ Failed to process")
+    tracker.save()
+    
+    print(f"\nConversion complete. Processed {processed_files} of {document_count} files.")
     
-    print(f"\nConversion complete. Processed {processed_files} of {len(docx_files)} files.")
+    if args.thumbnails:
+        render_thumbnails(args.workers)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
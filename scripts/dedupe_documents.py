@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Script to find duplicate and near-duplicate converted documents before they are indexed.
+
+Each converted policy and guide is fingerprinted twice: a SHA-256 of its normalised
+full_text catches exact copies, and a 64-bit SimHash over word shingles catches
+near-identical versions (re-saved downloads such as "... (1).docx", minor edits).
+Documents whose SimHashes differ in at most MAX_HAMMING_DISTANCE bits are grouped, the
+newest version of each group is kept and the rest are written to Duplicate_Documents.json.
+The index builders skip the listed files, so they are not indexed, enriched or uploaded.
+
+Run after conversion and before building the indexes:
+
+    python scripts/dedupe_documents.py
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+import jsonl_io
+
+# Paths
+DUPLICATES_FILE = "Duplicate_Documents.json"
+
+# Converted JSON folder and raw DOCX folder for each document kind
+SOURCES = {
+    "policy": ("VECTOR_JSON", "raw policies"),
+    "guide": ("VECTOR_GUIDES_JSON", "raw_guides"),
+}
+
+# Near-duplicate settings
+SHINGLE_SIZE = 3
+SIMHASH_BITS = 64
+MAX_HAMMING_DISTANCE = 3
+
+# SimHash is split into this many bands for candidate lookup; two hashes within
+# MAX_HAMMING_DISTANCE bits must agree on at least one band when there are more
+# bands than allowed differing bits
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+
+# Trailing " (1)", " (2)" ... added to re-downloaded copies
+COPY_SUFFIX = re.compile(r"\s*\((\d+)\)$")
+
+def normalise_text(text):
+    """Lower-case and collapse whitespace so formatting-only changes do not matter"""
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+def content_hash(text):
+    return hashlib.sha256(normalise_text(text).encode("utf-8")).hexdigest()
+
+def simhash(text):
+    """64-bit SimHash over overlapping word shingles"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))]
+
+    # Tally each byte of the shingle hashes, then read the bit votes off the histograms
+    byte_counts = [[0] * 256 for _ in range(SIMHASH_BITS // 8)]
+    for shingle in shingles:
+        digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=SIMHASH_BITS // 8).digest()
+        for position, byte in enumerate(digest):
+            byte_counts[position][byte] += 1
+
+    fingerprint = 0
+    for position, counts in enumerate(byte_counts):
+        for bit in range(8):
+            ones = sum(count for byte, count in enumerate(counts) if byte >> bit & 1)
+            if 2 * ones > len(shingles):
+                fingerprint |= 1 << (position * 8 + bit)
+    return fingerprint
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+def version_key(document):
+    """Sort key where the newest version of a document sorts last"""
+    metadata = document["metadata"] if isinstance(document["metadata"], dict) else {}
+    copy_match = COPY_SUFFIX.search(os.path.splitext(document["file"])[0])
+    return (
+        metadata.get("modified") or metadata.get("created") or "",
+        document["source_mtime"],
+        int(copy_match.group(1)) if copy_match else 0,
+        document["file"]
+    )
+
+def fingerprint_documents(kind):
+    """Fingerprint every converted document of one kind"""
+    input_dir, raw_dir = SOURCES[kind]
+    if not os.path.isdir(input_dir):
+        return []
+
+    documents = []
+    for json_file, text, _path in jsonl_io.iter_raw_documents(input_dir):
+        fields = jsonl_io.project_fields(text, ("full_text", "filename", "metadata"))
+        full_text = fields.get("full_text") or ""
+        if not full_text.strip():
+            continue
+        raw_path = os.path.join(raw_dir, fields.get("filename") or "")
+        documents.append({
+            "file": json_file,
+            "metadata": fields.get("metadata") or {},
+            "source_mtime": os.path.getmtime(raw_path) if os.path.isfile(raw_path) else 0,
+            "hash": content_hash(full_text),
+            "simhash": simhash(full_text)
+        })
+    return documents
+
+def group_documents(documents):
+    """Group exact and near-identical documents; returns lists of indexes into `documents`"""
+    parent = list(range(len(documents)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        parent[find(i)] = find(j)
+
+    # Exact copies share a content hash; near copies share at least one SimHash band
+    buckets = {}
+    for i, document in enumerate(documents):
+        buckets.setdefault(("hash", document["hash"]), []).append(i)
+        for band in range(BANDS):
+            value = document["simhash"] >> (band * BAND_BITS) & ((1 << BAND_BITS) - 1)
+            buckets.setdefault((band, value), []).append(i)
+
+    for key, members in buckets.items():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                if find(i) == find(j):
+                    continue
+                if key[0] == "hash" or hamming_distance(documents[i]["simhash"], documents[j]["simhash"]) <= MAX_HAMMING_DISTANCE:
+                    union(i, j)
+
+    groups = {}
+    for i in range(len(documents)):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+def find_duplicates(kinds=tuple(SOURCES)):
+    """Return the duplicate groups for the given kinds, newest version first"""
+    report = []
+    for kind in kinds:
+        documents = fingerprint_documents(kind)
+        for members in group_documents(documents):
+            members.sort(key=lambda i: version_key(documents[i]), reverse=True)
+            keep = documents[members[0]]
+            duplicates = []
+            for i in members[1:]:
+                document = documents[i]
+                exact = document["hash"] == keep["hash"]
+                duplicates.append({
+                    "File": document["file"],
+                    "Match": "exact" if exact else "near",
+                    "Distance": hamming_distance(document["simhash"], keep["simhash"])
+                })
+            report.append({"Kind": kind, "Keep": keep["file"], "Duplicates": duplicates})
+    return report
+
+def load_skip_list(kind, path=DUPLICATES_FILE):
+    """Return {duplicate json filename: kept filename} for one kind, empty if dedup has not run"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            groups = json.load(f).get("Groups", [])
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not load {path}: {e}")
+        return {}
+    return {duplicate["File"]: group["Keep"] for group in groups if group.get("Kind") == kind
+            for duplicate in group.get("Duplicates", [])}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate converted documents")
+    parser.add_argument("--kind", choices=("policy", "guide", "all"), default="all",
+                        help="Which documents to check (default: %(default)s)")
+    parser.add_argument("--output", default=DUPLICATES_FILE, help="Duplicate report (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the groups without writing the report")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    kinds = tuple(SOURCES) if args.kind == "all" else (args.kind,)
+    if not any(os.path.isdir(SOURCES[kind][0]) for kind in kinds):
+        print("Error: No converted documents found; run the converters first")
+        sys.exit(1)
+
+    print("Fingerprinting converted documents...")
+    groups = find_duplicates(kinds)
+
+    for group in groups:
+        print(f"\n[{group['Kind']}] Keeping: {group['Keep']}")
+        for duplicate in group["Duplicates"]:
+            print(f"  - Skipping {duplicate['Match']} duplicate: {duplicate['File']} (distance {duplicate['Distance']})")
+
+    skipped = sum(len(group["Duplicates"]) for group in groups)
+    print(f"\nFound {len(groups)} duplicate groups; {skipped} documents will be skipped downstream.")
+
+    if not args.dry_run:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"Generated At": datetime.now().isoformat(timespec="seconds"), "Groups": groups},
+                      f, indent=4, ensure_ascii=False)
+        print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Catalog of the raw DOCX tree built from document properties alone.
+
+Each DOCX is a zip file. The scanner reads only docProps/core.xml and docProps/app.xml,
+found through the zip's central directory, and never parses the document body. This gives
+each file's revision, last author, created and modified dates, and Word's own word, page
+and paragraph counts. Files whose size and mtime match the previous catalog are not
+opened at all, so a rescan of the whole tree takes milliseconds.
+
+Document_Catalog.json holds the catalog as of the last conversion. The converters update
+it for each document they convert and skip documents whose properties are unchanged
+(--force converts them anyway). The CLI reports what changed since then, which documents
+are due for review, and the largest-first order the work queue enqueues in:
+
+    python scripts/doc_catalog.py                 # changes since the last conversion
+    python scripts/doc_catalog.py --stale         # not modified for REVIEW_AFTER_DAYS
+    python scripts/doc_catalog.py --order         # largest documents first
+    python scripts/doc_catalog.py --update        # accept the current tree as converted
+"""
+
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+
+# Paths
+CATALOG_FILE = "Document_Catalog.json"
+RAW_DIRS = {"policy": "raw policies", "guide": "raw_guides"}
+
+# Policies are reviewed on a three-year cycle
+REVIEW_AFTER_DAYS = 3 * 365
+
+# Document properties and where they live
+CORE_PROPERTIES = {
+    "title": "{http://purl.org/dc/elements/1.1/}title",
+    "creator": "{http://purl.org/dc/elements/1.1/}creator",
+    "last_modified_by": "{http://schemas.openxmlformats.org/package/2006/metadata/core-properties}lastModifiedBy",
+    "revision": "{http://schemas.openxmlformats.org/package/2006/metadata/core-properties}revision",
+    "created": "{http://purl.org/dc/terms/}created",
+    "modified": "{http://purl.org/dc/terms/}modified",
+}
+APP_NAMESPACE = "{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}"
+APP_COUNTS = ("Words", "Pages", "Characters", "Paragraphs")
+
+# Fields that identify a version of a document; any difference means it changed
+VERSION_FIELDS = ("size", "revision", "modified", "last_modified_by")
+
+def read_properties(path):
+    """Core and app properties of one DOCX, from its docProps parts only"""
+    entry = {}
+    with zipfile.ZipFile(path) as archive:
+        for part, parse in (("docProps/core.xml", parse_core), ("docProps/app.xml", parse_app)):
+            try:
+                entry.update(parse(ElementTree.fromstring(archive.read(part))))
+            except (KeyError, ElementTree.ParseError):
+                continue
+    return entry
+
+def parse_core(root):
+    values = {}
+    for name, tag in CORE_PROPERTIES.items():
+        element = root.find(tag)
+        if element is not None and element.text and element.text.strip():
+            text = element.text.strip()
+            values[name] = int(text) if name == "revision" and text.isdigit() else text
+    return values
+
+def parse_app(root):
+    values = {}
+    for name in APP_COUNTS:
+        element = root.find(APP_NAMESPACE + name)
+        if element is not None and (element.text or "").strip().isdigit():
+            values[name.lower()] = int(element.text)
+    return values
+
+def is_docx(filename):
+    """DOCX files, not Word lock/temp files"""
+    return filename.endswith(".docx") and not filename.startswith(("~$", "."))
+
+def scan(directories, previous=None):
+    """Catalog entries keyed by path for every DOCX under the {kind: directory} map.
+
+    Entries of files whose size and mtime match `previous` are reused without opening them.
+    """
+    previous = previous or {}
+    catalog = {}
+    for kind, directory in directories.items():
+        if not os.path.isdir(directory):
+            continue
+        for root, _dirs, files in os.walk(directory):
+            for filename in sorted(files):
+                if not is_docx(filename):
+                    continue
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                old = previous.get(path)
+                if old and old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns:
+                    catalog[path] = old
+                    continue
+                entry = {"kind": kind, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                try:
+                    entry.update(read_properties(path))
+                except (zipfile.BadZipFile, OSError) as e:
+                    print(f"Warning: Could not read properties of {path}: {e}")
+                catalog[path] = entry
+    return catalog
+
+def load_catalog(path=CATALOG_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("Documents", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_catalog(catalog, path=CATALOG_FILE):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"Updated At": datetime.now().isoformat(timespec="seconds"), "Documents": catalog},
+                  f, indent=4, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def is_changed(entry, old):
+    return old is None or any(entry.get(field) != old.get(field) for field in VERSION_FIELDS)
+
+def diff_catalogs(old, new):
+    return {
+        "added": [path for path in new if path not in old],
+        "modified": [path for path in new if path in old and is_changed(new[path], old[path])],
+        "removed": [path for path in old if path not in new],
+    }
+
+def largest_first(paths, catalog):
+    """Order paths by Word's word count, then file size, biggest first"""
+    def size(path):
+        entry = catalog.get(path, {})
+        return entry.get("words", 0), entry.get("size", 0)
+    return sorted(paths, key=size, reverse=True)
+
+def modified_at(entry):
+    try:
+        return datetime.fromisoformat(entry["modified"].replace("Z", "+00:00"))
+    except (KeyError, ValueError):
+        return None
+
+def stale_documents(catalog, days=REVIEW_AFTER_DAYS, now=None):
+    """(path, days since modified) for documents not modified within `days`, oldest first"""
+    now = now or datetime.now(timezone.utc)
+    stale = []
+    for path, entry in catalog.items():
+        modified = modified_at(entry)
+        if modified is None:
+            continue
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        age = (now - modified).days
+        if age > days:
+            stale.append((path, age))
+    return sorted(stale, key=lambda item: -item[1])
+
+class CatalogSource:
+    """Change tracking for a converter's input directory, backed by the catalog file"""
+
+    def __init__(self, directory, kind, path=CATALOG_FILE):
+        self.path = path
+        self.kind = kind
+        self.saved = load_catalog(path)
+        self.current = scan({kind: directory}, self.saved)
+        self.by_name = {os.path.basename(path): path for path in self.current}
+
+    def changed(self, output_dir, paths):
+        """Paths whose version differs from the catalog, or whose JSON is missing"""
+        changed = []
+        for path in paths:
+            output_file = os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + ".json")
+            if is_changed(self.current.get(path, {}), self.saved.get(path)) or not os.path.exists(output_file):
+                changed.append(path)
+        return changed
+
+    def mark_converted(self, filename):
+        """Record the catalog entry of the DOCX a converted record came from"""
+        path = self.by_name.get(filename)
+        if path is not None:
+            self.saved[path] = self.current[path]
+
+    def track(self, records):
+        for record in records:
+            self.mark_converted(record["filename"])
+            yield record
+
+    def save(self):
+        # Forget this kind's documents that are no longer in the directory; other kinds' stay
+        self.saved = {path: entry for path, entry in self.saved.items()
+                      if path in self.current or (entry.get("kind") != self.kind and os.path.exists(path))}
+        save_catalog(self.saved, self.path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Catalog the raw DOCX tree from document properties")
+    parser.add_argument("--catalog", default=CATALOG_FILE, help="Catalog file (default: %(default)s)")
+    parser.add_argument("--stale", action="store_true", help="List documents due for review")
+    parser.add_argument("--days", type=int, default=REVIEW_AFTER_DAYS,
+                        help="Days without modification before a document is due for review (default: %(default)s)")
+    parser.add_argument("--order", action="store_true", help="List documents largest first")
+    parser.add_argument("--update", action="store_true", help="Save the scan as the converted state")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    saved = load_catalog(args.catalog)
+    started = time.perf_counter()
+    catalog = scan(RAW_DIRS, saved)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if not catalog:
+        print(f"Error: No DOCX files found in {', '.join(RAW_DIRS.values())}")
+        sys.exit(1)
+    print(f"Scanned {len(catalog)} documents in {elapsed_ms:.1f} ms")
+
+    changes = diff_catalogs(saved, catalog)
+    print(f"Since the last conversion: {len(changes['added'])} added, {len(changes['modified'])} modified, "
+          f"{len(changes['removed'])} removed")
+    for label, paths in changes.items():
+        for path in paths:
+            print(f"  {label:<8} {path}")
+
+    if args.stale:
+        stale = stale_documents(catalog, args.days)
+        print(f"\n{len(stale)} documents not modified for over {args.days} days:")
+        for path, age in stale:
+            entry = catalog[path]
+            print(f"  {age:>5} days  {path} (last modified by {entry.get('last_modified_by', 'unknown')})")
+
+    if args.order:
+        print("\nLargest first:")
+        for path in largest_first(catalog, catalog):
+            entry = catalog[path]
+            print(f"  {entry.get('words', 0):>7} words {entry.get('pages', 0):>4} pages  {path}")
+
+    if args.update:
+        save_catalog(catalog, args.catalog)
+        print(f"\nSaved {args.catalog}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script to enhance both the policy and guide indexes with AI-generated questions in one run.
+
+Policy and guide enrichment share the pooled OpenAI client from openai_client, so the
+second stage reuses the connections warmed up by the first instead of starting a new
+process and repeating the TLS handshake.
+"""
+
+import sys
+import argparse
+
+import openai_client
+import generate_ai_questions
+import generate_guide_ai_questions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Enhance the policy and guide indexes with AI-generated questions")
+    parser.add_argument("--since", type=generate_ai_questions.parse_since,
+                        help="Only consider documents whose JSON was modified on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate questions even when the content fingerprint is unchanged")
+    parser.add_argument("--skip-policies", action="store_true", help="Only enrich the guide index")
+    parser.add_argument("--skip-guides", action="store_true", help="Only enrich the policy index")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    # Get the shared OpenAI client
+    try:
+        client = openai_client.get_client()
+    except Exception as e:
+        print(f"Failed to initialize OpenAI client: {e}")
+        sys.exit(1)
+
+    # (label, module, index loader, index updater, index key) for each stage
+    stages = []
+    if not args.skip_policies:
+        stages.append(("policies", generate_ai_questions, generate_ai_questions.load_policy_index,
+                       generate_ai_questions.update_policy_index, "Policy Documents"))
+    if not args.skip_guides:
+        stages.append(("guides", generate_guide_ai_questions, generate_guide_ai_questions.load_guide_index,
+                       generate_guide_ai_questions.update_guide_index, "Guide Documents"))
+
+    failed_total = 0
+    try:
+        for label, module, load_index, update_index, key in stages:
+            print(f"\nEnhancing {label} with AI-generated questions...")
+            module.backup_existing_index()
+            index_data = load_index()
+            if not index_data.get(key):
+                print(f"No {label} found in {module.INDEX_FILE}")
+                continue
+            updated_index, failed_count = update_index(index_data, client, args.since, args.force)
+            module.save_index(updated_index)
+            failed_total += failed_count
+    finally:
+        openai_client.close()
+
+    if failed_total:
+        print(f"\nDone with {failed_total} failures. Failed documents kept their previous questions.")
+        sys.exit(1)
+    print("\nDone! Policy and guide indexes updated with AI-generated questions.")
+
+if __name__ == "__main__":
+    main()
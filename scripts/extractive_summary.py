@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Offline extractive descriptions and keywords for the converted documents.
+
+All sentences of the corpus are weighted with TF-IDF in one NumPy pass (no network, no
+model). Each document's most representative sentence, the one closest to the
+document's TF-IDF centroid with a small bonus for appearing early, becomes its
+Description, and the terms with the highest TF-IDF in the document become its Keywords.
+
+The index builders run this over their input by default (--no-extractive keeps the
+template descriptions). It can also refresh the existing indexes in place:
+
+    python scripts/extractive_summary.py --apply
+    python scripts/extractive_summary.py --show "HR7.4 Annual Leave Holiday Arrangements Policy (2)"
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from collections import Counter
+
+import numpy as np
+
+import jsonl_io
+
+# Index files, their entry key and converted JSON folder
+INDEXES = {
+    "policy": ("Policy_Documents_Metadata_Index.json", "Policy Documents", "VECTOR_JSON"),
+    "guide": ("Guide_Documents_Metadata_Index.json", "Guide Documents", "VECTOR_GUIDES_JSON"),
+}
+
+# Sentences outside these bounds are not considered for a description
+MIN_SENTENCE_CHARS = 40
+MAX_SENTENCE_CHARS = 300
+MIN_SENTENCE_WORDS = 6
+
+# A second sentence is added when the first is shorter than this and both fit
+SHORT_DESCRIPTION_CHARS = 120
+MAX_DESCRIPTION_CHARS = 250
+
+# Bonus for early sentences: POSITION_BONUS / (1 + sentence number)
+POSITION_BONUS = 0.3
+
+KEYWORD_COUNT = 8
+
+# Keyword weights closer than this are treated as tied
+KEYWORD_TIE_TOLERANCE = 1e-5
+
+STOPWORDS = {
+    "about", "above", "after", "again", "all", "also", "and", "any", "are", "been", "before",
+    "being", "below", "between", "both", "but", "can", "could", "did", "does", "doing", "down",
+    "during", "each", "either", "etc", "few", "for", "from", "further", "had", "has", "have",
+    "having", "her", "here", "hers", "him", "his", "how", "into", "its", "itself", "may", "mha",
+    "more", "most", "must", "need", "not", "now", "off", "once", "only", "other", "our", "out",
+    "over", "own", "policy", "procedure", "same", "shall", "she", "should", "some", "such",
+    "than", "that", "the", "their", "them", "then", "there", "these", "they", "this", "those",
+    "through", "under", "until", "upon", "very", "was", "were", "what", "when", "where", "which",
+    "while", "who", "whom", "why", "will", "with", "within", "without", "would", "you", "your"
+}
+
+STOPWORD_ARRAY = np.asarray(sorted(STOPWORDS))
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+TOKEN = re.compile(r"[a-z][a-z'-]*[a-z]|\n")
+
+def split_sentences(text):
+    """Sentences of a document, taken paragraph by paragraph"""
+    return [s.strip() for s in SENTENCE_BREAK.sub("\n", text or "").split("\n") if s.strip()]
+
+def shorten(text, limit=MAX_DESCRIPTION_CHARS):
+    if len(text) <= limit:
+        return text
+    return text[:limit - 3].rsplit(" ", 1)[0].rstrip(",;:") + "..."
+
+def top_keywords(weights, threshold, vocabulary, count):
+    """The best `count` terms by weight. Ties, which are common because terms with the same
+    counts get the same weight up to rounding, go to the alphabetically first term, so the
+    result does not depend on the order terms were first seen in"""
+    candidates = np.flatnonzero((weights >= threshold * (1 - KEYWORD_TIE_TOLERANCE)) & (weights > 0))
+    ranked = sorted((-round(float(weights[t]) / KEYWORD_TIE_TOLERANCE), str(vocabulary[t])) for t in candidates)
+    return [term for _, term in ranked[:count]]
+
+def summarise_corpus(documents, keyword_count=KEYWORD_COUNT, corpus=None):
+    """Return {key: {"Description", "Keywords"}} for (key, text) pairs in one vectorised pass.
+
+    IDF comes from the documents themselves, or from `corpus` (CorpusStatistics) when a few
+    documents are summarised against a larger corpus.
+    """
+    keys, sentence_texts, doc_starts = [], [], []
+    for key, text in documents:
+        keys.append(key)
+        doc_starts.append(len(sentence_texts))
+        sentence_texts.extend(split_sentences(text))
+    doc_starts.append(len(sentence_texts))
+    if not sentence_texts:
+        return {}
+
+    # Tokenise the whole corpus with one regex pass; newline tokens mark sentence ends
+    # and terms get ids in order of first appearance, so only the vocabulary is filtered
+    tokens = TOKEN.findall("\n".join(sentence_texts).lower() + "\n")
+    vocabulary = list(dict.fromkeys(["\n"] + tokens))
+    term_ids = dict(zip(vocabulary, range(len(vocabulary))))
+    ids = np.fromiter(map(term_ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+    vocabulary = np.asarray(vocabulary)
+    usable = (np.char.str_len(vocabulary) > 2) & ~np.isin(vocabulary, STOPWORD_ARRAY)
+    breaks = ids == 0
+    token_rows = np.cumsum(breaks) - breaks
+    keep = usable[ids]
+    cols = (np.cumsum(usable) - 1)[ids[keep]]
+    vocabulary = vocabulary[usable]
+    rows = token_rows[keep]
+    sentence_docs = np.repeat(np.arange(len(keys)), np.diff(doc_starts))
+
+    # Candidate sentences: sensible length, enough content words, and a real sentence ending
+    lengths = np.char.str_len(np.asarray(sentence_texts))
+    word_counts = np.bincount(token_rows[~breaks], minlength=len(sentence_texts))
+    content_counts = np.bincount(rows, minlength=len(sentence_texts))
+    endings = np.asarray([sentence[-1] in ".!?" for sentence in sentence_texts])
+    candidate = ((lengths >= MIN_SENTENCE_CHARS) & (lengths <= MAX_SENTENCE_CHARS) & endings
+                 & (word_counts >= MIN_SENTENCE_WORDS) & (content_counts >= MIN_SENTENCE_WORDS // 2))
+
+    document_count, term_count = len(keys), len(vocabulary)
+    if not term_count:
+        return {}
+
+    # Sentence x term counts as COO triples
+    cells, counts = np.unique(rows * term_count + cols, return_counts=True)
+    cell_rows, cell_cols = cells // term_count, cells % term_count
+    cell_docs = sentence_docs[cell_rows]
+
+    # Document frequency and per-document term counts
+    doc_terms = np.bincount(cell_docs * term_count + cell_cols, weights=counts, minlength=document_count * term_count)
+    doc_terms = doc_terms.reshape(document_count, term_count).astype(np.float32)
+    if corpus is None:
+        corpus_size, document_frequency = document_count, np.count_nonzero(doc_terms, axis=0)
+    else:
+        corpus_size = len(corpus.terms)
+        document_frequency = np.fromiter(map(corpus.frequency.__getitem__, vocabulary.tolist()),
+                                         dtype=np.int64, count=term_count)
+    idf = np.log((1 + corpus_size) / (1 + document_frequency)).astype(np.float32) + 1
+
+    # Sentence vectors (sublinear tf * idf, unit length) and document centroids
+    weights = (1 + np.log(counts)).astype(np.float32) * idf[cell_cols]
+    norms = np.sqrt(np.bincount(cell_rows, weights=weights ** 2, minlength=len(sentence_texts)))
+    weights /= norms[cell_rows]
+    doc_vectors = np.where(doc_terms > 0, 1 + np.log(np.maximum(doc_terms, 1)), 0) * idf
+    doc_norms = np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+    doc_vectors /= np.where(doc_norms > 0, doc_norms, 1)
+
+    # Cosine of each sentence with its document's centroid, plus the position bonus
+    scores = np.bincount(cell_rows, weights=weights * doc_vectors[cell_docs, cell_cols], minlength=len(sentence_texts))
+    positions = np.arange(len(sentence_texts)) - np.asarray(doc_starts[:-1])[sentence_docs]
+    scores += POSITION_BONUS / (1 + positions)
+    scores[~candidate] = -np.inf
+
+    # Only terms scoring at least each document's keyword_count-th best weight are sorted
+    keyword_count = min(keyword_count, term_count)
+    thresholds = -np.partition(-doc_vectors, keyword_count - 1, axis=1)[:, keyword_count - 1]
+
+    summaries = {}
+    for doc_id, key in enumerate(keys):
+        start, end = doc_starts[doc_id], doc_starts[doc_id + 1]
+        keywords = top_keywords(doc_vectors[doc_id], thresholds[doc_id], vocabulary, keyword_count)
+        description = None
+        if end > start and np.isfinite(scores[start:end]).any():
+            ranked = start + np.argsort(-scores[start:end])[:2]
+            best = [int(ranked[0])]
+            if len(sentence_texts[best[0]]) < SHORT_DESCRIPTION_CHARS and len(ranked) > 1 and np.isfinite(scores[ranked[1]]):
+                second = int(ranked[1])
+                if len(sentence_texts[best[0]]) + len(sentence_texts[second]) + 1 <= MAX_DESCRIPTION_CHARS:
+                    best = sorted(best + [second])
+            description = shorten(" ".join(sentence_texts[i] for i in best))
+        summaries[key] = {"Description": description, "Keywords": keywords}
+    return summaries
+
+def document_text(fields):
+    """The text summarised for a converted document: full_text, else its sections"""
+    text = fields.get("full_text")
+    if not text and isinstance(fields.get("sections"), dict):
+        text = "\n".join(v for v in fields["sections"].values() if isinstance(v, str))
+    return text or ""
+
+def corpus_documents(source):
+    """(json filename stem, full text) for a folder or JSONL stream of converted documents"""
+    for json_file, raw, _path in jsonl_io.iter_raw_documents(source):
+        yield os.path.splitext(json_file)[0], document_text(jsonl_io.project_fields(raw, ("full_text", "sections")))
+
+def document_terms(text):
+    """The distinct terms of a document that summarise_corpus weights"""
+    return {token for token in TOKEN.findall(text.lower()) if len(token) > 2 and token not in STOPWORDS}
+
+class CorpusStatistics:
+    """Document frequencies of a converted corpus, kept current one document at a time.
+
+    Summarising a changed document against these gives the same IDF as summarising the
+    whole corpus again, without re-reading or re-tokenising the other documents.
+    """
+
+    def __init__(self, documents):
+        self.terms = {key: document_terms(text) for key, text in documents}
+        self.frequency = Counter(term for terms in self.terms.values() for term in terms)
+
+    def remove(self, key):
+        self.frequency.subtract(self.terms.pop(key, ()))
+
+    def update(self, key, text):
+        self.remove(key)
+        self.terms[key] = document_terms(text)
+        self.frequency.update(self.terms[key])
+
+    def summarise(self, key, text):
+        """Record the document's current text and return its summary"""
+        self.update(key, text)
+        return summarise_corpus([(key, text)], corpus=self).get(key)
+
+def summarise_source(source):
+    return summarise_corpus(corpus_documents(source)) if os.path.exists(source) else {}
+
+def annotate(entry, summaries):
+    """Set an index entry's Description and Keywords from the summaries, where there is one"""
+    summary = summaries.get(os.path.splitext(entry.get("File", ""))[0])
+    if summary:
+        if summary["Description"]:
+            entry["Description"] = summary["Description"]
+        entry["Keywords"] = summary["Keywords"]
+    return entry
+
+def apply_to_index(kind):
+    """Rewrite an existing index with extractive descriptions and keywords; returns the entry count"""
+    index_file, key, input_dir = INDEXES[kind]
+    if not os.path.exists(index_file):
+        print(f"SKIPPING: {index_file} not found")
+        return 0
+    summaries = summarise_source(input_dir)
+    entries = [annotate(entry, summaries) for entry in jsonl_io.read_index_entries(index_file, key)]
+    count = jsonl_io.write_index_entries(index_file, key, entries)
+    print(f"Updated descriptions and keywords for {count} entries in {index_file}")
+    return count
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline extractive descriptions and keywords")
+    parser.add_argument("--kind", choices=("policy", "guide", "all"), default="all",
+                        help="Which documents to summarise (default: %(default)s)")
+    parser.add_argument("--apply", action="store_true", help="Write the results into the existing indexes")
+    parser.add_argument("--show", action="append", metavar="NAME",
+                        help="Print the summary of one document (JSON file name without .json)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    kinds = list(INDEXES) if args.kind == "all" else [args.kind]
+
+    if args.apply:
+        for kind in kinds:
+            apply_to_index(kind)
+        return
+
+    for kind in kinds:
+        started = time.perf_counter()
+        summaries = summarise_source(INDEXES[kind][2])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{kind}: summarised {len(summaries)} documents in {elapsed_ms:.0f} ms")
+        for name in args.show or []:
+            if name in summaries:
+                print(f"\n{name}\n  Description: {summaries[name]['Description']}\n"
+                      f"  Keywords: {', '.join(summaries[name]['Keywords'])}")
+    if not any(os.path.exists(INDEXES[kind][2]) for kind in kinds):
+        print("Error: No converted documents found; run the converters first")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
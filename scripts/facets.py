@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Facet bitsets over the combined index for filtered searches.
+
+combine_indexes.py writes MHA_Documents_Facets.json next to the combined index. Bit i of
+each bitset stands for entry i of the combined index, so a filter such as "HR policies
+that mention Retirement Living" is a bitwise AND before any scoring:
+
+    "Facets": {
+        "Document Type": {"Guide": "0x...", "Policy": "0x..."},
+        "Policy Prefix": {"CP": "0x...", "HR": "0x...", ...},
+        "Guide Family":  {"How to": "0x...", "WI": "0x...", "User Guide": "0x...", "Other": "0x..."},
+        "Audience":      {"Care Homes": "0x...", "Retirement Living": "0x...", ...}
+    }
+
+Values of one facet are OR-ed and different facets are AND-ed:
+
+    python scripts/facets.py --type Policy --prefix HR --audience "Retirement Living"
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from datetime import datetime
+
+import jsonl_io
+
+# Paths
+FACETS_FILE = "MHA_Documents_Facets.json"
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+
+# Converted JSON folder for each Document Type, searched for audience mentions
+SOURCE_DIRS = {"Policy": "VECTOR_JSON", "Guide": "VECTOR_GUIDES_JSON"}
+
+# Audience tags and the phrases that mark a document as relevant to them
+AUDIENCE_PATTERNS = {
+    "Care Homes": re.compile(r"\b(care|nursing) homes?\b", re.IGNORECASE),
+    "Retirement Living": re.compile(r"\bretirement living\b|\bextra care\b", re.IGNORECASE),
+    "Volunteers": re.compile(r"\bvolunteers?\b", re.IGNORECASE),
+    "Agency Workers": re.compile(r"\bagency (staff|workers?|colleagues?)\b", re.IGNORECASE),
+}
+
+# Query-string / command-line names for each facet
+FILTER_PARAMS = {
+    "type": "Document Type",
+    "prefix": "Policy Prefix",
+    "family": "Guide Family",
+    "audience": "Audience",
+}
+
+def policy_prefix(entry):
+    """Policy family letters from the policy ID at the start of the file name (HR, CP, HS...)"""
+    prefix_match = re.match(r'^([A-Z]+)', entry.get("File") or "")
+    return prefix_match.group(1) if prefix_match else None
+
+def guide_family(entry):
+    title = (entry.get("Document") or entry.get("File") or "").strip()
+    if re.match(r"^WI\b", title):
+        return "WI"
+    if re.match(r"^(\d+\.\s*)?How to\b", title, re.IGNORECASE):
+        return "How to"
+    if re.search(r"\buser guide\b", title, re.IGNORECASE):
+        return "User Guide"
+    return "Other"
+
+def source_text(entry):
+    """Full text of the entry's converted document, or '' when it is not available"""
+    path = os.path.join(SOURCE_DIRS.get(entry.get("Document Type"), ""), entry.get("File") or "")
+    if not os.path.isfile(path):
+        return ""
+    with open(path, 'r', encoding='utf-8') as f:
+        fields = jsonl_io.project_fields(f.read(), ("full_text", "sections"))
+    if fields.get("full_text"):
+        return fields["full_text"]
+    sections = fields.get("sections")
+    return "\n".join(t for t in sections.values() if isinstance(t, str)) if isinstance(sections, dict) else ""
+
+def audience_tags(entry, text):
+    searchable = "\n".join([entry.get("Document") or "", entry.get("Description") or ""]
+                           + list(entry.get("Questions Answered", [])) + [text])
+    return [tag for tag, pattern in AUDIENCE_PATTERNS.items() if pattern.search(searchable)]
+
+def entry_facets(entry, text=""):
+    """Return {facet: [values]} for one combined index entry"""
+    document_type = entry.get("Document Type")
+    values = {"Document Type": [document_type] if document_type else []}
+    if document_type == "Policy":
+        prefix = policy_prefix(entry)
+        values["Policy Prefix"] = [prefix] if prefix else []
+    elif document_type == "Guide":
+        values["Guide Family"] = [guide_family(entry)]
+    values["Audience"] = audience_tags(entry, text)
+    return values
+
+def build_facets(entries, read_text=source_text):
+    """Return (Files in order, {facet: {value: bitset int}}) for the combined index entries"""
+    files = []
+    facets = {facet: {} for facet in FILTER_PARAMS.values()}
+    for position, entry in enumerate(entries):
+        files.append(entry.get("File"))
+        for facet, values in entry_facets(entry, read_text(entry)).items():
+            for value in values:
+                facets[facet][value] = facets[facet].get(value, 0) | (1 << position)
+    return files, facets
+
+def save_facets(path, files, facets):
+    data = {
+        "Generated At": datetime.now().isoformat(timespec="seconds"),
+        "Entries": len(files),
+        "Files": files,
+        "Facets": {facet: {value: hex(bits) for value, bits in sorted(values.items())}
+                   for facet, values in facets.items()}
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+
+class FacetIndex:
+    """Loaded facet bitsets; filters map facet names to one value or a list of values"""
+
+    def __init__(self, files, facets):
+        self.files = files
+        self.facets = facets
+        self.all = (1 << len(files)) - 1
+
+    @classmethod
+    def load(cls, path=FACETS_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        facets = {facet: {value: int(bits, 16) for value, bits in values.items()}
+                  for facet, values in data["Facets"].items()}
+        return cls(data["Files"], facets)
+
+    def select(self, filters):
+        """Bitset of the entries matching every facet in `filters`"""
+        selected = self.all
+        for facet, wanted in filters.items():
+            if wanted in (None, "", []):
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            values = self.facets.get(facet, {})
+            matching = 0
+            for value in wanted:
+                matching |= values.get(value, 0)
+            selected &= matching
+        return selected
+
+    def positions(self, bits):
+        """Entry positions set in a bitset, in index order"""
+        positions = []
+        while bits:
+            low = bits & -bits
+            positions.append(low.bit_length() - 1)
+            bits ^= low
+        return positions
+
+    def files_matching(self, filters):
+        return [self.files[i] for i in self.positions(self.select(filters))]
+
+    def counts(self, bits=None):
+        """Entries per facet value, optionally within a selection"""
+        bits = self.all if bits is None else bits
+        return {facet: {value: bin(value_bits & bits).count("1") for value, value_bits in values.items()}
+                for facet, values in self.facets.items()}
+
+def filters_from_params(params):
+    """Filters from query-string style params: {'prefix': ['HR,CP']} -> {'Policy Prefix': ['HR', 'CP']}"""
+    filters = {}
+    for param, facet in FILTER_PARAMS.items():
+        raw = params.get(param)
+        if isinstance(raw, str):
+            raw = [raw]
+        values = [v.strip() for item in raw or [] for v in item.split(",") if v.strip()]
+        if values:
+            filters[facet] = values
+    return filters
+
+def load_facet_index(path=FACETS_FILE):
+    """Return the FacetIndex, or None when the facets have not been built"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return FacetIndex.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not load {path}: {e}")
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="List combined index entries matching facet filters")
+    parser.add_argument("--facets", default=FACETS_FILE, help="Facet bitsets (default: %(default)s)")
+    parser.add_argument("--index", default=COMBINED_INDEX_FILE,
+                        help="Combined index, used with --rebuild (default: %(default)s)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the facets from the combined index first")
+    parser.add_argument("--counts", action="store_true", help="Print entries per facet value")
+    for param, facet in FILTER_PARAMS.items():
+        parser.add_argument(f"--{param}", action="append", help=f"{facet} value(s), comma-separated")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.rebuild:
+        files, facets = build_facets(jsonl_io.read_index_entries(args.index, "MHA Documents"))
+        save_facets(args.facets, files, facets)
+        print(f"Wrote facets for {len(files)} entries to {args.facets}")
+
+    index = load_facet_index(args.facets)
+    if index is None:
+        print(f"Error: {args.facets} not found; run combine_indexes.py first")
+        sys.exit(1)
+
+    filters = filters_from_params(vars(args))
+    bits = index.select(filters)
+    if args.counts:
+        print(json.dumps(index.counts(bits), indent=2))
+        return
+    for file_name in index.files_matching(filters):
+        print(file_name)
+    print(f"{bin(bits).count('1')} of {len(index.files)} entries match")
+
+if __name__ == "__main__":
+    main()
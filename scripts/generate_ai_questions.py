@@ -5,19 +5,58 @@ using OpenAI to analyze policy content and create relevant questions
 """
 
 import os
+import sys
 import json
 import time
 import re
-import dotenv
-from openai import OpenAI
+import argparse
 from datetime import datetime
 import shutil
 
+import jsonl_io
+import openai_client
+import llm_budget
+import content_fingerprint
+import answer_snippets
+import section_diff
+
 # Paths
-ENV_FILE = "iSPOC/.env"
 INPUT_DIR = "VECTOR_JSON"
 INDEX_FILE = "Policy_Documents_Metadata_Index.json"
 
+# Model settings
+MODEL = "gpt-4.1-mini"
+QUESTION_COUNT = 3
+
+# Bump when the prompt or schema changes so existing questions are regenerated
+PROMPT_VERSION = "2"
+
+# Fields ignored when fingerprinting (see content_fingerprint.py)
+VOLATILE_FIELDS = content_fingerprint.POLICY_VOLATILE_FIELDS
+
+# Retry settings for policies whose response failed validation
+MAX_RETRY_ROUNDS = 2
+RETRY_DELAY_SECONDS = 5
+
+# Structured-output schema the model response must satisfy
+QUESTIONS_SCHEMA = {
+    "name": "policy_questions",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "questions": {
+                "type": "array",
+                "items": {"type": "string"},
+                "minItems": QUESTION_COUNT,
+                "maxItems": QUESTION_COUNT
+            }
+        },
+        "required": ["questions"],
+        "additionalProperties": False
+    }
+}
+
 def backup_existing_index():
     """Create a backup of the existing index file"""
     if os.path.exists(INDEX_FILE):
@@ -33,14 +72,6 @@ def backup_existing_index():
             return False
     return False
 
-def load_openai_key():
-    """Load OpenAI API key from .env file"""
-    dotenv.load_dotenv(ENV_FILE)
-    api_key = os.getenv("VITE_OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("No OpenAI API key found in .env file")
-    return api_key
-
 def load_policy_index():
     """Load the existing policy index"""
     try:
@@ -81,53 +112,172 @@ def prepare_content_for_ai(policy_json):
     
     return "\n\n".join(content)
 
-def generate_questions_with_openai(client, policy_content):
-    """Generate questions using OpenAI API"""
+def compute_fingerprint(policy_json):
+    """Hash the policy content, ignoring fields that change on every conversion"""
+    return content_fingerprint.compute_fingerprint(policy_json, VOLATILE_FIELDS)
+
+def needs_enrichment(policy, fingerprint):
+    """Check whether an index entry's questions are missing or out of date"""
+    metadata = policy.get("Questions Metadata")
+    if not metadata:
+        return True
+    return (metadata.get("Fingerprint") != fingerprint
+            or metadata.get("Prompt Version") != PROMPT_VERSION)
+
+def parse_questions(result):
+    """Parse a model response in a single pass and validate it against QUESTIONS_SCHEMA.
+
+    Returns the list of questions, or None if the response does not match the schema.
+    """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",  # Using a more reliable model
-            messages=[
-                {"role": "system", "content": "You are an expert in healthcare policy analysis. Your task is to identify the 3 most important questions that this policy answers. Focus on specific, practical questions that staff would need to know. Return ONLY a JSON array of 3 questions, nothing else."},
-                {"role": "user", "content": policy_content}
-            ],
-            response_format={"type": "json_object"},
+        questions_data = json.loads(result)
+    except (TypeError, json.JSONDecodeError):
+        return None
+    
+    questions = questions_data.get("questions") if isinstance(questions_data, dict) else None
+    if not isinstance(questions, list) or len(questions) != QUESTION_COUNT:
+        return None
+    
+    # Every item must be a non-empty string
+    cleaned = [q.strip() for q in questions if isinstance(q, str) and q.strip()]
+    if len(cleaned) != QUESTION_COUNT:
+        return None
+    return cleaned
+
+def generate_questions_with_openai(client, policy_content, priority="high"):
+    """Generate questions using OpenAI API, returning None on failure.
+
+    The budget governor picks the model and raises llm_budget.Deferred instead of calling
+    when the call would cross a token or cost ceiling.
+    """
+    messages = [
+        {"role": "system", "content": "You are an expert in healthcare policy analysis. Your task is to identify the 3 most important questions that this policy answers. Focus on specific, practical questions that staff would need to know. Return a JSON object with a \"questions\" array containing exactly 3 questions."},
+        {"role": "user", "content": policy_content}
+    ]
+    try:
+        response = llm_budget.get_governor().chat(
+            client, MODEL, messages, priority,
+            response_format={"type": "json_schema", "json_schema": QUESTIONS_SCHEMA},
             temperature=0.5,
             max_tokens=500
         )
-        
-        result = response.choices[0].message.content
-        # Parse the JSON response to extract the questions
-        try:
-            questions_data = json.loads(result)
-            if "questions" in questions_data:
-                return questions_data["questions"]
-            else:
-                # Sometimes the model returns an array directly
-                if isinstance(questions_data, list):
-                    return questions_data
-                # Or it might use a different key
-                for key in questions_data:
-                    if isinstance(questions_data[key], list) and len(questions_data[key]) > 0:
-                        return questions_data[key][:3]  # Ensure we only take 3 questions
-                return ["What procedures are outlined in this policy?", 
-                        "What are the key responsibilities defined in this policy?", 
-                        "How is compliance with this policy monitored?"]
-        except json.JSONDecodeError:
-            print(f"Failed to parse JSON response: {result}")
-            return ["What procedures are outlined in this policy?", 
-                    "What are the key responsibilities defined in this policy?", 
-                    "How is compliance with this policy monitored?"]
-            
+    except llm_budget.Deferred:
+        raise
     except Exception as e:
         print(f"Error calling OpenAI API: {e}")
-        return ["What procedures are outlined in this policy?", 
-                "What are the key responsibilities defined in this policy?", 
-                "How is compliance with this policy monitored?"]
+        return None
+    
+    message = response.choices[0].message
+    if getattr(message, "refusal", None):
+        print(f"Model refused request: {message.refusal}")
+        return None
+    
+    questions = parse_questions(message.content)
+    if questions is None:
+        print(f"Response did not match schema: {message.content}")
+    return questions
+
+def enrich_policy(policy, client, since=None, force=False):
+    """Generate and store questions for one index entry.
+
+    Entries whose source is older than ``since`` (a POSIX timestamp) or whose
+    fingerprint and prompt version match the stored metadata are skipped unless
+    ``force`` is set.
+
+    Returns True on success, False if generation failed and None if the entry was skipped.
+    """
+    # Extract JSON filename from the txt filename
+    txt_filename = policy.get("File", "")
+    if not txt_filename or not txt_filename.endswith(".txt"):
+        print(f"SKIPPING: Invalid filename {txt_filename}")
+        return None
+        
+    json_filename = txt_filename.replace(".txt", ".json")
+    
+    # Skip sources not modified since the cutoff
+    json_path = os.path.join(INPUT_DIR, json_filename)
+    if since and os.path.exists(json_path) and os.path.getmtime(json_path) < since:
+        print("UNCHANGED: Source not modified since cutoff")
+        return None
+    
+    # Load the policy JSON
+    policy_json = get_policy_json(json_filename)
+    if not policy_json:
+        print(f"SKIPPING: Could not load JSON for {json_filename}")
+        return None
+    
+    # Skip entries whose questions were generated from identical content
+    fingerprint = compute_fingerprint(policy_json)
+    if not force and not needs_enrichment(policy, fingerprint):
+        print("UNCHANGED: Questions are up to date")
+        return None
+    
+    # Regenerating existing AI questions can wait when the budget runs low; new documents go first
+    priority = "low" if policy.get("Questions Metadata") else "high"
+    
+    # When the questions came from the version the recorded diff starts from, only
+    # questions answered from changed passages are regenerated
+    changes = None if force else section_diff.load_changes().get(json_filename)
+    metadata = policy.get("Questions Metadata") or {}
+    if (changes and policy.get("Questions Answered")
+            and metadata.get("Fingerprint") == changes["Previous Fingerprint"]
+            and metadata.get("Prompt Version") == PROMPT_VERSION):
+        questions = list(policy["Questions Answered"])
+        affected = section_diff.affected_questions(policy, changes)
+        if not affected:
+            print("UNCHANGED: No answered passage changed; keeping questions")
+        else:
+            print(f"Regenerating {len(affected)} of {len(questions)} questions from the changed sections...")
+            policy_content = (f"Policy: {policy_json.get('title', '')} (ID: {policy_json.get('id', '')})\n\n"
+                              f"CHANGED CONTENT: {section_diff.changed_text(policy_json, changes)[:3000]}")
+            try:
+                replacements = generate_questions_with_openai(client, policy_content, priority)
+            except llm_budget.Deferred as e:
+                print(f"DEFERRED: {e}; existing entry left unchanged")
+                return None
+            if replacements is None:
+                print("FAILED: No valid questions generated; existing entry left unchanged")
+                return False
+            for i, question in zip(affected, replacements):
+                questions[i] = question
+    else:
+        # Prepare content for AI
+        policy_content = prepare_content_for_ai(policy_json)
+        
+        # Generate questions
+        print(f"Generating questions with OpenAI...")
+        try:
+            questions = generate_questions_with_openai(client, policy_content, priority)
+        except llm_budget.Deferred as e:
+            print(f"DEFERRED: {e}; existing entry left unchanged")
+            return None
+        if questions is None:
+            print("FAILED: No valid questions generated; existing entry left unchanged")
+            return False
+    
+    # Display the generated questions
+    print("\nGenerated questions:")
+    for j, question in enumerate(questions):
+        print(f"  {j+1}. {question}")
+    
+    # Update the policy entry and record how the questions were generated
+    policy["Questions Answered"] = questions
+    policy["Questions Metadata"] = {
+        "Fingerprint": fingerprint,
+        "Model": llm_budget.get_governor().last_model or MODEL,
+        "Prompt Version": PROMPT_VERSION,
+        "Generated At": datetime.now().isoformat(timespec="seconds")
+    }
+    
+    # Point each new question at the passage that answers it
+    answer_snippets.attach_snippets(policy, policy_json)
+    return True
 
-def update_policy_index(index_data, client):
-    """Update policy index with AI-generated questions"""
+def update_policy_index(index_data, client, since=None, force=False):
+    """Update policy index with AI-generated questions, retrying only failed policies"""
     updated_count = 0
     total_count = len(index_data["Policy Documents"])
+    failed = []
     
     for i, policy in enumerate(index_data["Policy Documents"]):
         policy_title = policy.get("Document", "Unknown")
@@ -137,46 +287,66 @@ def update_policy_index(index_data, client):
         print(f"Processing [{i+1}/{total_count}]: {policy_title}")
         print("="*80)
         
-        # Extract JSON filename from the txt filename
-        txt_filename = policy.get("File", "")
-        if not txt_filename or not txt_filename.endswith(".txt"):
-            print(f"SKIPPING: Invalid filename {txt_filename}")
+        result = enrich_policy(policy, client, since, force)
+        if result is None:
             continue
-            
-        json_filename = txt_filename.replace(".txt", ".json")
-        
-        # Load the policy JSON
-        policy_json = get_policy_json(json_filename)
-        if not policy_json:
-            print(f"SKIPPING: Could not load JSON for {json_filename}")
+        if not result:
+            failed.append(policy)
             continue
-        
-        # Prepare content for AI
-        policy_content = prepare_content_for_ai(policy_json)
-        
-        # Generate questions
-        print(f"Generating questions with OpenAI...")
-        questions = generate_questions_with_openai(client, policy_content)
-        
-        # Display the generated questions
-        print("\nGenerated questions:")
-        for j, question in enumerate(questions):
-            print(f"  {j+1}. {question}")
-        
-        # Update the policy entry
-        policy["Questions Answered"] = questions
         updated_count += 1
         
         # Save after each update to prevent data loss if interrupted
         if updated_count % 5 == 0:
             save_index(index_data)
             print(f"\nSaved progress after processing {updated_count} policies")
+    
+    # Retry only the policies that failed, with a bounded number of rounds
+    for attempt in range(1, MAX_RETRY_ROUNDS + 1):
+        if not failed:
+            break
+        print(f"\nRetrying {len(failed)} failed policies (round {attempt}/{MAX_RETRY_ROUNDS})...")
+        time.sleep(RETRY_DELAY_SECONDS * attempt)
         
-        # Sleep to avoid rate limiting
-        time.sleep(1)
+        still_failed = []
+        for policy in failed:
+            print(f"\nRetrying: {policy.get('Document', 'Unknown')}")
+            result = enrich_policy(policy, client, since, force)
+            if result:
+                updated_count += 1
+            elif result is False:
+                still_failed.append(policy)
+        failed = still_failed
     
     print(f"\nUpdated {updated_count} of {total_count} policies with AI-generated questions")
-    return index_data
+    if failed:
+        print(f"FAILED: {len(failed)} policies could not be enriched and were left unchanged:")
+        for policy in failed:
+            print(f"  - {policy.get('Document', 'Unknown')}")
+    return index_data, len(failed)
+
+def stream_policy_index(entries, client, since=None, force=False, stats=None):
+    """Yield index entries with AI-generated questions, retrying failed policies inline.
+
+    Used for JSONL indexes so only one entry is held in memory at a time.
+    """
+    for i, policy in enumerate(entries):
+        print("\n" + "="*80)
+        print(f"Processing [{i+1}]: {policy.get('Document', 'Unknown')}")
+        print("="*80)
+        
+        result = enrich_policy(policy, client, since, force)
+        attempt = 0
+        while result is False and attempt < MAX_RETRY_ROUNDS:
+            attempt += 1
+            print(f"\nRetrying (attempt {attempt}/{MAX_RETRY_ROUNDS})...")
+            time.sleep(RETRY_DELAY_SECONDS * attempt)
+            result = enrich_policy(policy, client, since, force)
+        
+        if result:
+            stats["updated"] += 1
+        elif result is False:
+            stats["failed"].append(policy.get("Document", "Unknown"))
+        yield policy
 
 def save_index(index_data):
     """Save the updated index back to file"""
@@ -188,20 +358,52 @@ def save_index(index_data):
         print(f"Error saving index file: {e}")
         return False
 
+def parse_since(value):
+    """Parse a --since date or datetime into a POSIX timestamp"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date: {value} (expected YYYY-MM-DD or ISO datetime)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Enhance Policy_Documents_Metadata_Index.json with AI-generated questions")
+    parser.add_argument("--since", type=parse_since,
+                        help="Only consider policies whose JSON was modified on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate questions even when the content fingerprint is unchanged")
+    parser.add_argument("--jsonl", metavar="PATH",
+                        help="Stream a JSONL index (.jsonl or .jsonl.zst) in place, then export Policy_Documents_Metadata_Index.json")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("Enhancing policy index with AI-generated questions...")
     
     # Backup existing index
     backup_existing_index()
     
-    # Load OpenAI API key
+    # Get the shared OpenAI client
     try:
-        api_key = load_openai_key()
-        client = OpenAI(api_key=api_key)
+        client = openai_client.get_client()
     except Exception as e:
         print(f"Failed to initialize OpenAI client: {e}")
         return
     
+    # Stream a JSONL index record by record and export the pretty index from it
+    if args.jsonl:
+        stats = {"updated": 0, "failed": []}
+        entries = stream_policy_index(jsonl_io.read_records(args.jsonl), client, args.since, args.force, stats)
+        total = jsonl_io.write_records(args.jsonl, entries)
+        jsonl_io.write_pretty_index(INDEX_FILE, "Policy Documents", jsonl_io.read_records(args.jsonl))
+        print(f"\nUpdated {stats['updated']} of {total} policies with AI-generated questions")
+        if stats["failed"]:
+            print(f"Done with {len(stats['failed'])} failures. Failed policies kept their previous questions:")
+            for title in stats["failed"]:
+                print(f"  - {title}")
+            sys.exit(1)
+        print("Done! All policies updated with AI-generated questions.")
+        return
+    
     # Load policy index
     index_data = load_policy_index()
     if not index_data.get("Policy Documents"):
@@ -209,11 +411,15 @@ def main():
         return
     
     # Update policy index with AI-generated questions
-    updated_index = update_policy_index(index_data, client)
+    updated_index, failed_count = update_policy_index(index_data, client, args.since, args.force)
     
     # Save updated index
     save_index(updated_index)
     
+    if failed_count:
+        print(f"Done with {failed_count} failures. Failed policies kept their previous questions.")
+        sys.exit(1)
+    
     print("Done! All policies updated with AI-generated questions.")
 
 if __name__ == "__main__":
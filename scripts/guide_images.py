@@ -0,0 +1,154 @@
+"""
+Extract the screenshots and other images embedded in guide DOCX files.
+
+Image parts are copied straight out of the DOCX zip without being decoded and stored
+content-addressed as VECTOR_GUIDES_IMAGES/<sha256>.<ext>, so an image repeated across
+guides (a logo, a common screen) is stored once. Each converted guide lists its images
+with the paragraph they appear in:
+
+    "images": [
+        {"image": "3f2a...c1.png", "paragraph": 14, "offset": 812}
+    ]
+
+`paragraph` indexes the DOCX body paragraphs and `offset` is the character position in
+full_text where the image appears (after the preceding paragraph's text), so a
+step-by-step answer can show the screenshot next to the step.
+
+Thumbnails are optional: make_thumbnails() renders them on a process pool into
+VECTOR_GUIDES_IMAGES/thumbnails and needs the Pillow package.
+"""
+
+import os
+import hashlib
+import posixpath
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree import ElementTree
+
+# Paths
+IMAGE_DIR = "VECTOR_GUIDES_IMAGES"
+THUMBNAIL_DIR = os.path.join(IMAGE_DIR, "thumbnails")
+
+# Largest thumbnail width and height in pixels
+THUMBNAIL_SIZE = (320, 320)
+
+# Formats Pillow can open; vector formats such as EMF/WMF are stored but not thumbnailed
+THUMBNAIL_FORMATS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff"}
+
+# XML namespaces used to find image references in the document body
+NAMESPACES = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "v": "urn:schemas-microsoft-com:vml",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+}
+RELATIONSHIPS_PART = "word/_rels/document.xml.rels"
+PACKAGE_RELATIONSHIPS = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+IMAGE_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+EMBED_ATTRIBUTE = f"{{{NAMESPACES['r']}}}embed"
+ID_ATTRIBUTE = f"{{{NAMESPACES['r']}}}id"
+
+def image_relationships(archive):
+    """Map relationship IDs in word/document.xml to image part names in the zip"""
+    try:
+        root = ElementTree.fromstring(archive.read(RELATIONSHIPS_PART))
+    except KeyError:
+        return {}
+
+    images = {}
+    for relationship in root.iter(PACKAGE_RELATIONSHIPS):
+        if relationship.get("Type") != IMAGE_RELATIONSHIP or relationship.get("TargetMode") == "External":
+            continue
+        target = relationship.get("Target", "")
+        # Targets are relative to word/ unless absolute within the package
+        part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("word", target))
+        images[relationship.get("Id")] = part
+    return images
+
+def store_image(data, extension, image_dir=IMAGE_DIR):
+    """Write image bytes under their content hash unless already stored; return the file name"""
+    name = hashlib.sha256(data).hexdigest() + extension.lower()
+    path = os.path.join(image_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(image_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return name
+
+def paragraph_images(paragraph):
+    """Relationship IDs of the images referenced in one python-docx paragraph, in order"""
+    element = paragraph._p
+    ids = [blip.get(EMBED_ATTRIBUTE) for blip in element.iter(f"{{{NAMESPACES['a']}}}blip")]
+    ids += [image.get(ID_ATTRIBUTE) for image in element.iter(f"{{{NAMESPACES['v']}}}imagedata")]
+    return [rid for rid in ids if rid]
+
+def extract_images(docx_path, paragraphs, image_dir=IMAGE_DIR):
+    """Store the images of a DOCX and return their references for the guide JSON.
+
+    `paragraphs` are the document's python-docx body paragraphs; offsets follow the
+    converters' full_text, which joins the non-empty paragraphs with newlines.
+    """
+    with zipfile.ZipFile(docx_path) as archive:
+        relationships = image_relationships(archive)
+        if not relationships:
+            return []
+
+        stored = {}
+        images = []
+        offset = 0
+        for index, paragraph in enumerate(paragraphs):
+            text = paragraph.text
+            if text.strip():
+                offset += len(text) + (1 if offset else 0)
+            for rid in paragraph_images(paragraph):
+                part = relationships.get(rid)
+                if part is None:
+                    continue
+                if part not in stored:
+                    try:
+                        data = archive.read(part)
+                    except KeyError:
+                        continue
+                    stored[part] = store_image(data, posixpath.splitext(part)[1], image_dir)
+                images.append({"image": stored[part], "paragraph": index, "offset": offset})
+        return images
+
+def _thumbnail(job):
+    """Worker: render one thumbnail; returns an error message or None"""
+    source, target = job
+    from PIL import Image
+    try:
+        with Image.open(source) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            temp_path = f"{target}.tmp"
+            image.save(temp_path, "PNG")
+            os.replace(temp_path, target)
+    except Exception as e:
+        return f"{os.path.basename(source)}: {e}"
+    return None
+
+def make_thumbnails(image_names, workers=None, image_dir=IMAGE_DIR, thumbnail_dir=THUMBNAIL_DIR):
+    """Render missing thumbnails for the stored images on a process pool; returns the count made"""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Thumbnail generation requires the Pillow package (pip install Pillow)")
+
+    os.makedirs(thumbnail_dir, exist_ok=True)
+    jobs = []
+    for name in sorted(set(image_names)):
+        stem, extension = os.path.splitext(name)
+        target = os.path.join(thumbnail_dir, stem + ".png")
+        if extension.lower() in THUMBNAIL_FORMATS and not os.path.exists(target):
+            jobs.append((os.path.join(image_dir, name), target))
+    if not jobs:
+        return 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        errors = [error for error in executor.map(_thumbnail, jobs) if error]
+    for error in errors:
+        print(f"Warning: Could not create thumbnail for {error}")
+    return len(jobs) - len(errors)
@@ -0,0 +1,237 @@
+"""
+Helpers for streaming records between pipeline stages as line-delimited JSON (JSONL).
+
+Paths ending in ".jsonl" hold one JSON record per line. Paths ending in ".jsonl.zst"
+are zstd-compressed and need the optional zstandard package. Index files in the
+existing pretty-printed format can still be read and written, so the pretty JSON
+remains an export target.
+"""
+
+import io
+import json
+import os
+import re
+
+def is_jsonl(path):
+    """Check whether a path uses the JSONL interchange format"""
+    return path.endswith(".jsonl") or path.endswith(".jsonl.zst")
+
+def open_text(path, mode="r", compressed=None):
+    """Open a text stream, transparently (de)compressing .zst files"""
+    if compressed is None:
+        compressed = path.endswith(".zst")
+    if not compressed:
+        return open(path, mode, encoding="utf-8")
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError(f"Reading or writing {path} requires the zstandard package (pip install zstandard)")
+
+    if "r" in mode:
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    else:
+        stream = zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+def _discard(path):
+    """Remove a partially written temporary file"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def read_records(path):
+    """Yield records from a JSONL file one at a time"""
+    with open_text(path, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON record: {e}")
+
+def write_records(path, records):
+    """Stream records into a JSONL file and return how many were written.
+
+    The file is written to a temporary path and swapped in at the end, so a stage
+    may read from and write to the same file.
+    """
+    temp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open_text(temp_path, "w", compressed=path.endswith(".zst")) as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False))
+                f.write("\n")
+                count += 1
+    except BaseException:
+        _discard(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return count
+
+def iter_json_dir(directory):
+    """Yield (filename, record) pairs from a directory of per-document JSON files"""
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        file_path = os.path.join(directory, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                yield filename, json.load(f)
+        except Exception as e:
+            print(f"Error loading {file_path}: {str(e)}")
+
+def iter_documents(source):
+    """Yield (json filename, record) pairs from a JSON directory or a JSONL file of converted documents"""
+    if os.path.isdir(source):
+        yield from iter_json_dir(source)
+        return
+    for record in read_records(source):
+        yield record.get("filename", "").replace(".docx", ".json"), record
+
+# Tokens used when skipping over JSON values without decoding them
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+def _string_end(text, pos):
+    """Return the position just past the JSON string whose opening quote is at `pos`"""
+    end = pos + 1
+    while True:
+        end = text.find('"', end)
+        if end < 0:
+            raise ValueError("Unterminated JSON string")
+        # The quote is escaped if preceded by an odd number of backslashes
+        backslash = end - 1
+        while text[backslash] == "\\":
+            backslash -= 1
+        if (end - backslash) % 2:
+            return end + 1
+        end += 1
+
+def _skip_value(text, pos):
+    """Return the position just past the JSON value starting at `pos`, without building it"""
+    first = text[pos]
+    if first == '"':
+        return _string_end(text, pos)
+    if first in "{[":
+        depth = 0
+        while True:
+            token = _STRUCTURE.search(text, pos)
+            if token is None:
+                raise ValueError("Unterminated JSON value")
+            symbol = token.group()
+            if symbol == '"':
+                pos = _string_end(text, token.start())
+                continue
+            pos = token.end()
+            depth += 1 if symbol in "{[" else -1
+            if depth == 0:
+                return pos
+    return _decoder.raw_decode(text, pos)[1]
+
+def _project_object(text, pos, fields, parents, prefix, result):
+    """Collect wanted dotted paths from the object at `pos`; return the position after it"""
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    if text[pos] == "}":
+        return pos + 1
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos] != ":":
+            raise ValueError(f"Expected ':' at offset {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
+
+        path = prefix + key
+        if path in fields:
+            result[path], pos = _decoder.raw_decode(text, pos)
+        elif path in parents and text[pos] == "{":
+            pos = _project_object(text, pos, fields, parents, path + ".", result)
+        else:
+            pos = _skip_value(text, pos)
+
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos] == "}":
+            return pos + 1
+        if text[pos] != ",":
+            raise ValueError(f"Expected ',' or '}}' at offset {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
+
+def project_fields(text, fields):
+    """Decode only the dotted paths in `fields` (e.g. "sections.purpose") from a JSON object.
+
+    Other values, such as a large full_text, are scanned past without being decoded.
+    Returns a dict of the paths that were present.
+    """
+    fields = set(fields)
+    parents = {field.rsplit(".", i)[0] for field in fields for i in range(1, field.count(".") + 1)}
+    result = {}
+    pos = _WHITESPACE.match(text).end()
+    if not text.startswith("{", pos):
+        raise ValueError("Expected a JSON object")
+    _project_object(text, pos, fields, parents, "", result)
+    return result
+
+def iter_raw_documents(source):
+    """Yield (json filename, raw JSON text, path) for each converted document.
+
+    `path` is None for records read from a JSONL stream.
+    """
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if not filename.endswith(".json"):
+                continue
+            file_path = os.path.join(source, filename)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    yield filename, f.read(), file_path
+            except Exception as e:
+                print(f"Error loading {file_path}: {str(e)}")
+        return
+    with open_text(source, "r") as f:
+        for line in f:
+            if line.strip():
+                filename = project_fields(line, ("filename",)).get("filename", "")
+                yield filename.replace(".docx", ".json"), line, None
+
+def read_index_entries(path, key):
+    """Yield index entries from a JSONL file or from the list under `key` in a pretty JSON index"""
+    if is_jsonl(path):
+        yield from read_records(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    yield from data.get(key, [])
+
+def write_pretty_index(path, key, entries, indent=4):
+    """Stream entries into a pretty-printed {key: [...]} index file and return the count.
+
+    The output matches json.dump(..., indent=indent) but never holds the full list in memory.
+    """
+    pad = " " * indent
+    temp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write("{\n" + pad + json.dumps(key) + ": [")
+            for entry in entries:
+                body = json.dumps(entry, indent=indent, ensure_ascii=False)
+                f.write(("," if count else "") + "\n")
+                f.write("\n".join(pad * 2 + line for line in body.split("\n")))
+                count += 1
+            f.write(("\n" + pad + "]" if count else "]") + "\n}")
+    except BaseException:
+        _discard(temp_path)
+        raise
+    os.replace(temp_path, path)
+    return count
+
+def write_index_entries(path, key, entries):
+    """Write index entries as JSONL or pretty JSON depending on the path"""
+    if is_jsonl(path):
+        return write_records(path, entries)
+    return write_pretty_index(path, key, entries)
@@ -0,0 +1,272 @@
+"""
+Token and cost budget governor for the pipeline's LLM stages.
+
+Before each chat completion the question scripts ask the governor which model to use. It
+estimates the prompt tokens (with tiktoken when installed, otherwise about four characters
+per token), assumes the full max_tokens completion, and compares the projected spend with
+the ceilings:
+
+    LLM_RUN_MAX_COST / LLM_RUN_MAX_TOKENS   this process
+    LLM_DAY_MAX_COST / LLM_DAY_MAX_TOKENS   all processes today, kept in LLM_Usage.json
+
+A ceiling of 0 is no ceiling. As spending approaches a ceiling the governor first switches to
+CHEAPER_MODEL. Near the ceiling it defers low-priority documents (those that already have
+questions). When even the cheaper model would cross a ceiling, every further call is
+deferred. Deferred documents keep their current questions and are picked up by the next run.
+
+Calls are also paced to LLM_TOKENS_PER_MINUTE. After each call the actual usage from
+response.usage is recorded, and a cost/latency summary is printed when the process exits.
+Long-lived processes (pipeline_daemon.py, work_queue.py work --keep-polling) call end_run()
+after each enrich request or drained batch, which prints the summary and resets the run
+ceilings; the day ceilings still apply across runs.
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:
+    # POSIX-only; without it the usage ledger is updated unlocked
+    fcntl = None
+
+import openai_client
+
+# Paths
+USAGE_FILE = "LLM_Usage.json"
+
+# USD per million prompt and completion tokens
+PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+CHEAPER_MODEL = "gpt-4.1-nano"
+
+# Share of a ceiling after which the cheaper model is used / low-priority documents wait
+CHEAPER_MODEL_AT = 0.6
+DEFER_LOW_PRIORITY_AT = 0.8
+
+# Defaults for the ceilings, overridable through the environment
+DEFAULT_LIMITS = {
+    "LLM_RUN_MAX_COST": 5.0,
+    "LLM_RUN_MAX_TOKENS": 0,
+    "LLM_DAY_MAX_COST": 20.0,
+    "LLM_DAY_MAX_TOKENS": 0,
+    "LLM_TOKENS_PER_MINUTE": 200000,
+}
+
+# Tokens added per chat message for the role and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class Deferred(Exception):
+    """The call was not made because of the budget; the document should be left for a later run"""
+
+def limit(name):
+    """Read a ceiling from the environment, falling back to the default"""
+    openai_client.load_env()
+    default = DEFAULT_LIMITS[name]
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return type(default)(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}, using {default}")
+        return default
+
+_encodings = {}
+
+def count_tokens(text, model):
+    """Token count of `text`, exact with tiktoken and estimated from its length otherwise"""
+    if model not in _encodings:
+        try:
+            import tiktoken
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encodings[model] = None
+    encoding = _encodings[model]
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def estimate_prompt_tokens(messages, model):
+    return sum(count_tokens(m["content"], model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+def cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, PRICES["gpt-4.1"])
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+class BudgetGovernor:
+    """Chooses a model for each call, paces calls and records their usage"""
+
+    def __init__(self, usage_path=USAGE_FILE):
+        self.usage_path = usage_path
+        self.limits = {name: limit(name) for name in DEFAULT_LIMITS}
+        self.lock = threading.Lock()
+        self.run = {"tokens": 0, "cost": 0.0}
+        self.calls = []
+        self.deferred = {}
+        self.window = []
+        self.last_model = None
+
+    def day_totals(self):
+        usage = self._read_usage()
+        return usage.get(date.today().isoformat(), {"tokens": 0, "cost": 0.0})
+
+    def _read_usage(self):
+        try:
+            with open(self.usage_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _share(self, extra_tokens, extra_cost, day):
+        """Largest share of any ceiling that would be used after spending the extra amount"""
+        shares = []
+        for scope, totals in (("RUN", self.run), ("DAY", day)):
+            if self.limits[f"LLM_{scope}_MAX_COST"]:
+                shares.append((totals["cost"] + extra_cost) / self.limits[f"LLM_{scope}_MAX_COST"])
+            if self.limits[f"LLM_{scope}_MAX_TOKENS"]:
+                shares.append((totals["tokens"] + extra_tokens) / self.limits[f"LLM_{scope}_MAX_TOKENS"])
+        return max(shares, default=0.0)
+
+    def choose_model(self, model, messages, max_tokens, priority="high"):
+        """Return the model to call, or raise Deferred when the call should wait for another run"""
+        day = self.day_totals()
+        prompt_tokens = estimate_prompt_tokens(messages, model)
+        tokens = prompt_tokens + max_tokens
+        share = self._share(tokens, cost(model, prompt_tokens, max_tokens), day)
+
+        reason = None
+        if share > DEFER_LOW_PRIORITY_AT and priority == "low":
+            reason = "low priority near the budget ceiling"
+        elif share > CHEAPER_MODEL_AT and model != CHEAPER_MODEL:
+            model = CHEAPER_MODEL
+            share = self._share(tokens, cost(model, prompt_tokens, max_tokens), day)
+        if reason is None and share > 1.0:
+            reason = "budget ceiling reached"
+        if reason:
+            with self.lock:
+                self.deferred[reason] = self.deferred.get(reason, 0) + 1
+            raise Deferred(reason)
+
+        self._pace(tokens)
+        self.last_model = model
+        return model
+
+    def _pace(self, tokens):
+        """Wait until the last minute's tokens leave room for this call"""
+        per_minute = self.limits["LLM_TOKENS_PER_MINUTE"]
+        if not per_minute:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.window = [(t, n) for t, n in self.window if now - t < 60]
+                used = sum(n for _, n in self.window)
+                if not self.window or used + tokens <= per_minute:
+                    self.window.append((now, tokens))
+                    return
+                wait = 60 - (now - self.window[0][0])
+            time.sleep(max(wait, 0.1))
+
+    def record(self, model, usage, latency, estimated_prompt_tokens):
+        """Add a finished call's actual usage to the run and today's totals"""
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        call_cost = cost(model, prompt_tokens, completion_tokens)
+        with self.lock:
+            self.run["tokens"] += prompt_tokens + completion_tokens
+            self.run["cost"] += call_cost
+            self.calls.append({"model": model, "prompt": prompt_tokens, "completion": completion_tokens,
+                               "estimated": estimated_prompt_tokens, "cost": call_cost, "latency": latency})
+
+        # Several processes may be spending today's budget, so update the file under a lock
+        with open(f"{self.usage_path}.lock", 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            usage_by_day = self._read_usage()
+            day = usage_by_day.setdefault(date.today().isoformat(), {"tokens": 0, "cost": 0.0})
+            day["tokens"] += prompt_tokens + completion_tokens
+            day["cost"] = round(day["cost"] + call_cost, 6)
+            temp_path = f"{self.usage_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(usage_by_day, f, indent=4)
+            os.replace(temp_path, self.usage_path)
+
+    def chat(self, client, model, messages, priority="high", **kwargs):
+        """Make a governed chat completion; raises Deferred instead of calling when over budget"""
+        model = self.choose_model(model, messages, kwargs.get("max_tokens", 0), priority)
+        estimated = estimate_prompt_tokens(messages, model)
+        started = time.perf_counter()
+        response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+        self.record(model, getattr(response, "usage", None), time.perf_counter() - started, estimated)
+        return response
+
+    def end_run(self):
+        """Print this run's summary and count the next run from zero; for long-lived processes"""
+        self.print_summary()
+        with self.lock:
+            self.run = {"tokens": 0, "cost": 0.0}
+            self.calls = []
+            self.deferred = {}
+
+    def print_summary(self):
+        if not self.calls and not self.deferred:
+            return
+        print("\nLLM usage this run:")
+        for model in sorted({call["model"] for call in self.calls}):
+            calls = [call for call in self.calls if call["model"] == model]
+            print(f"  {model}: {len(calls)} calls, {sum(c['prompt'] for c in calls)} prompt + "
+                  f"{sum(c['completion'] for c in calls)} completion tokens, ${sum(c['cost'] for c in calls):.4f}")
+        if self.calls:
+            latencies = [call["latency"] for call in self.calls]
+            estimated = sum(call["estimated"] for call in self.calls)
+            actual = sum(call["prompt"] for call in self.calls)
+            print(f"  Latency: p50 {percentile(latencies, 0.5):.2f}s, p95 {percentile(latencies, 0.95):.2f}s, "
+                  f"total {sum(latencies):.1f}s")
+            if actual:
+                print(f"  Prompt estimate: {estimated} tokens vs {actual} actual ({estimated / actual - 1:+.0%})")
+        day = self.day_totals()
+        for label, totals, scope in (("Run total", self.run, "RUN"), ("Today", day, "DAY")):
+            ceilings = [f"${self.limits[f'LLM_{scope}_MAX_COST']:.4f}" if self.limits[f"LLM_{scope}_MAX_COST"] else "",
+                        f"{self.limits[f'LLM_{scope}_MAX_TOKENS']} tokens" if self.limits[f"LLM_{scope}_MAX_TOKENS"] else ""]
+            ceiling = ", ".join(c for c in ceilings if c) or "none"
+            print(f"  {label}: {totals['tokens']} tokens, ${totals['cost']:.4f} (ceiling: {ceiling})")
+        for reason, count in self.deferred.items():
+            print(f"  Deferred {count} documents: {reason}")
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor():
+    """The process-wide governor; its summary is printed when the process exits"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = BudgetGovernor()
+            atexit.register(_governor.print_summary)
+        return _governor
+
+def end_run():
+    """End the current run of the process-wide governor, if one was started"""
+    if _governor is not None:
+        _governor.end_run()
+
+def print_summary():
+    """Print the process-wide governor's summary; for exits that skip atexit handlers"""
+    if _governor is not None:
+        _governor.print_summary()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Load-test the retrieval path by replaying the indexed "Questions Answered" as staff queries.
+
+Every question in MHA_Documents_Metadata_Index.json is sent as a query, optionally with a
+few rule-based paraphrases, at a configurable concurrency. The question -> File mapping is
+the ground truth, so each run reports throughput, p50/p95/p99 latency and recall@k for
+the search entry point under test:
+
+    python scripts/load_test.py --local --concurrency 8              # in-process query cache
+    python scripts/query_cache.py --local --serve 8800 &
+    python scripts/load_test.py --url http://127.0.0.1:8800 --concurrency 16
+
+The HTTP target must answer GET /search?q=...&k=N with {"results": [{"File": ...}, ...]}.
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Paths
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+
+# Defaults
+CONCURRENCY = 4
+TOP_K = 5
+PARAPHRASES = 2
+REQUEST_TIMEOUT_SECONDS = 30
+
+# Rewrites used to paraphrase a question the way staff tend to phrase them: the first
+# matching opening is replaced, then every word rule is applied
+OPENING_RULES = [
+    (r"^What are the (exact )?steps to ", "how do I "),
+    (r"^How do I ", "what's the way to "),
+    (r"^What is the process (for|to) ", "process for "),
+    (r"^What are the ", "tell me the "),
+    (r"^Who is responsible for ", "who handles "),
+]
+WORD_RULES = [
+    (r"\bcolleagues\b", "staff"),
+    (r"\bresident's\b", "resident"),
+]
+
+# Words dropped to produce the terse, keyword-only form of a question
+KEYWORD_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "of", "on", "or", "should", "that", "the", "to", "what", "when",
+    "where", "which", "who", "with", "within"
+}
+
+def load_ground_truth(index_file):
+    """Return (question, File) pairs from the combined index"""
+    with open(index_file, 'r', encoding='utf-8') as f:
+        entries = json.load(f).get("MHA Documents", [])
+    return [(question, entry["File"]) for entry in entries for question in entry.get("Questions Answered", [])]
+
+def paraphrase(question, count):
+    """Return up to `count` distinct rewrites of a question"""
+    variants = []
+    rewritten = question
+    for pattern, replacement in OPENING_RULES:
+        rewritten, replaced = re.subn(pattern, replacement, rewritten, flags=re.IGNORECASE)
+        if replaced:
+            break
+    for pattern, replacement in WORD_RULES:
+        rewritten = re.sub(pattern, replacement, rewritten, flags=re.IGNORECASE)
+    if rewritten != question:
+        variants.append(rewritten.rstrip("?").lower())
+
+    keywords = [w for w in re.findall(r"[\w']+", question.lower()) if w not in KEYWORD_STOPWORDS]
+    variants.append(" ".join(keywords))
+
+    # Truncated form: the first half of the keywords, like a hurried search
+    if len(keywords) > 4:
+        variants.append(" ".join(keywords[:len(keywords) // 2 + 1]))
+
+    unique = []
+    for variant in variants:
+        if variant and variant != question and variant not in unique:
+            unique.append(variant)
+    return unique[:count]
+
+def build_workload(pairs, paraphrases, repeat, seed):
+    """Return a shuffled list of (query, expected File, is paraphrase) tuples"""
+    workload = []
+    for question, file_name in pairs:
+        workload.append((question, file_name, False))
+        workload.extend((variant, file_name, True) for variant in paraphrase(question, paraphrases))
+    workload *= repeat
+    random.Random(seed).shuffle(workload)
+    return workload
+
+class InProcessTarget:
+    """Searches a QueryCache loaded into this process"""
+
+    def __init__(self, local, index_file):
+        import query_cache
+        if local:
+            embedder = query_cache.LocalEmbedder()
+        else:
+            import openai_client
+            embedder = query_cache.OpenAIEmbedder(openai_client.get_client())
+        self.cache = query_cache.QueryCache(embedder, index_file)
+        self.name = f"in-process query cache ({embedder.name})"
+
+    def search(self, query, k):
+        return [result["File"] for result in self.cache.search(query, k)]
+
+class HttpTarget:
+    """Searches a local HTTP endpoint such as query_cache.py --serve"""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.name = f"HTTP {self.url}"
+
+    def search(self, query, k):
+        url = f"{self.url}/search?{urllib.parse.urlencode({'q': query, 'k': k})}"
+        with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            return [result["File"] for result in json.load(response)["results"]]
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+def run(target, workload, concurrency, k):
+    """Replay the workload and return the measurements"""
+    def timed(item):
+        query, expected, is_paraphrase = item
+        started = time.perf_counter()
+        try:
+            files = target.search(query, k)
+            error = None
+        except Exception as e:
+            files, error = [], str(e)
+        return time.perf_counter() - started, expected in files, is_paraphrase, error
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, workload))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _, _, error in results if error is None)
+    errors = [error for _, _, _, error in results if error is not None]
+
+    def recall(subset):
+        return round(sum(hit for _, hit, _, _ in subset) / len(subset), 4) if subset else None
+
+    return {
+        "target": target.name,
+        "queries": len(results),
+        "concurrency": concurrency,
+        "k": k,
+        "errors": len(errors),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_qps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0
+        },
+        f"recall@{k}": recall(results),
+        f"recall@{k}_original": recall([r for r in results if not r[2]]),
+        f"recall@{k}_paraphrase": recall([r for r in results if r[2]]),
+        "sample_errors": errors[:3]
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay indexed questions against a search entry point")
+    parser.add_argument("--url", help="Base URL of a local HTTP search endpoint (default: search in process)")
+    parser.add_argument("--local", action="store_true",
+                        help="In process: use the offline n-gram embedder instead of OpenAI")
+    parser.add_argument("--index", default=COMBINED_INDEX_FILE, help="Combined index (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Concurrent queries in flight (default: %(default)s)")
+    parser.add_argument("-k", type=int, default=TOP_K, help="Results considered for recall@k (default: %(default)s)")
+    parser.add_argument("--paraphrases", type=int, default=PARAPHRASES,
+                        help="Paraphrases per question (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the workload this many times")
+    parser.add_argument("--seed", type=int, default=0, help="Shuffle seed (default: %(default)s)")
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    pairs = load_ground_truth(args.index)
+    if not pairs:
+        print(f"Error: No questions found in {args.index}")
+        sys.exit(1)
+    workload = build_workload(pairs, args.paraphrases, args.repeat, args.seed)
+
+    try:
+        target = HttpTarget(args.url) if args.url else InProcessTarget(args.local, args.index)
+    except Exception as e:
+        print(f"Failed to set up the search target: {e}")
+        sys.exit(1)
+
+    print(f"Replaying {len(workload)} queries ({len(pairs)} questions) against {target.name} "
+          f"at concurrency {args.concurrency}...")
+    report = run(target, workload, args.concurrency, args.k)
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if report["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
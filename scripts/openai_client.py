@@ -0,0 +1,126 @@
+"""
+Shared OpenAI client for the pipeline's LLM stages.
+
+This is the single place that loads the API key from iSPOC/.env and builds the HTTP
+connection pool. The pool keeps connections alive between requests and uses HTTP/2
+when the h2 package is installed, so every stage in a process reuses warm connections
+instead of repeating the TLS handshake.
+
+dotenv, httpx and the openai SDK are imported on first use so that scripts which only
+print --help or have nothing to do start quickly.
+
+Pool sizes and timeouts can be tuned with environment variables:
+OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE, OPENAI_KEEPALIVE_EXPIRY,
+OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT and OPENAI_MAX_RETRIES.
+"""
+
+import os
+import threading
+
+# Path to .env file
+ENV_FILE = "iSPOC/.env"
+
+# Default API endpoint
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+# Defaults for the connection pool and timeouts
+DEFAULT_SETTINGS = {
+    "OPENAI_MAX_CONNECTIONS": 10,
+    "OPENAI_MAX_KEEPALIVE": 10,
+    "OPENAI_KEEPALIVE_EXPIRY": 60.0,
+    "OPENAI_CONNECT_TIMEOUT": 10.0,
+    "OPENAI_READ_TIMEOUT": 60.0,
+    "OPENAI_MAX_RETRIES": 2
+}
+
+_lock = threading.Lock()
+_env_loaded = False
+_http_client = None
+_clients = {}
+
+def load_env():
+    """Load iSPOC/.env once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        import dotenv
+        dotenv.load_dotenv(ENV_FILE)
+        _env_loaded = True
+
+def setting(name):
+    """Read a pool or timeout setting from the environment, falling back to the default"""
+    load_env()
+    default = DEFAULT_SETTINGS[name]
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return type(default)(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}, using {default}")
+        return default
+
+def load_openai_key():
+    """Load OpenAI API key from .env file"""
+    load_env()
+    api_key = os.getenv("VITE_OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("No OpenAI API key found in .env file")
+    return api_key
+
+def http2_available():
+    """HTTP/2 needs the optional h2 package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_http_client():
+    """Return the process-wide keep-alive HTTP client"""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            import httpx
+            limits = httpx.Limits(
+                max_connections=setting("OPENAI_MAX_CONNECTIONS"),
+                max_keepalive_connections=setting("OPENAI_MAX_KEEPALIVE"),
+                keepalive_expiry=setting("OPENAI_KEEPALIVE_EXPIRY")
+            )
+            timeout = httpx.Timeout(setting("OPENAI_READ_TIMEOUT"), connect=setting("OPENAI_CONNECT_TIMEOUT"))
+            _http_client = httpx.Client(limits=limits, timeout=timeout, http2=http2_available())
+        return _http_client
+
+def get_client(base_url=None, api_key=None):
+    """Return a shared OpenAI client for `base_url`, built on the pooled HTTP client.
+
+    A local base_url (such as a stand-in server) does not require an API key.
+    """
+    key = (base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    if api_key is None:
+        load_env()
+        api_key = load_openai_key() if base_url is None else (os.getenv("VITE_OPENAI_API_KEY") or "local")
+
+    # Deferred import: the SDK pulls in httpx and pydantic, which dominate startup time
+    from openai import OpenAI
+    client = OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=get_http_client(),
+        max_retries=setting("OPENAI_MAX_RETRIES")
+    )
+    with _lock:
+        return _clients.setdefault(key, client)
+
+def close():
+    """Close the pooled HTTP client, e.g. before a long-running process exits"""
+    global _http_client
+    with _lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        _clients.clear()
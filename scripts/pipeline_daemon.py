@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Long-lived pipeline worker that keeps parsers, the OpenAI client and loaded indexes warm.
+
+Each pipeline step normally starts a fresh Python process and re-imports python-docx,
+the openai SDK and dotenv. The daemon pays that cost once and then serves requests over
+a local socket, so a trigger (for example from Power Automate) only has to send one
+line of JSON:
+
+    python scripts/pipeline_daemon.py serve &
+    python scripts/pipeline_daemon.py send convert --kind policy --path "raw policies/HR4.13 DBS Policy and Procedure.docx"
+    python scripts/pipeline_daemon.py send combine
+    python scripts/pipeline_daemon.py send stop
+
+Requests and responses are single JSON objects terminated by a newline. A Unix socket
+is used where available; pass --port to listen on 127.0.0.1 instead.
+
+The client side only imports the standard library, so `send` starts in milliseconds.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+
+# Default socket location (relative to the repository root, like the other paths)
+SOCKET_PATH = ".pipeline_daemon.sock"
+
+# Longest a client waits for a reply; enrichment of many documents can take a while
+CLIENT_TIMEOUT_SECONDS = 3600
+
+COMMANDS = ("ping", "status", "convert", "remove", "combine", "enrich", "stop")
+
+class PipelineWorker:
+    """Holds the warm modules and runs one command at a time"""
+
+    def __init__(self):
+        started = time.perf_counter()
+        # Import the pipeline modules once; these pull in python-docx and lxml
+        import docx  # noqa: F401  (warm the parser import)
+        import watch_documents
+        import combine_indexes
+        self.watch_documents = watch_documents
+        self.combine_indexes = combine_indexes
+        self.client = None
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.started_at = time.time()
+        self.warmup_ms = (time.perf_counter() - started) * 1000
+
+    def get_client(self):
+        """Create the pooled OpenAI client on first use and keep it"""
+        if self.client is None:
+            import openai_client
+            self.client = openai_client.get_client()
+        return self.client
+
+    def handle(self, request):
+        command = request.get("command")
+        if command not in COMMANDS:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+
+        started = time.perf_counter()
+        with self.lock:
+            self.requests_served += 1
+            result = getattr(self, f"do_{command}")(request)
+        result.setdefault("ok", True)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def do_ping(self, request):
+        return {"reply": "pong"}
+
+    def do_status(self, request):
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "warmup_ms": round(self.warmup_ms, 1),
+            "requests_served": self.requests_served,
+            "client_ready": self.client is not None,
+            "cached_indexes": sorted(self.watch_documents._index_cache)
+        }
+
+    def do_convert(self, request):
+        kind, path = request.get("kind"), request.get("path")
+        if kind not in self.watch_documents.SOURCES or not path:
+            return {"ok": False, "error": "convert needs kind (policy or guide) and path"}
+        if not os.path.exists(path):
+            return {"ok": False, "error": f"{path} not found"}
+        return {"ok": self.watch_documents.reprocess_document(kind, path)}
+
+    def do_remove(self, request):
+        kind, path = request.get("kind"), request.get("path")
+        if kind not in self.watch_documents.SOURCES or not path:
+            return {"ok": False, "error": "remove needs kind (policy or guide) and path"}
+        self.watch_documents.remove_document(kind, path)
+        return {}
+
+    def do_combine(self, request):
+        self.combine_indexes.combine_indexes()
+        with open('MHA_Documents_Changes.json', 'r', encoding='utf-8') as f:
+            result = {"changes": json.load(f)}
+        # Hand serving workers the new index when a shared segment is being served
+        import shared_index
+        if os.path.exists(os.path.join(shared_index.SHARED_INDEX_DIR, shared_index.CURRENT_FILE)):
+            result["generation"] = shared_index.publish()["generation"]
+        return result
+
+    def do_enrich(self, request):
+        import generate_ai_questions
+        import generate_guide_ai_questions
+
+        kind = request.get("kind", "policy")
+        if kind == "policy":
+            module, load_index, update_index = (generate_ai_questions, generate_ai_questions.load_policy_index,
+                                                generate_ai_questions.update_policy_index)
+        elif kind == "guide":
+            module, load_index, update_index = (generate_guide_ai_questions, generate_guide_ai_questions.load_guide_index,
+                                                generate_guide_ai_questions.update_guide_index)
+        else:
+            return {"ok": False, "error": "enrich kind must be policy or guide"}
+
+        import llm_budget
+        since = module.parse_since(request["since"]) if request.get("since") else None
+        index_data = load_index()
+        try:
+            updated_index, failed_count = update_index(index_data, self.get_client(), since, bool(request.get("force")))
+        finally:
+            # Each request is its own run for the LLM_RUN_* ceilings
+            llm_budget.end_run()
+        module.save_index(updated_index)
+        return {"ok": failed_count == 0, "failed": failed_count}
+
+    def do_stop(self, request):
+        return {"reply": "stopping"}
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            response = self.server.worker.handle(request)
+        except (Exception, SystemExit) as e:
+            request = {}
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+        if request.get("command") == "stop":
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+def make_server(socket_path, port):
+    """Bind a Unix socket server, or a localhost TCP server when a port is given"""
+    if port or not hasattr(socket, "AF_UNIX"):
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", port or 8799), RequestHandler)
+        server.daemon_threads = True
+        return server, f"127.0.0.1:{server.server_address[1]}"
+
+    # Remove a stale socket left behind by a previous run
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)
+        finally:
+            probe.close()
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    server.daemon_threads = True
+    return server, socket_path
+
+def serve(socket_path, port):
+    print("Starting pipeline daemon...")
+    worker = PipelineWorker()
+    server, address = make_server(socket_path, port)
+    server.worker = worker
+    print(f"Warm-up took {worker.warmup_ms:.0f} ms; listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not port and os.path.exists(socket_path):
+            os.remove(socket_path)
+        if worker.client is not None:
+            import openai_client
+            openai_client.close()
+        print("Pipeline daemon stopped.")
+
+def send(request, socket_path, port):
+    """Send one request to the daemon and return its response"""
+    if port or not hasattr(socket, "AF_UNIX"):
+        connection = socket.create_connection(("127.0.0.1", port or 8799), timeout=CLIENT_TIMEOUT_SECONDS)
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(CLIENT_TIMEOUT_SECONDS)
+        connection.connect(socket_path)
+
+    with connection, connection.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode("utf-8"))
+        stream.flush()
+        return json.loads(stream.readline())
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Warm pipeline worker daemon and client")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket path (default: %(default)s)")
+    parser.add_argument("--port", type=int, help="Listen on / connect to 127.0.0.1:PORT instead of a Unix socket")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    subparsers.add_parser("serve", help="Run the daemon in the foreground")
+
+    send_parser = subparsers.add_parser("send", help="Send a command to a running daemon")
+    send_parser.add_argument("command", choices=COMMANDS)
+    send_parser.add_argument("--kind", choices=("policy", "guide"), help="Document kind for convert/remove/enrich")
+    send_parser.add_argument("--path", help="DOCX path for convert/remove")
+    send_parser.add_argument("--since", help="For enrich: only documents modified on or after this date")
+    send_parser.add_argument("--force", action="store_true", help="For enrich: ignore stored fingerprints")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.mode == "serve":
+        serve(args.socket, args.port)
+        return
+
+    request = {"command": args.command}
+    for field in ("kind", "path", "since"):
+        if getattr(args, field):
+            request[field] = getattr(args, field)
+    if args.force:
+        request["force"] = True
+
+    try:
+        response = send(request, args.socket, args.port)
+    except (ConnectionRefusedError, FileNotFoundError):
+        print("Error: Pipeline daemon is not running (start it with: pipeline_daemon.py serve)")
+        sys.exit(2)
+
+    print(json.dumps(response, indent=2))
+    if not response.get("ok"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Semantic query cache that answers repeated staff questions from the "Questions Answered" lists.
+
+Every question in MHA_Documents_Metadata_Index.json is embedded up front. An incoming
+query is first looked up among recently learned query -> document pairs (LRU with a TTL),
+and otherwise matched against the nearest indexed question; when the cosine similarity
+clears the threshold the mapped File is returned and the pair is learned. Anything
+below the threshold is a miss and should go through full retrieval, after which the
+caller can teach the cache the answer with learn().
+
+Embeddings come from the OpenAI embeddings endpoint and are cached in
+Question_Embeddings.json so only new questions are embedded on later runs. --local uses
+an IDF-weighted, hashed word and character n-gram embedding instead, which needs no API key.
+
+    python scripts/query_cache.py "how do I add a quick note"
+    python scripts/query_cache.py --local --interactive
+"""
+
+import re
+import sys
+import json
+import time
+import zlib
+import math
+import base64
+import argparse
+import threading
+from array import array
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import facets
+
+# Paths
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+EMBEDDINGS_FILE = "Question_Embeddings.json"
+
+# Embedding settings
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 100
+LOCAL_DIMENSIONS = 1024
+
+# Minimum cosine similarity for a semantic hit, per embedder
+SIMILARITY_THRESHOLD = 0.75
+LOCAL_SIMILARITY_THRESHOLD = 0.45
+
+# Learned query -> document pairs
+CACHE_CAPACITY = 1000
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Words ignored by the local embedder
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "if", "in", "is", "it", "my", "of", "on", "or", "should", "the", "to", "what", "when",
+    "where", "which", "who", "why", "with", "you", "your"
+}
+
+def normalise_query(query):
+    """Lower-case, collapse whitespace and drop surrounding punctuation"""
+    return re.sub(r"\s+", " ", query.lower()).strip(" ?!.,;:'\"")
+
+def unit_vector(values):
+    """Scale a vector to length 1 so dot products are cosine similarities"""
+    norm = math.sqrt(sum(v * v for v in values))
+    return [v / norm for v in values] if norm else list(values)
+
+def dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+class OpenAIEmbedder:
+    """Embeds text with the OpenAI embeddings endpoint over the shared client"""
+
+    threshold = SIMILARITY_THRESHOLD
+
+    def __init__(self, client, model=EMBEDDING_MODEL):
+        self.client = client
+        self.name = model
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            response = self.client.embeddings.create(model=self.name, input=batch)
+            vectors.extend(unit_vector(item.embedding) for item in response.data)
+        return vectors
+
+class LocalEmbedder:
+    """Offline embedding: IDF-weighted, hashed word and character trigram counts.
+
+    The IDF weights are fitted on the indexed questions, so these vectors are cheap to
+    recompute and are not written to the embedding cache.
+    """
+
+    threshold = LOCAL_SIMILARITY_THRESHOLD
+    cacheable = False
+
+    def __init__(self, dimensions=LOCAL_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"local-ngram-{dimensions}"
+        self.idf = {}
+        self.default_idf = 1.0
+
+    def _features(self, text):
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            if word in STOPWORDS:
+                continue
+            yield word
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def fit(self, texts):
+        """Weight features by how rare they are among `texts`"""
+        document_counts = {}
+        for text in texts:
+            for feature in set(self._features(text)):
+                document_counts[feature] = document_counts.get(feature, 0) + 1
+        total = len(texts)
+        self.idf = {f: math.log((1 + total) / (1 + n)) + 1 for f, n in document_counts.items()}
+        self.default_idf = math.log(1 + total) + 1
+
+    def embed(self, texts):
+        vectors = []
+        for text in texts:
+            counts = [0.0] * self.dimensions
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                weight = self.idf.get(feature, self.default_idf)
+                counts[digest % self.dimensions] += weight if digest & 0x80000000 else -weight
+            vectors.append(unit_vector(counts))
+        return vectors
+
+def encode_vector(vector):
+    return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+def decode_vector(encoded):
+    vector = array("f")
+    vector.frombytes(base64.b64decode(encoded))
+    return vector.tolist()
+
+def load_embedding_store(path, model):
+    """Load cached question embeddings for `model`, or an empty store"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            store = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if store.get("model") != model:
+        return {}
+    return store.get("vectors", {})
+
+def save_embedding_store(path, model, vectors):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"model": model, "vectors": vectors}, f, ensure_ascii=False)
+
+def load_questions(index_file):
+    """Return parallel lists of questions, their Files and their answer snippets (or None)"""
+    with open(index_file, 'r', encoding='utf-8') as f:
+        entries = json.load(f).get("MHA Documents", [])
+
+    questions, files, snippets = [], [], []
+    for entry in entries:
+        located = {s["Question"]: s for s in entry.get("Answer Snippets", [])}
+        for question in entry.get("Questions Answered", []):
+            questions.append(question)
+            files.append(entry["File"])
+            snippets.append(located.get(question))
+    return questions, files, snippets
+
+class QueryCache:
+    """Nearest-question lookup in front of full retrieval, with a learned LRU/TTL layer"""
+
+    def __init__(self, embedder, index_file=COMBINED_INDEX_FILE, embeddings_file=EMBEDDINGS_FILE,
+                 threshold=None, capacity=CACHE_CAPACITY, ttl=CACHE_TTL_SECONDS, facets_file=facets.FACETS_FILE):
+        self.embedder = embedder
+        self.threshold = embedder.threshold if threshold is None else threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.learned = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "learned_hits": 0, "semantic_hits": 0, "misses": 0,
+                      "evictions": 0, "expirations": 0}
+
+        self.questions, self.files, self.snippets = load_questions(index_file)
+        self.vectors = self._embed_questions(embeddings_file)
+        self.facets = facets.load_facet_index(facets_file)
+
+    def _embed_questions(self, embeddings_file):
+        """Embed the indexed questions, reusing cached vectors where possible"""
+        if hasattr(self.embedder, "fit"):
+            self.embedder.fit(self.questions)
+        if not getattr(self.embedder, "cacheable", True):
+            embeddings_file = None
+        store = load_embedding_store(embeddings_file, self.embedder.name) if embeddings_file else {}
+        missing = sorted({q for q in self.questions if q not in store})
+        if missing:
+            if embeddings_file:
+                print(f"Embedding {len(missing)} new questions with {self.embedder.name}...")
+            for question, vector in zip(missing, self.embedder.embed(missing)):
+                store[question] = encode_vector(vector)
+            if embeddings_file:
+                current = set(self.questions)
+                save_embedding_store(embeddings_file, self.embedder.name,
+                                     {q: v for q, v in store.items() if q in current})
+        return [decode_vector(store[q]) for q in self.questions]
+
+    def nearest(self, query):
+        """Return (score, question index) of the indexed question closest to `query`"""
+        query_vector = self.embedder.embed([query])[0]
+        best_score, best_index = -1.0, None
+        for i, vector in enumerate(self.vectors):
+            score = dot(query_vector, vector)
+            if score > best_score:
+                best_score, best_index = score, i
+        return best_score, best_index
+
+    def search(self, query, k=5, filters=None):
+        """Rank documents by their best-matching indexed question; no threshold, nothing learned.
+
+        `filters` ({facet: values}) restrict the candidates via the facet bitsets before scoring.
+        """
+        candidates = range(len(self.vectors))
+        if filters:
+            if self.facets is None:
+                raise ValueError("Facet filters need the facet bitsets; run combine_indexes.py")
+            allowed = set(self.facets.files_matching(filters))
+            candidates = [i for i in candidates if self.files[i] in allowed]
+        query_vector = self.embedder.embed([query])[0]
+        best = {}
+        for i in candidates:
+            vector = self.vectors[i]
+            score = dot(query_vector, vector)
+            if score > best.get(self.files[i], (-1.0,))[0]:
+                best[self.files[i]] = (score, i)
+        ranked = sorted(best.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [{"File": file_name, "score": round(score, 4), "question": self.questions[i]}
+                for file_name, (score, i) in ranked]
+
+    def lookup(self, query):
+        """Return a result dict for a cache hit, or None on a miss"""
+        key = normalise_query(query)
+        with self.lock:
+            self.stats["lookups"] += 1
+            learned = self.learned.get(key)
+            if learned is not None:
+                file_name, expires_at = learned
+                if expires_at > time.time():
+                    self.learned.move_to_end(key)
+                    self.stats["learned_hits"] += 1
+                    return {"File": file_name, "source": "learned"}
+                del self.learned[key]
+                self.stats["expirations"] += 1
+
+        score, index = self.nearest(query)
+        if index is None or score < self.threshold:
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+
+        with self.lock:
+            self.stats["semantic_hits"] += 1
+        self.learn(query, self.files[index])
+        result = {"File": self.files[index], "source": "semantic",
+                  "question": self.questions[index], "score": round(score, 4)}
+        # Cite the precomputed answer passage when the index has one
+        snippet = self.snippets[index]
+        if snippet:
+            result["snippet"] = {"Start": snippet["Start"], "End": snippet["End"]}
+        return result
+
+    def learn(self, query, file_name):
+        """Remember the document that answered `query`, e.g. after a full retrieval"""
+        key = normalise_query(query)
+        with self.lock:
+            self.learned[key] = (file_name, time.time() + self.ttl)
+            self.learned.move_to_end(key)
+            while len(self.learned) > self.capacity:
+                self.learned.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def hit_rate(self):
+        lookups = self.stats["lookups"]
+        hits = self.stats["learned_hits"] + self.stats["semantic_hits"]
+        return hits / lookups if lookups else 0.0
+
+    def report(self):
+        """Return the metrics as a dict"""
+        return dict(self.stats, hit_rate=round(self.hit_rate(), 4), learned_size=len(self.learned),
+                    indexed_questions=len(self.questions))
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """GET /search?q=...&k=5[&type=&prefix=&family=&audience=], /lookup?q=... and /stats as JSON"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        query = params.get("q", [""])[0]
+        cache = self.server.cache
+
+        if url.path == "/search" and query:
+            try:
+                results = cache.search(query, int(params.get("k", ["5"])[0]), facets.filters_from_params(params))
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            body = {"results": results}
+        elif url.path == "/lookup" and query:
+            body = {"result": cache.lookup(query)}
+        elif url.path == "/stats":
+            body = cache.report()
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(cache, port):
+    """Serve the cache over local HTTP until interrupted"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), SearchHandler)
+    server.daemon_threads = True
+    server.cache = cache
+    print(f"Serving /search, /lookup and /stats on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Answer staff questions from the indexed Questions Answered")
+    parser.add_argument("queries", nargs="*", help="Queries to look up")
+    parser.add_argument("--interactive", action="store_true", help="Read queries from stdin, one per line")
+    parser.add_argument("--local", action="store_true", help="Use the offline n-gram embedder instead of OpenAI")
+    parser.add_argument("--threshold", type=float, help="Minimum similarity for a hit (default depends on embedder)")
+    parser.add_argument("--index", default=COMBINED_INDEX_FILE, help="Combined index (default: %(default)s)")
+    parser.add_argument("--embeddings", default=EMBEDDINGS_FILE,
+                        help="Question embedding cache (default: %(default)s)")
+    parser.add_argument("--ttl", type=float, default=CACHE_TTL_SECONDS,
+                        help="Seconds a learned query is kept (default: %(default)s)")
+    parser.add_argument("--capacity", type=int, default=CACHE_CAPACITY,
+                        help="Maximum learned queries (default: %(default)s)")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="Serve the cache over HTTP on 127.0.0.1:PORT instead of answering queries")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.local:
+        embedder = LocalEmbedder()
+    else:
+        import openai_client
+        try:
+            embedder = OpenAIEmbedder(openai_client.get_client())
+        except Exception as e:
+            print(f"Failed to initialize OpenAI client: {e}")
+            sys.exit(1)
+
+    cache = QueryCache(embedder, args.index, args.embeddings, args.threshold, args.capacity, args.ttl)
+    print(f"Loaded {len(cache.questions)} indexed questions (threshold {cache.threshold})")
+
+    if args.serve is not None:
+        serve(cache, args.serve)
+        return
+
+    queries = sys.stdin if args.interactive else args.queries
+    for query in queries:
+        query = query.strip()
+        if not query:
+            continue
+        result = cache.lookup(query)
+        if result is None:
+            print(f"MISS  {query}")
+        elif result["source"] == "learned":
+            print(f"HIT   {query}\n      -> {result['File']} (learned)")
+        else:
+            print(f"HIT   {query}\n      -> {result['File']} ({result['score']:.2f}: {result['question']})")
+
+    print(json.dumps(cache.report(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Section-level diff between two versions of a converted policy.
+
+When a policy is re-converted, convert_to_json.py compares the new JSON with the copy
+already in VECTOR_JSON before overwriting it and records what changed in
+Policy_Section_Changes.json, keyed by the policy's JSON file:
+
+    "HR7.4 Annual Leave Holiday Arrangements Policy.json": {
+        "Generated At": "...",
+        "Previous Fingerprint": "<fingerprint of the old version>",
+        "Sections": {"added": [], "removed": [], "modified": ["policy"], "unchanged": [...]},
+        "Spans": [{"Kind": "replace", "Old Start": 812, "Old End": 1104,
+                   "New Start": 812, "New End": 1190}],
+        "Moved": [{"Old Start": 3020, "Old End": 3110, "New Start": 420, "New End": 510}]
+    }
+
+Spans are paragraph-level changes of full_text in character offsets of the old and new
+text; a paragraph that was deleted in one place and inserted unchanged in another is
+reported under Moved instead. generate_ai_questions.py uses the report to regenerate only
+the questions whose answer passages fall in a changed span.
+
+    python scripts/section_diff.py old/HR7.4.json VECTOR_JSON/HR7.4.json
+    python scripts/section_diff.py --report
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import difflib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # POSIX-only; without it the change report is updated unlocked
+    fcntl = None
+
+import content_fingerprint
+
+# Paths
+CHANGES_FILE = "Policy_Section_Changes.json"
+
+def paragraphs(text):
+    """Non-empty lines of full_text as (start, end, text)"""
+    return [(m.start(), m.end(), m.group()) for m in re.finditer(r"[^\n]+", text or "") if m.group().strip()]
+
+def diff_sections(old_sections, new_sections):
+    old_sections = old_sections if isinstance(old_sections, dict) else {}
+    new_sections = new_sections if isinstance(new_sections, dict) else {}
+    return {
+        "added": [name for name in new_sections if name not in old_sections],
+        "removed": [name for name in old_sections if name not in new_sections],
+        "modified": [name for name in new_sections if name in old_sections and new_sections[name] != old_sections[name]],
+        "unchanged": [name for name in new_sections if old_sections.get(name) == new_sections[name]],
+    }
+
+def diff_text(old_text, new_text):
+    """Return (changed spans, moved paragraphs) between two full_text versions"""
+    old_paragraphs, new_paragraphs = paragraphs(old_text), paragraphs(new_text)
+    matcher = difflib.SequenceMatcher(None, [p[2] for p in old_paragraphs], [p[2] for p in new_paragraphs],
+                                      autojunk=False)
+
+    def span(items, start, end, fallback):
+        # Empty side of an insert/delete: a zero-length span where the change happened
+        if start < end:
+            return items[start][0], items[end - 1][1]
+        position = items[start][0] if start < len(items) else fallback
+        return position, position
+
+    changes = []
+    for kind, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if kind != "equal":
+            changes.append((kind, old_start, old_end, new_start, new_end))
+
+    # Paragraphs removed from one place and inserted verbatim elsewhere have moved
+    deleted = {}
+    for kind, old_start, old_end, _new_start, _new_end in changes:
+        for i in range(old_start, old_end):
+            deleted.setdefault(old_paragraphs[i][2], []).append(i)
+    moved, moved_old, moved_new = [], set(), set()
+    for kind, _old_start, _old_end, new_start, new_end in changes:
+        for j in range(new_start, new_end):
+            candidates = deleted.get(new_paragraphs[j][2])
+            if candidates:
+                i = candidates.pop(0)
+                moved_old.add(i)
+                moved_new.add(j)
+                moved.append({"Old Start": old_paragraphs[i][0], "Old End": old_paragraphs[i][1],
+                              "New Start": new_paragraphs[j][0], "New End": new_paragraphs[j][1]})
+
+    spans = []
+    for kind, old_start, old_end, new_start, new_end in changes:
+        old_left = [i for i in range(old_start, old_end) if i not in moved_old]
+        new_left = [j for j in range(new_start, new_end) if j not in moved_new]
+        if not old_left and not new_left:
+            continue
+        old_range = span(old_paragraphs, old_left[0], old_left[-1] + 1, len(old_text or "")) if old_left \
+            else span(old_paragraphs, old_start, old_start, len(old_text or ""))
+        new_range = span(new_paragraphs, new_left[0], new_left[-1] + 1, len(new_text or "")) if new_left \
+            else span(new_paragraphs, new_start, new_start, len(new_text or ""))
+        spans.append({
+            "Kind": "replace" if old_left and new_left else ("delete" if old_left else "insert"),
+            "Old Start": old_range[0], "Old End": old_range[1],
+            "New Start": new_range[0], "New End": new_range[1]
+        })
+    return spans, moved
+
+def diff_documents(old_json, new_json):
+    """Section and full_text diff between two versions of a converted policy"""
+    spans, moved = diff_text(old_json.get("full_text", ""), new_json.get("full_text", ""))
+    return {
+        "Sections": diff_sections(old_json.get("sections"), new_json.get("sections")),
+        "Spans": spans,
+        "Moved": moved,
+    }
+
+def changed_text(document_json, changes):
+    """Text of the new version's changed spans and sections, for targeted question generation"""
+    full_text = document_json.get("full_text", "")
+    parts = [full_text[s["New Start"]:s["New End"]] for s in changes["Spans"] if s["New End"] > s["New Start"]]
+    sections = document_json.get("sections") or {}
+    for name in changes["Sections"]["added"] + changes["Sections"]["modified"]:
+        if sections.get(name) and not any(sections[name] in part or part in sections[name] for part in parts):
+            parts.append(sections[name])
+    return "\n\n".join(parts)
+
+def affected_questions(entry, changes):
+    """Indexes of the entry's questions whose stored answer passage overlaps an old changed span.
+
+    Questions without a located passage count as affected, since nothing shows they still hold.
+    """
+    located = {s["Question"]: s for s in entry.get("Answer Snippets", [])}
+    old_spans = [(s["Old Start"], s["Old End"]) for s in changes["Spans"] if s["Kind"] != "insert"]
+    affected = []
+    for i, question in enumerate(entry.get("Questions Answered", [])):
+        snippet = located.get(question)
+        if snippet is None or any(start < snippet["End"] and snippet["Start"] < end for start, end in old_spans):
+            affected.append(i)
+    return affected
+
+def load_changes(path=CHANGES_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_changes(changes, path=CHANGES_FILE):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(changes, f, indent=4, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def record_changes(output_file, new_json, path=CHANGES_FILE):
+    """Diff a freshly converted policy against the JSON it is about to replace and store the report.
+
+    Returns the report, or None when there was no previous version or nothing changed.
+    """
+    if not os.path.exists(output_file):
+        return None
+    try:
+        with open(output_file, 'r', encoding='utf-8') as f:
+            old_json = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read previous version of {output_file}: {e}")
+        return None
+
+    report = diff_documents(old_json, new_json)
+    sections = report["Sections"]
+    if not (report["Spans"] or report["Moved"] or sections["added"] or sections["removed"] or sections["modified"]):
+        return None
+
+    report = dict({"Generated At": datetime.now().isoformat(timespec="seconds"),
+                   "Previous Fingerprint": content_fingerprint.compute_fingerprint(old_json)}, **report)
+    # Work-queue workers convert in parallel, so serialise the read-modify-write of the report
+    with open(f"{path}.lock", 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        changes = load_changes(path)
+        changes[os.path.basename(output_file)] = report
+        save_changes(changes, path)
+    return report
+
+def summarise(file_name, report):
+    sections = report["Sections"]
+    lines = [file_name]
+    for label in ("added", "removed", "modified"):
+        if sections[label]:
+            lines.append(f"  sections {label}: {', '.join(sections[label])}")
+    for span in report["Spans"]:
+        lines.append(f"  {span['Kind']:<7} old [{span['Old Start']}:{span['Old End']}] -> "
+                     f"new [{span['New Start']}:{span['New End']}]")
+    for move in report["Moved"]:
+        lines.append(f"  moved   old [{move['Old Start']}:{move['Old End']}] -> "
+                     f"new [{move['New Start']}:{move['New End']}]")
+    return "\n".join(lines)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Section-level diff of converted policy versions")
+    parser.add_argument("files", nargs="*", metavar="JSON", help="Old and new converted policy JSON to compare")
+    parser.add_argument("--report", action="store_true", help=f"Summarise the recorded changes in {CHANGES_FILE}")
+    parser.add_argument("--changes", default=CHANGES_FILE, help="Change report (default: %(default)s)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.report:
+        changes = load_changes(args.changes)
+        if not changes:
+            print(f"No recorded changes in {args.changes}")
+        for file_name, report in changes.items():
+            print(summarise(file_name, report))
+        return
+
+    if len(args.files) != 2:
+        print("Error: Give the old and new JSON files, or --report")
+        sys.exit(1)
+    documents = []
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            documents.append(json.load(f))
+    print(summarise(args.files[1], diff_documents(*documents)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Publish the retrieval indexes once as a read-only memory-mapped segment shared by every
+worker process.
+
+`publish` packs the combined index into one binary file: the metadata entries (as JSON,
+decoded only for the hits returned), BM25 postings over the entry text, and, when
+Question_Embeddings.json holds OpenAI vectors for the current questions, the question
+vectors. Workers map the file read-only, so every process shares the same page-cache
+pages instead of holding its own parsed copy, and attaching costs no parsing at all.
+
+Each publish writes a new generation next to the old ones and then atomically replaces
+the CURRENT pointer:
+
+    Shared_Index/CURRENT          {"generation": 7, "file": "index.7.bin", ...}
+    Shared_Index/index.7.bin      immutable once written
+
+A reader takes one segment per request and uses only that, and re-reads CURRENT at most
+once a second, so a new build is picked up without a restart and a request never mixes
+two generations.
+
+    python scripts/shared_index.py publish
+    python scripts/shared_index.py serve --port 8800 --workers 4
+    python scripts/shared_index.py search "how do I add a quick note"
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import socket
+import struct
+import signal
+import argparse
+import threading
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+try:
+    import fcntl
+except ImportError:
+    # POSIX-only; without it concurrent publishes are not serialised
+    fcntl = None
+
+import numpy as np
+
+import facets
+import jsonl_io
+import answer_snippets
+
+# Paths
+SHARED_INDEX_DIR = "Shared_Index"
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+EMBEDDINGS_FILE = "Question_Embeddings.json"
+CURRENT_FILE = "CURRENT"
+PUBLISH_LOCK_FILE = "publish.lock"
+
+# Segment layout: magic, header length, JSON header, then 64-byte aligned sections
+MAGIC = b"MHAIDX01"
+ALIGNMENT = 64
+
+# Old generations kept on disk for readers still holding them
+KEEP_GENERATIONS = 2
+
+# How often a reader checks CURRENT for a new generation
+REFRESH_INTERVAL_SECONDS = 1.0
+
+# Entry fields that are searched
+TEXT_FIELDS = ("Document", "Description", "Questions Answered", "Keywords")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def entry_text(entry):
+    parts = []
+    for field in TEXT_FIELDS:
+        value = entry.get(field)
+        if isinstance(value, list):
+            parts.extend(str(v) for v in value)
+        elif value:
+            parts.append(str(value))
+    return "\n".join(parts)
+
+def build_postings(entries):
+    """Return (sorted terms, per-term (entry ids, BM25 weights)) over the entry text"""
+    term_counts = []
+    for entry in entries:
+        counts = {}
+        for term in answer_snippets.tokenize(entry_text(entry)):
+            counts[term] = counts.get(term, 0) + 1
+        term_counts.append(counts)
+
+    lengths = [sum(counts.values()) for counts in term_counts]
+    average_length = sum(lengths) / len(lengths) if lengths else 1.0
+    postings = {}
+    for entry_id, counts in enumerate(term_counts):
+        for term, count in counts.items():
+            postings.setdefault(term, []).append((entry_id, count))
+
+    total = len(entries)
+    terms = sorted(postings)
+    weighted = []
+    for term in terms:
+        matches = postings[term]
+        idf = math.log(1 + (total - len(matches) + 0.5) / (len(matches) + 0.5))
+        ids, weights = [], []
+        for entry_id, count in matches:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[entry_id] / (average_length or 1.0))
+            ids.append(entry_id)
+            weights.append(idf * count * (BM25_K1 + 1) / (count + norm))
+        weighted.append((ids, weights))
+    return terms, weighted
+
+def pack_strings(strings):
+    """Concatenate UTF-8 strings; returns (offsets, blob)"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded]) if encoded else []
+    return offsets, b"".join(encoded)
+
+def question_vectors(entries, embeddings_file):
+    """Return (question -> entry ids, vectors, model) from the OpenAI embedding cache, or None"""
+    import query_cache
+    store = query_cache.load_embedding_store(embeddings_file, query_cache.EMBEDDING_MODEL)
+    owners, vectors = [], []
+    for entry_id, entry in enumerate(entries):
+        for question in entry.get("Questions Answered", []):
+            if question not in store:
+                return None
+            owners.append(entry_id)
+            vectors.append(query_cache.decode_vector(store[question]))
+    if not vectors:
+        return None
+    return np.asarray(owners, dtype=np.int32), np.asarray(vectors, dtype=np.float32), query_cache.EMBEDDING_MODEL
+
+def build_sections(entries, embeddings_file):
+    """Return the named arrays/blobs of a segment and extra header fields"""
+    entry_offsets, entry_blob = pack_strings(json.dumps(e, ensure_ascii=False, separators=(",", ":")) for e in entries)
+    terms, weighted = build_postings(entries)
+    term_offsets, term_blob = pack_strings(terms)
+    posting_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    posting_offsets[1:] = np.cumsum([len(ids) for ids, _ in weighted]) if weighted else []
+
+    sections = {
+        "entry_offsets": entry_offsets,
+        "entries": entry_blob,
+        "term_offsets": term_offsets,
+        "terms": term_blob,
+        "posting_offsets": posting_offsets,
+        "posting_entries": np.asarray([i for ids, _ in weighted for i in ids], dtype=np.int32),
+        "posting_weights": np.asarray([w for _, weights in weighted for w in weights], dtype=np.float32),
+    }
+    # Facet bitsets travel with the segment so filters always match its entry order
+    _files, facet_bits = facets.build_facets(entries)
+    extra = {"entries": len(entries), "terms": len(terms), "embedding_model": None,
+             "facets": {facet: {value: hex(bits) for value, bits in values.items()}
+                        for facet, values in facet_bits.items()}}
+    vectors = question_vectors(entries, embeddings_file) if embeddings_file else None
+    if vectors:
+        sections["question_entries"], sections["question_vectors"], extra["embedding_model"] = vectors
+    return sections, extra
+
+def write_segment(path, sections, extra):
+    """Write sections to one file: magic, header length, JSON header, aligned payloads"""
+    layout = {}
+    offset = 0
+    for name, value in sections.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        if isinstance(value, bytes):
+            layout[name] = {"offset": offset, "length": len(value)}
+            offset += len(value)
+        else:
+            layout[name] = {"offset": offset, "dtype": value.dtype.str, "shape": list(value.shape)}
+            offset += value.nbytes
+
+    # Section offsets are relative to the end of the (aligned) header
+    header = json.dumps(dict(extra, sections=layout)).encode("utf-8")
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, value in sections.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(value if isinstance(value, bytes) else np.ascontiguousarray(value).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_current(directory):
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def publish(index_file=COMBINED_INDEX_FILE, directory=SHARED_INDEX_DIR, embeddings_file=EMBEDDINGS_FILE):
+    """Build a new generation from the combined index and switch CURRENT to it"""
+    entries = list(jsonl_io.read_index_entries(index_file, "MHA Documents"))
+    sections, extra = build_sections(entries, embeddings_file)
+
+    os.makedirs(directory, exist_ok=True)
+    # The daemon and manual runs may publish at once, so number, write and prune under a lock
+    with open(os.path.join(directory, PUBLISH_LOCK_FILE), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        current = read_current(directory)
+        generation = (current["generation"] + 1) if current else 1
+        file_name = f"index.{generation}.bin"
+        temp_path = os.path.join(directory, file_name + ".tmp")
+        write_segment(temp_path, sections, dict(extra, generation=generation))
+        os.replace(temp_path, os.path.join(directory, file_name))
+
+        pointer = {"generation": generation, "file": file_name,
+                   "published_at": datetime.now().isoformat(timespec="seconds"), "source": index_file}
+        pointer_path = os.path.join(directory, CURRENT_FILE)
+        with open(pointer_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+        os.replace(pointer_path + ".tmp", pointer_path)
+
+        # Readers still mapping an unlinked generation keep their pages until they let go
+        for name in os.listdir(directory):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[0] == "index" and parts[2] == "bin" and parts[1].isdigit():
+                if int(parts[1]) <= generation - KEEP_GENERATIONS:
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        pass
+    return pointer
+
+def map_segment(path):
+    """Map a file written by write_segment(); returns (mmap, header, {name: view})"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a shared index segment")
+    header_length = struct.unpack_from("<Q", buffer, len(MAGIC))[0]
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+    start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+    sections = {}
+    for name, spec in header["sections"].items():
+        if "length" in spec:
+            sections[name] = memoryview(buffer)[start + spec["offset"]:start + spec["offset"] + spec["length"]]
+        else:
+            count = int(np.prod(spec["shape"]))
+            array = np.frombuffer(buffer, dtype=spec["dtype"], count=count, offset=start + spec["offset"])
+            sections[name] = array.reshape(spec["shape"])
+    return buffer, header, sections
+
+class Segment:
+    """One immutable generation, mapped read-only; all arrays are views into the mapping"""
+
+    def __init__(self, path):
+        self.buffer, self.header, self.sections = map_segment(path)
+        self.generation = self.header["generation"]
+        self.facets = facets.FacetIndex([None] * len(self),
+                                        {facet: {value: int(bits, 16) for value, bits in values.items()}
+                                         for facet, values in self.header.get("facets", {}).items()})
+
+    def __len__(self):
+        return self.header["entries"]
+
+    def entry(self, entry_id):
+        offsets = self.sections["entry_offsets"]
+        return json.loads(bytes(self.sections["entries"][offsets[entry_id]:offsets[entry_id + 1]]))
+
+    def _term(self, i):
+        offsets = self.sections["term_offsets"]
+        return bytes(self.sections["terms"][offsets[i]:offsets[i + 1]])
+
+    def postings(self, term):
+        """Return (entry ids, weights) for a term by binary search over the sorted terms"""
+        key = term.encode("utf-8")
+        low, high = 0, self.header["terms"]
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.header["terms"] and self._term(low) == key:
+            start, end = self.sections["posting_offsets"][low:low + 2]
+            return self.sections["posting_entries"][start:end], self.sections["posting_weights"][start:end]
+        return None
+
+    def mask(self, filters):
+        """Boolean mask over the entries for facet filters, or None when there are none"""
+        if not filters:
+            return None
+        bits = self.facets.select(filters)
+        packed = np.frombuffer(bits.to_bytes((len(self) + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(packed, bitorder="little")[:len(self)].astype(bool)
+
+    def search(self, query, k=5, filters=None):
+        """BM25 over the entry text; returns [(score, entry id)] best first"""
+        allowed = self.mask(filters)
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(answer_snippets.tokenize(query)):
+            found = self.postings(term)
+            if found is None:
+                continue
+            entry_ids, weights = found
+            if allowed is not None:
+                keep = allowed[entry_ids]
+                entry_ids, weights = entry_ids[keep], weights[keep]
+            scores[entry_ids] += weights
+        return self._top(scores, k)
+
+    def nearest(self, vector, k=5, filters=None):
+        """Rank entries by their best-matching question vector"""
+        if "question_vectors" not in self.sections:
+            raise ValueError("This generation has no question vectors")
+        owners = self.sections["question_entries"]
+        vectors = self.sections["question_vectors"]
+        allowed = self.mask(filters)
+        if allowed is not None:
+            keep = allowed[owners]
+            owners, vectors = owners[keep], vectors[keep]
+        similarities = vectors @ np.asarray(vector, dtype=np.float32)
+        scores = np.full(len(self), -1.0, dtype=np.float32)
+        np.maximum.at(scores, owners, similarities)
+        return self._top(scores, k)
+
+    @staticmethod
+    def _top(scores, k):
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [(float(scores[i]), int(i)) for i in sorted(top, key=lambda i: -scores[i]) if scores[i] > 0]
+
+class SharedIndex:
+    """Attach to the current generation and follow CURRENT as new generations are published"""
+
+    def __init__(self, directory=SHARED_INDEX_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.segment = None
+        self.checked_at = 0.0
+        self.pointer_stat = None
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Switch to a newer generation if CURRENT has moved; cheap when it has not"""
+        now = time.monotonic()
+        if not force and now - self.checked_at < REFRESH_INTERVAL_SECONDS:
+            return self.segment
+        with self.lock:
+            self.checked_at = now
+            try:
+                stat = os.stat(os.path.join(self.directory, CURRENT_FILE))
+            except FileNotFoundError:
+                if self.segment is None:
+                    raise FileNotFoundError(f"No shared index in {self.directory}; run publish first")
+                return self.segment
+            key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            if key != self.pointer_stat:
+                pointer = read_current(self.directory)
+                if pointer and (self.segment is None or pointer["generation"] != self.segment.generation):
+                    try:
+                        segment = Segment(os.path.join(self.directory, pointer["file"]))
+                    except FileNotFoundError:
+                        # Publishes since CURRENT was read pruned that generation; take the newest
+                        pointer = read_current(self.directory)
+                        segment = Segment(os.path.join(self.directory, pointer["file"]))
+                    # One assignment: requests already running keep the segment they took
+                    self.segment = segment
+                self.pointer_stat = key
+        return self.segment
+
+    def current(self):
+        return self.refresh()
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """GET /search?q=...&k=5[&type=&prefix=&family=&audience=], /suggest?q=...&k=8 and /stats as JSON"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        query = params.get("q", [""])[0]
+        segment = self.server.index.current()
+        try:
+            k = int(params.get("k", ["5" if url.path == "/search" else "8"])[0])
+        except ValueError:
+            self.send_error(400, "k must be an integer")
+            return
+
+        if url.path == "/search" and query:
+            filters = facets.filters_from_params(params)
+            embedder = self.server.embedder
+            if embedder is not None and "question_vectors" in segment.sections:
+                hits = segment.nearest(embedder.embed([query])[0], k, filters)
+            else:
+                hits = segment.search(query, k, filters)
+            results = []
+            for score, entry_id in hits:
+                entry = segment.entry(entry_id)
+                results.append({"File": entry.get("File"), "Document": entry.get("Document"),
+                                "Document Type": entry.get("Document Type"), "score": round(score, 4)})
+            body = {"generation": segment.generation, "results": results}
+        elif url.path == "/suggest":
+            suggester = self.server.autocomplete()
+            if suggester is None:
+                self.send_error(404, "No autocomplete file; run combine_indexes.py")
+                return
+            body = {"suggestions": suggester.suggest(query, k)}
+        elif url.path == "/stats":
+            body = {"pid": os.getpid(), "generation": segment.generation, "entries": len(segment),
+                    "terms": segment.header["terms"], "segment_bytes": len(segment.buffer),
+                    "embedding_model": segment.header["embedding_model"]}
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class WorkerServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    suggester = None
+    suggester_stat = None
+
+    def autocomplete(self):
+        """The mapped autocomplete trie, remapped when combine_indexes.py replaces the file"""
+        import autocomplete
+        try:
+            stat = os.stat(autocomplete.AUTOCOMPLETE_FILE)
+        except FileNotFoundError:
+            return self.suggester
+        key = (stat.st_mtime_ns, stat.st_ino)
+        if key != self.suggester_stat:
+            self.suggester, self.suggester_stat = autocomplete.Autocomplete(autocomplete.AUTOCOMPLETE_FILE), key
+        return self.suggester
+
+def run_worker(listener, directory, semantic):
+    """Serve requests from an already listening socket in this process"""
+    server = WorkerServer(listener.getsockname(), SearchHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    server.index = SharedIndex(directory)
+    server.embedder = None
+    if semantic:
+        import openai_client
+        import query_cache
+        server.embedder = query_cache.OpenAIEmbedder(openai_client.get_client())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+def serve(directory, port, workers, semantic=False):
+    """Pre-fork `workers` processes that share one listening socket and one mapped index"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("127.0.0.1", port))
+    listener.listen(128)
+    print(f"Serving /search, /suggest and /stats on http://127.0.0.1:{listener.getsockname()[1]} "
+          f"with {workers} worker(s)")
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        run_worker(listener, directory, semantic)
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            run_worker(listener, directory, semantic)
+            os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    finally:
+        listener.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish and serve the memory-mapped shared index")
+    parser.add_argument("command", choices=("publish", "serve", "search", "status"))
+    parser.add_argument("query", nargs="?", help="Query text for search")
+    parser.add_argument("--dir", default=SHARED_INDEX_DIR, help="Shared index directory (default: %(default)s)")
+    parser.add_argument("--index", default=COMBINED_INDEX_FILE, help="Combined index to publish (default: %(default)s)")
+    parser.add_argument("--embeddings", default=EMBEDDINGS_FILE,
+                        help="Question embedding cache to publish vectors from (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8800, help="Port for serve (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for serve (default: %(default)s)")
+    parser.add_argument("--semantic", action="store_true",
+                        help="Serve: rank by question vectors, embedding queries with OpenAI")
+    parser.add_argument("-k", type=int, default=5, help="Results to return (default: %(default)s)")
+    for param, facet in facets.FILTER_PARAMS.items():
+        parser.add_argument(f"--{param}", action="append", help=f"Search: only {facet} value(s), comma-separated")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    if args.command == "publish":
+        if not os.path.exists(args.index):
+            print(f"Error: {args.index} not found")
+            sys.exit(1)
+        pointer = publish(args.index, args.dir, args.embeddings)
+        segment = Segment(os.path.join(args.dir, pointer["file"]))
+        vectors = "with" if "question_vectors" in segment.sections else "without"
+        print(f"Published generation {pointer['generation']} ({len(segment)} entries, "
+              f"{segment.header['terms']} terms, {vectors} question vectors, {len(segment.buffer)} bytes)")
+        return
+
+    try:
+        index = SharedIndex(args.dir)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.command == "serve":
+        serve(args.dir, args.port, args.workers, args.semantic)
+    elif args.command == "status":
+        print(json.dumps(dict(read_current(args.dir), **{k: v for k, v in index.segment.header.items()
+                                                           if k != "sections"}), indent=2))
+    else:
+        if not args.query:
+            print("Error: search needs a query")
+            sys.exit(1)
+        segment = index.current()
+        for score, entry_id in segment.search(args.query, args.k, facets.filters_from_params(vars(args))):
+            print(f"{score:.3f}  {segment.entry(entry_id)['File']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Script to sync the converted policy and guide JSON files into the OpenAI vector store.
+
+Keeps a local manifest of uploaded file IDs and content hashes, diffs it against the
+documents listed in MHA_Documents_Metadata_Index.json, and only uploads, replaces or
+deletes what changed. Uploads run with bounded concurrency and retries.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import jsonl_io
+import openai_client
+
+# Paths
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+MANIFEST_FILE = "Vector_Store_Manifest.json"
+
+# Where each document type's converted JSON lives
+SOURCE_DIRS = {
+    "Policy": "VECTOR_JSON",
+    "Guide": "VECTOR_GUIDES_JSON"
+}
+
+# Fields that change on every conversion and are ignored when hashing
+VOLATILE_FIELDS = {"extracted_date"}
+
+# Concurrency and retry settings
+MAX_WORKERS = 4
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 2.0
+
+def load_vector_store_id():
+    """Load the target vector store ID from the environment"""
+    openai_client.load_env()
+    return os.getenv("VECTOR_STORE_ID") or os.getenv("VITE_OPENAI_VECTOR_STORE_ID")
+
+def content_hash(path):
+    """Hash a converted JSON document, ignoring fields that change on every conversion"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def load_manifest(path):
+    """Load the manifest of previously uploaded files"""
+    if not os.path.exists(path):
+        return {"vector_store_id": None, "files": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest.setdefault("files", {})
+    return manifest
+
+def save_manifest(path, manifest):
+    """Atomically write the manifest"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False, sort_keys=True)
+    os.replace(temp_path, path)
+
+def collect_documents(index_file):
+    """Map each File in the combined index to its converted JSON path and content hash"""
+    documents = {}
+    for entry in jsonl_io.read_index_entries(index_file, "MHA Documents"):
+        file_name = entry.get("File")
+        source_dir = SOURCE_DIRS.get(entry.get("Document Type"))
+        if not file_name or not source_dir:
+            print(f"SKIPPING: Cannot locate source for {entry.get('Document', file_name)}")
+            continue
+        path = os.path.join(source_dir, file_name)
+        if not os.path.exists(path):
+            print(f"SKIPPING: {path} not found")
+            continue
+        documents[file_name] = {"path": path, "content_hash": content_hash(path)}
+    return documents
+
+def plan_sync(documents, manifest_files):
+    """Diff the current documents against the manifest into upload/replace/delete lists"""
+    uploads, replaces, deletes = [], [], []
+    for file_name, document in documents.items():
+        record = manifest_files.get(file_name)
+        if record is None:
+            uploads.append(file_name)
+        elif record.get("content_hash") != document["content_hash"]:
+            replaces.append(file_name)
+    for file_name in manifest_files:
+        if file_name not in documents:
+            deletes.append(file_name)
+    return uploads, replaces, deletes
+
+def with_retries(action, description):
+    """Run an API action, retrying with exponential backoff"""
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return action()
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_BASE_DELAY * (2 ** (attempt - 1))
+            print(f"  Retry {attempt}/{MAX_RETRIES - 1} for {description} in {delay:.0f}s: {e}")
+            time.sleep(delay)
+
+class VectorStoreSync:
+    """Thin wrapper over the files and vector-store file endpoints"""
+
+    def __init__(self, client, vector_store_id):
+        self.client = client
+        self.vector_store_id = vector_store_id
+        # Older SDKs expose vector stores under client.beta
+        self.vector_stores = getattr(client, "vector_stores", None) or client.beta.vector_stores
+
+    def upload(self, file_name, path):
+        """Upload a file and attach it to the vector store, returning the file ID"""
+        def create():
+            with open(path, 'rb') as f:
+                return self.client.files.create(file=(file_name, f), purpose="assistants")
+        created = with_retries(create, f"upload {file_name}")
+        try:
+            with_retries(lambda: self.vector_stores.files.create(vector_store_id=self.vector_store_id,
+                                                                 file_id=created.id),
+                         f"attach {file_name}")
+        except Exception:
+            # Nothing records an unattached file, so remove it rather than leak it
+            try:
+                self.client.files.delete(created.id)
+            except Exception as e:
+                print(f"  Warning: Could not delete unattached file {created.id} of {file_name}: {e}")
+            raise
+        return created.id
+
+    def delete(self, file_name, file_id):
+        """Detach a file from the vector store and delete the underlying file"""
+        with_retries(lambda: self.vector_stores.files.delete(file_id, vector_store_id=self.vector_store_id),
+                     f"detach {file_name}")
+        with_retries(lambda: self.client.files.delete(file_id), f"delete {file_name}")
+
+def sync(store, documents, manifest, workers=MAX_WORKERS, dry_run=False, manifest_path=None):
+    """Apply the planned changes, updating the manifest as each one completes.
+
+    With manifest_path the manifest is saved after every change, so an interrupted sync
+    still records what it uploaded and deleted.
+    """
+    files = manifest["files"]
+    uploads, replaces, deletes = plan_sync(documents, files)
+    print(f"Plan: {len(uploads)} to upload, {len(replaces)} to replace, {len(deletes)} to delete, "
+          f"{len(documents) - len(uploads) - len(replaces)} unchanged")
+
+    if dry_run:
+        for label, names in (("UPLOAD", uploads), ("REPLACE", replaces), ("DELETE", deletes)):
+            for file_name in names:
+                print(f"  {label}: {file_name}")
+        return 0
+
+    def upload_task(file_name):
+        document = documents[file_name]
+        old_record = files.get(file_name)
+        file_id = store.upload(file_name, document["path"])
+        # Replace: only remove the old copy once the new one is attached
+        if old_record:
+            try:
+                store.delete(file_name, old_record["file_id"])
+            except Exception as e:
+                print(f"  Warning: Could not remove previous copy {old_record['file_id']} of {file_name}: {e}")
+        return {"file_id": file_id, "content_hash": document["content_hash"],
+                "uploaded_at": datetime.now().isoformat(timespec="seconds")}
+
+    def delete_task(file_name):
+        store.delete(file_name, files[file_name]["file_id"])
+        return None
+
+    failures = 0
+
+    def finish(future):
+        nonlocal failures
+        file_name, action = futures.pop(future)
+        try:
+            record = future.result()
+        except Exception as e:
+            failures += 1
+            print(f"  ✗ Failed to {action} {file_name}: {e}")
+            return
+        if record is None:
+            files.pop(file_name, None)
+            print(f"  ✓ Deleted {file_name}")
+        else:
+            files[file_name] = record
+            print(f"  ✓ Uploaded {file_name} ({record['file_id']})")
+        if manifest_path:
+            save_manifest(manifest_path, manifest)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(upload_task, name): (name, "upload") for name in uploads + replaces}
+        futures.update({executor.submit(delete_task, name): (name, "delete") for name in deletes})
+        try:
+            for future in as_completed(list(futures)):
+                finish(future)
+        except BaseException:
+            # Interrupted: drop the queued changes and record the ones already running
+            for future in list(futures):
+                if future.cancel():
+                    futures.pop(future)
+            for future in as_completed(list(futures)):
+                finish(future)
+            raise
+
+    return failures
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync changed documents into the OpenAI vector store")
+    parser.add_argument("--vector-store-id", help="Target vector store (default: VECTOR_STORE_ID from the environment)")
+    parser.add_argument("--index", default=COMBINED_INDEX_FILE, help="Combined index listing the documents to sync")
+    parser.add_argument("--manifest", default=MANIFEST_FILE, help="Local manifest of uploaded files")
+    parser.add_argument("--base-url", help="Override the API base URL, e.g. a local stand-in server")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Maximum concurrent uploads")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without calling the API")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    print("Syncing documents to the vector store...")
+
+    vector_store_id = args.vector_store_id or load_vector_store_id()
+    if not vector_store_id:
+        print("Error: No vector store ID given (use --vector-store-id or set VECTOR_STORE_ID)")
+        sys.exit(1)
+
+    manifest = load_manifest(args.manifest)
+    if manifest.get("vector_store_id") not in (None, vector_store_id):
+        print(f"Manifest belongs to vector store {manifest['vector_store_id']}; starting a fresh manifest")
+        manifest = {"vector_store_id": vector_store_id, "files": {}}
+    manifest["vector_store_id"] = vector_store_id
+
+    documents = collect_documents(args.index)
+    print(f"Found {len(documents)} documents in {args.index}")
+
+    store = None
+    if not args.dry_run:
+        try:
+            client = openai_client.get_client(args.base_url).with_options(max_retries=0)
+        except Exception as e:
+            print(f"Failed to initialize OpenAI client: {e}")
+            sys.exit(1)
+        store = VectorStoreSync(client, vector_store_id)
+
+    started = time.monotonic()
+    try:
+        failures = sync(store, documents, manifest, args.workers, args.dry_run,
+                        None if args.dry_run else args.manifest)
+    finally:
+        if not args.dry_run:
+            save_manifest(args.manifest, manifest)
+    print(f"\nSync finished in {time.monotonic() - started:.1f}s with {failures} failures.")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,123 @@
 #!/usr/bin/env python3
 """
-Script to test OpenAI API connection
+Script to test OpenAI API connection and probe request latency.
+
+Sends a few small chat completions over the shared pooled client and reports
+connect, time-to-first-byte and total timings for each. The first request pays for
+the TCP and TLS handshake; later ones should reuse the warm connection.
 """
 
-import os
-import dotenv
-from openai import OpenAI
+import time
+import argparse
+
+import openai_client
+
+# Model used for the probe requests
+MODEL = "gpt-4.1-mini"
+
+class RequestTimer:
+    """Collects httpcore trace events to split a request into connect/TTFB/total"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.connect_done = None
+        self.first_byte = None
+        self.reused = True
+
+    def trace(self, event_name, info):
+        now = time.perf_counter()
+        if event_name.startswith("connection.connect_tcp"):
+            self.reused = False
+        if event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connect_done = now
+        elif event_name.endswith("receive_response_headers.complete") and self.first_byte is None:
+            self.first_byte = now
+
+    def elapsed_ms(self, moment):
+        return (moment - self.start) * 1000 if moment else None
+
+def probe(http_client, base_url, api_key):
+    """Send one small completion and return (reply, timings in ms)"""
+    timer = RequestTimer()
+    response = http_client.post(
+        f"{base_url}/chat/completions",
+        headers={"Authorization": f"Bearer {api_key}"},
+        json={
+            "model": MODEL,
+            "messages": [{"role": "user", "content": "Hello, can you hear me? Respond with a single word."}],
+            "max_tokens": 10
+        },
+        extensions={"trace": timer.trace}
+    )
+    response.raise_for_status()
+    reply = response.json()["choices"][0]["message"]["content"]
+    done = time.perf_counter()
+
+    timings = {
+        "connect": timer.elapsed_ms(timer.connect_done) if not timer.reused else 0.0,
+        "ttfb": timer.elapsed_ms(timer.first_byte),
+        "total": timer.elapsed_ms(done),
+        "reused": timer.reused,
+        "http_version": response.http_version
+    }
+    return reply, timings
 
-# Path to .env file
-ENV_FILE = "iSPOC/.env"
+def format_ms(value):
+    return f"{value:8.1f} ms" if value is not None else "     n/a"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Test the OpenAI API connection and report latency")
+    parser.add_argument("--count", type=int, default=3, help="Number of probe requests (default: %(default)s)")
+    parser.add_argument("--base-url", default=openai_client.DEFAULT_BASE_URL,
+                        help="API base URL (default: %(default)s)")
+    args = parser.parse_args()
+    if args.count < 1:
+        parser.error("--count must be at least 1")
+    return args
 
 def main():
+    args = parse_args()
     print("Testing OpenAI API connection...")
-    
-    # Load .env file
-    print(f"Loading .env file from: {ENV_FILE}")
-    dotenv.load_dotenv(ENV_FILE)
-    
-    # Get API key
-    api_key = os.getenv("VITE_OPENAI_API_KEY")
-    if not api_key:
+
+    # Load .env file and get API key
+    print(f"Loading .env file from: {openai_client.ENV_FILE}")
+    try:
+        api_key = openai_client.load_openai_key()
+    except ValueError:
         print("ERROR: No OpenAI API key found in .env file")
         return
-    
+
     # Print masked API key
     masked_key = api_key[:4] + "..." + api_key[-4:]
     print(f"Found API key: {masked_key}")
-    
+
     try:
-        # Initialize client
-        print("Initializing OpenAI client...")
-        client = OpenAI(api_key=api_key)
-        
-        # Test API with a simple completion
-        print("Testing API with a simple completion...")
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",  # Using a simpler model for testing
-            messages=[
-                {"role": "user", "content": "Hello, can you hear me? Respond with a single word."}
-            ],
-            max_tokens=10
-        )
-        
+        # Use the same pooled HTTP client as the pipeline stages
+        print("Initializing pooled HTTP client...")
+        http_client = openai_client.get_http_client()
+        print(f"HTTP/2 available: {openai_client.http2_available()}")
+
+        # Probe the API with small completions
+        print(f"Sending {args.count} probe requests...\n")
+        print(f"{'#':>3}  {'connect':>11}  {'ttfb':>11}  {'total':>11}  conn    proto")
+        totals = []
+        for i in range(args.count):
+            reply, timings = probe(http_client, args.base_url.rstrip("/"), api_key)
+            totals.append(timings["total"])
+            print(f"{i+1:>3}  {format_ms(timings['connect'])}  {format_ms(timings['ttfb'])}  "
+                  f"{format_ms(timings['total'])}  {'warm' if timings['reused'] else 'cold':<6}  {timings['http_version']}")
+
         # Print result
-        result = response.choices[0].message.content
-        print(f"Response from OpenAI: '{result}'")
+        print(f"\nResponse from OpenAI: '{reply}'")
+        if len(totals) > 1:
+            warm = totals[1:]
+            print(f"Cold request: {totals[0]:.1f} ms, warm average: {sum(warm) / len(warm):.1f} ms")
         print("API connection test SUCCESSFUL!")
-        
+
     except Exception as e:
         print(f"ERROR: {str(e)}")
-        
+    finally:
+        openai_client.close()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
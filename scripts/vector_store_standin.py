@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Local HTTP stand-in for the OpenAI files and vector-store file endpoints.
+
+Keeps everything in memory so sync_vector_store.py can be exercised without network
+access or cost:
+
+    python scripts/vector_store_standin.py --port 8765
+    python scripts/sync_vector_store.py --vector-store-id vs_local --base-url http://127.0.0.1:8765/v1
+
+Use --fail-rate to inject random 500 errors and exercise the retry path.
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# In-memory state shared by all request handlers
+STATE = {
+    "files": {},          # file_id -> file object
+    "vector_stores": {},  # vector_store_id -> {file_id: vector store file object}
+    "requests": 0,
+    "fail_rate": 0.0
+}
+LOCK = threading.Lock()
+FILE_IDS = itertools.count(1)
+
+VECTOR_STORE_FILES = re.compile(r"^/v1/vector_stores/([^/]+)/files(?:/([^/]+))?$")
+FILES = re.compile(r"^/v1/files(?:/([^/]+))?$")
+
+def multipart_filename(body, content_type):
+    """Pull the uploaded filename and size out of a multipart/form-data body"""
+    boundary = content_type.split("boundary=")[-1].strip('"').encode()
+    for part in body.split(b"--" + boundary):
+        header, _, content = part.partition(b"\r\n\r\n")
+        match = re.search(rb'name="file"; filename="([^"]*)"', header)
+        if match:
+            return match.group(1).decode("utf-8", "replace"), len(content.rstrip(b"\r\n"))
+    return "upload", 0
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def injected_failure(self):
+        with LOCK:
+            STATE["requests"] += 1
+        if random.random() < STATE["fail_rate"]:
+            self.send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return True
+        return False
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def do_POST(self):
+        body = self.read_body()
+        if self.injected_failure():
+            return
+
+        if FILES.match(self.path) and not FILES.match(self.path).group(1):
+            filename, size = multipart_filename(body, self.headers.get("Content-Type", ""))
+            file_id = f"file-local{next(FILE_IDS)}"
+            file_object = {"id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+                           "filename": filename, "purpose": "assistants", "status": "processed"}
+            with LOCK:
+                STATE["files"][file_id] = file_object
+            return self.send_json(200, file_object)
+
+        match = VECTOR_STORE_FILES.match(self.path)
+        if match and not match.group(2):
+            vector_store_id = match.group(1)
+            file_id = json.loads(body or b"{}").get("file_id")
+            with LOCK:
+                if file_id not in STATE["files"]:
+                    return self.send_json(404, {"error": {"message": f"No such file: {file_id}"}})
+                vs_file = {"id": file_id, "object": "vector_store.file", "created_at": int(time.time()),
+                           "vector_store_id": vector_store_id, "status": "completed",
+                           "usage_bytes": STATE["files"][file_id]["bytes"], "last_error": None}
+                STATE["vector_stores"].setdefault(vector_store_id, {})[file_id] = vs_file
+            return self.send_json(200, vs_file)
+
+        self.send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+    def do_DELETE(self):
+        if self.injected_failure():
+            return
+
+        match = VECTOR_STORE_FILES.match(self.path)
+        if match and match.group(2):
+            vector_store_id, file_id = match.groups()
+            with LOCK:
+                deleted = STATE["vector_stores"].get(vector_store_id, {}).pop(file_id, None) is not None
+            return self.send_json(200, {"id": file_id, "object": "vector_store.file.deleted", "deleted": deleted})
+
+        match = FILES.match(self.path)
+        if match and match.group(1):
+            file_id = match.group(1)
+            with LOCK:
+                deleted = STATE["files"].pop(file_id, None) is not None
+            return self.send_json(200, {"id": file_id, "object": "file", "deleted": deleted})
+
+        self.send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+    def do_GET(self):
+        # Summary endpoint for checking what the sync left behind
+        if self.path == "/state":
+            with LOCK:
+                summary = {
+                    "requests": STATE["requests"],
+                    "files": len(STATE["files"]),
+                    "vector_stores": {vs: sorted(f["id"] for f in files.values())
+                                      for vs, files in STATE["vector_stores"].items()}
+                }
+            return self.send_json(200, summary)
+        self.send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI files and vector-store endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests that return HTTP 500")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    STATE["fail_rate"] = args.fail_rate
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    print(f"Vector store stand-in listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping stand-in.")
+
+if __name__ == "__main__":
+    main()
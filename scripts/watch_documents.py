@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Script to watch the raw policy and guide folders and reprocess DOCX files as they change.
+
+Each touched DOCX is converted on its own with process_document and the matching entry
+in the policy or guide index is patched in place. combine_indexes then merges the change
+into the combined MHA index, its change log, facets and autocomplete trie. Bursts of
+save events for the same file are debounced into a single conversion. Uses inotify on
+Linux and falls back to polling modification times elsewhere.
+"""
+
+import os
+import sys
+import json
+import time
+import select
+import struct
+import argparse
+import ctypes
+import ctypes.util
+
+import jsonl_io
+import answer_snippets
+import dedupe_documents
+import combine_indexes
+import convert_to_json
+import convert_guides_to_json
+import build_policy_index
+import build_guide_index
+
+# Paths
+POLICY_DIR = "raw policies"
+GUIDE_DIR = "raw_guides"
+COMBINED_INDEX_FILE = "MHA_Documents_Metadata_Index.json"
+
+# Wait this long after the last event for a file before processing it
+DEBOUNCE_SECONDS = 2.0
+
+# Interval for the polling fallback
+POLL_INTERVAL_SECONDS = 1.0
+
+# inotify event masks (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+
+# How each watched folder maps onto its converter, index builder and index file
+SOURCES = {
+    "policy": {
+        "input_dir": POLICY_DIR,
+        "converter": convert_to_json,
+        "builder": build_policy_index,
+        "record": build_policy_index.PolicyRecord,
+        "index_key": "Policy Documents",
+        "document_type": "Policy",
+    },
+    "guide": {
+        "input_dir": GUIDE_DIR,
+        "converter": convert_guides_to_json,
+        "builder": build_guide_index,
+        "record": build_guide_index.GuideRecord,
+        "index_key": "Guide Documents",
+        "document_type": "Guide",
+    },
+}
+
+def is_watched_file(filename):
+    """Only react to real DOCX files, not Word lock/temp files"""
+    return filename.endswith(".docx") and not filename.startswith(("~$", "."))
+
+class InotifyWatcher:
+    """Minimal inotify binding over ctypes that yields (kind, path, deleted) tuples"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.watches = {}
+        for kind, directory in directories.items():
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self.watches[wd] = (kind, directory)
+
+    def read_events(self, timeout):
+        """Return the events available within `timeout` seconds"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+
+            if wd not in self.watches or not name:
+                continue
+            kind, directory = self.watches[wd]
+            deleted = bool(mask & (IN_DELETE | IN_MOVED_FROM))
+            events.append((kind, os.path.join(directory, name), deleted))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Fallback watcher that compares modification times on an interval"""
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for kind, directory in self.directories.items():
+            for filename in os.listdir(directory):
+                path = os.path.join(directory, filename)
+                if os.path.isfile(path):
+                    snapshot[path] = (kind, os.path.getmtime(path))
+        return snapshot
+
+    def read_events(self, timeout):
+        time.sleep(min(timeout, POLL_INTERVAL_SECONDS))
+        current = self._scan()
+        events = []
+        for path, (kind, mtime) in current.items():
+            if path not in self.snapshot or self.snapshot[path][1] != mtime:
+                events.append((kind, path, False))
+        for path, (kind, _mtime) in self.snapshot.items():
+            if path not in current:
+                events.append((kind, path, True))
+        self.snapshot = current
+        return events
+
+    def close(self):
+        pass
+
+# Parsed indexes keyed by path, reused while the file is unchanged on disk
+_index_cache = {}
+
+def load_index(path, key):
+    """Load an index file as a list of entries, reusing the parsed copy if the file is unchanged"""
+    if not os.path.exists(path):
+        return []
+    stamp = os.stat(path).st_mtime_ns
+    cached = _index_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    entries = list(jsonl_io.read_index_entries(path, key))
+    _index_cache[path] = (stamp, entries)
+    return entries
+
+# Document frequencies of each converted folder, built on first use and updated per document
+_corpus_statistics = {}
+
+def corpus_statistics(kind):
+    """IDF statistics for scoring one document against its whole converted folder"""
+    if kind not in _corpus_statistics:
+        import extractive_summary
+        output_dir = SOURCES[kind]["converter"].OUTPUT_DIR
+        _corpus_statistics[kind] = extractive_summary.CorpusStatistics(extractive_summary.corpus_documents(output_dir))
+    return _corpus_statistics[kind]
+
+def patch_index(path, key, entry=None, file_name=None):
+    """Insert or replace `entry` (or remove `file_name` if entry is None) in an index file"""
+    entries = load_index(path, key)
+    target = entry["File"] if entry is not None else file_name
+
+    position = next((i for i, item in enumerate(entries) if item.get("File") == target), None)
+    if entry is None:
+        if position is None:
+            return False
+        del entries[position]
+    elif position is None:
+        entries.append(entry)
+    else:
+        entries[position] = entry
+
+    jsonl_io.write_index_entries(path, key, entries)
+    _index_cache[path] = (os.stat(path).st_mtime_ns, entries)
+    return True
+
+def recombine():
+    """Merge the source indexes into the combined index; the merge also writes the change log,
+    facets and autocomplete trie, so they always agree with the combined index"""
+    missing = [source["builder"].OUTPUT_FILE for source in SOURCES.values()
+               if not os.path.exists(source["builder"].OUTPUT_FILE)]
+    if missing:
+        print(f"  - {', '.join(missing)} not found; combined index not updated")
+        return False
+    try:
+        combine_indexes.combine_indexes(SOURCES["guide"]["builder"].OUTPUT_FILE,
+                                        SOURCES["policy"]["builder"].OUTPUT_FILE, COMBINED_INDEX_FILE)
+    except SystemExit:
+        print(f"  ✗ Could not update {COMBINED_INDEX_FILE}")
+        return False
+    return True
+
+def reprocess_document(kind, docx_path, combine=True):
+    """Convert one DOCX, patch its source index entry and (with combine) recombine the indexes"""
+    source = SOURCES[kind]
+    converter = source["converter"]
+    builder = source["builder"]
+
+    output_file = converter.process_document(docx_path)
+    if not output_file:
+        print(f"  ✗ Failed to convert {docx_path}")
+        return False
+
+    # Leave known duplicates out of the indexes (see dedupe_documents.py)
+    duplicates = dedupe_documents.load_skip_list(kind)
+    if os.path.basename(output_file) in duplicates:
+        print(f"  - Converted duplicate {output_file}; index keeps {duplicates[os.path.basename(output_file)]}")
+        return True
+    
+    with open(output_file, 'r', encoding='utf-8') as f:
+        document_json = json.load(f)
+
+    # Rebuild the entry, keeping existing questions but refreshing title, description and snippets
+    existing_lookup = {item["File"]: item for item in load_index(builder.OUTPUT_FILE, source["index_key"])
+                       if "File" in item}
+    record = source["record"].from_json(document_json)
+    entry = builder.build_entry(os.path.basename(output_file), record, existing_lookup)
+    entry["Document"] = document_json.get("title", entry.get("Document", ""))
+    entry["Description"] = builder.generate_description(record)
+    # Extractive description and keywords as in a full index build, weighted over the whole folder
+    import extractive_summary
+    key = os.path.splitext(os.path.basename(output_file))[0]
+    summary = corpus_statistics(kind).summarise(key, extractive_summary.document_text(document_json))
+    extractive_summary.annotate(entry, {key: summary})
+    answer_snippets.attach_snippets(entry, document_json)
+
+    patch_index(builder.OUTPUT_FILE, source["index_key"], entry)
+    print(f"  ✓ Updated {output_file} and index entry {entry['File']}")
+    if combine:
+        recombine()
+    return True
+
+def remove_document(kind, docx_path, combine=True):
+    """Remove the converted JSON and source index entry for a deleted DOCX and (with combine) recombine"""
+    source = SOURCES[kind]
+    builder = source["builder"]
+    json_file = os.path.basename(docx_path).replace(".docx", ".json")
+
+    output_file = os.path.join(source["converter"].OUTPUT_DIR, json_file)
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    if kind in _corpus_statistics:
+        _corpus_statistics[kind].remove(os.path.splitext(json_file)[0])
+
+    # The policy index refers to .txt names, the guide index to .json names
+    index_file = json_file.replace(".json", ".txt") if kind == "policy" else json_file
+    patch_index(builder.OUTPUT_FILE, source["index_key"], file_name=index_file)
+    print(f"  ✓ Removed {json_file} from the {kind} index")
+    if combine:
+        recombine()
+
+def watch(directories, debounce, use_polling=False):
+    """Run the watch loop until interrupted"""
+    watcher = None
+    if not use_polling and sys.platform.startswith("linux"):
+        try:
+            watcher = InotifyWatcher(directories)
+            print("Using inotify for change notifications")
+        except (OSError, AttributeError) as e:
+            print(f"Warning: inotify unavailable ({e}), falling back to polling")
+    if watcher is None:
+        watcher = PollingWatcher(directories)
+        print(f"Polling for changes every {POLL_INTERVAL_SECONDS}s")
+
+    # path -> (kind, deleted, time of last event)
+    pending = {}
+    try:
+        while True:
+            for kind, path, deleted in watcher.read_events(timeout=debounce / 2):
+                if is_watched_file(os.path.basename(path)):
+                    pending[path] = (kind, deleted, time.monotonic())
+
+            # Process files whose events have settled
+            now = time.monotonic()
+            settled = [path for path, (_, _, seen) in pending.items() if now - seen >= debounce]
+            for path in settled:
+                kind, deleted, _ = pending.pop(path)
+                print(f"\nChange detected ({kind}): {os.path.basename(path)}")
+                try:
+                    if deleted or not os.path.exists(path):
+                        remove_document(kind, path, combine=False)
+                    else:
+                        reprocess_document(kind, path, combine=False)
+                except Exception as e:
+                    print(f"Error processing {path}: {str(e)}")
+            # One merge per batch of settled files
+            if settled:
+                recombine()
+    except KeyboardInterrupt:
+        print("\nStopping watcher.")
+    finally:
+        watcher.close()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Watch raw DOCX folders and reprocess changed documents")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                        help="Seconds to wait after the last change to a file (default: %(default)s)")
+    parser.add_argument("--poll", action="store_true",
+                        help="Poll for changes instead of using inotify")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    directories = {kind: source["input_dir"] for kind, source in SOURCES.items()
+                   if os.path.isdir(source["input_dir"])}
+    if not directories:
+        print(f"Error: neither {POLICY_DIR} nor {GUIDE_DIR} exists")
+        sys.exit(1)
+
+    for kind, directory in directories.items():
+        print(f"Watching {directory} for {kind} changes...")
+    watch(directories, args.debounce, args.poll)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+SQLite work queue for spreading conversion, enrichment and upload over many workers.
+
+A coordinator enqueues one task per document and stage; any number of worker processes,
+on this machine or on hosts that share the queue file, claim tasks under a lease:
+
+    python scripts/work_queue.py enqueue --kind all     # largest documents first
+    python scripts/work_queue.py work --workers 4
+    python scripts/work_queue.py status
+    python scripts/work_queue.py collect
+
+Stages per document:
+
+    convert  DOCX -> VECTOR_JSON / VECTOR_GUIDES_JSON with the converter's process_document
+    enrich   AI questions for the index entry (enrich_policy / enrich_guide), after convert
+    upload   the converted JSON into the vector store, after convert
+
+A claimed task is leased for LEASE_SECONDS and the worker renews the lease from a
+heartbeat thread while the task runs. When a worker dies its lease expires and the next
+claim puts the task back in the queue, until it has been tried MAX_ATTEMPTS times. Failed
+attempts are retried after RETRY_DELAY_SECONDS x attempts.
+
+Workers never rewrite the shared index or manifest files. Enrichment questions and upload
+records are stored as task results, and `collect` applies them in one pass; run
+combine_indexes.py after it.
+
+SQLite locking needs a filesystem with working POSIX locks, so hosts that share the queue
+should mount it from a local disk or an NFS export with locking enabled.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import sqlite3
+import argparse
+import threading
+
+import doc_catalog
+
+# Paths
+QUEUE_FILE = "Work_Queue.sqlite3"
+
+# Stages in dependency order; each depends on the stage named here for the same document
+STAGES = {"convert": None, "enrich": "convert", "upload": "convert"}
+
+# Lease settings
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 30
+
+# Retry settings
+MAX_ATTEMPTS = 3
+RETRY_DELAY_SECONDS = 30
+
+# How long an idle worker waits before looking for work again
+POLL_SECONDS = 2.0
+
+# Index fields an enrich task sets
+ENRICH_FIELDS = ("Questions Answered", "Questions Metadata", "Answer Snippets")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    target TEXT NOT NULL,
+    depends_on INTEGER REFERENCES tasks(id),
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    heartbeat_at REAL,
+    result TEXT,
+    error TEXT,
+    collected INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, stage, target)
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, available_at);
+"""
+
+def connect(path=QUEUE_FILE):
+    """Open the queue in autocommit mode; transactions are started explicitly"""
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA busy_timeout=30000")
+    connection.executescript(SCHEMA)
+    return connection
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def document_name(target):
+    """Converted JSON name for a DOCX target"""
+    return os.path.splitext(os.path.basename(target))[0] + ".json"
+
+def enqueue(connection, kind, docx_path, stages):
+    """Add the stage tasks for one document; finished or failed tasks are reset to pending"""
+    now = time.time()
+    task_ids = {}
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            dependency = task_ids.get(STAGES[stage])
+            connection.execute(
+                "INSERT INTO tasks (kind, stage, target, depends_on, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, stage, target) DO UPDATE SET depends_on = excluded.depends_on, "
+                "status = CASE WHEN status = 'leased' THEN status ELSE 'pending' END, "
+                "attempts = CASE WHEN status = 'leased' THEN attempts ELSE 0 END, "
+                "available_at = 0, error = NULL, collected = 0, updated_at = excluded.updated_at",
+                (kind, stage, docx_path, dependency, now))
+            task_ids[stage] = connection.execute(
+                "SELECT id FROM tasks WHERE kind = ? AND stage = ? AND target = ?",
+                (kind, stage, docx_path)).fetchone()["id"]
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return task_ids
+
+def expire_leases(connection, now):
+    """Requeue tasks whose lease ran out and fail tasks whose dependency failed"""
+    connection.execute(
+        "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+        "error = 'lease expired (worker ' || lease_owner || ' stopped responding)', "
+        "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+        "WHERE status = 'leased' AND lease_expires < ?",
+        (MAX_ATTEMPTS, now, now))
+    connection.execute(
+        "UPDATE tasks SET status = 'failed', error = 'dependency failed', updated_at = ? "
+        "WHERE status = 'pending' AND depends_on IN (SELECT id FROM tasks WHERE status = 'failed')",
+        (now,))
+
+def claim(connection, owner, stages=None):
+    """Lease the oldest runnable task to `owner`; returns the task row or None"""
+    now = time.time()
+    stage_filter = ""
+    parameters = [now]
+    if stages:
+        stage_filter = f" AND t.stage IN ({', '.join('?' * len(stages))})"
+        parameters.extend(stages)
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        expire_leases(connection, now)
+        task = connection.execute(
+            "SELECT t.* FROM tasks t LEFT JOIN tasks d ON d.id = t.depends_on "
+            "WHERE t.status = 'pending' AND t.available_at <= ? AND (d.id IS NULL OR d.status = 'done')"
+            f"{stage_filter} ORDER BY t.id LIMIT 1", parameters).fetchone()
+        if task is not None:
+            connection.execute(
+                "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                (owner, now + LEASE_SECONDS, now, now, task["id"]))
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return task
+
+def heartbeat(connection, task_id, owner):
+    """Extend a lease; returns False when the lease has been lost to expiry"""
+    now = time.time()
+    cursor = connection.execute(
+        "UPDATE tasks SET lease_expires = ?, heartbeat_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+        (now + LEASE_SECONDS, now, task_id, owner))
+    return cursor.rowcount == 1
+
+def complete(connection, task_id, owner, result):
+    cursor = connection.execute(
+        "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL, "
+        "updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+        (json.dumps(result, ensure_ascii=False), time.time(), task_id, owner))
+    return cursor.rowcount == 1
+
+def fail(connection, task_id, owner, error):
+    """Put a failed task back with a growing delay, or mark it failed after MAX_ATTEMPTS"""
+    now = time.time()
+    cursor = connection.execute(
+        "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+        "available_at = ? + ? * attempts, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+        "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+        (MAX_ATTEMPTS, now, RETRY_DELAY_SECONDS, error, now, task_id, owner))
+    return cursor.rowcount == 1
+
+def has_open_work(connection, stages=None):
+    """True while any task this worker could run is pending or leased"""
+    stage_filter, parameters = "", []
+    if stages:
+        stage_filter = f" AND stage IN ({', '.join('?' * len(stages))})"
+        parameters = list(stages)
+    row = connection.execute(
+        f"SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased'){stage_filter}", parameters).fetchone()
+    return row[0] > 0
+
+class Heartbeat(threading.Thread):
+    """Renews a task's lease every HEARTBEAT_SECONDS until stopped"""
+
+    def __init__(self, queue_path, task_id, owner):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.task_id = task_id
+        self.owner = owner
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        # SQLite connections belong to the thread that opened them
+        connection = connect(self.queue_path)
+        try:
+            while not self.stopped.wait(HEARTBEAT_SECONDS):
+                if not heartbeat(connection, self.task_id, self.owner):
+                    self.lost = True
+                    print(f"  Lease on task {self.task_id} was lost; its result will be discarded")
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+class TaskRunner:
+    """Runs task stages in one worker process, keeping the OpenAI client and modules warm"""
+
+    def __init__(self):
+        import watch_documents
+        self.sources = watch_documents.SOURCES
+        self.client = None
+        self.store = None
+
+    def get_client(self):
+        if self.client is None:
+            import openai_client
+            self.client = openai_client.get_client()
+        return self.client
+
+    def run(self, task):
+        return getattr(self, f"run_{task['stage']}")(task["kind"], task["target"])
+
+    def run_convert(self, kind, docx_path):
+        if not os.path.exists(docx_path):
+            raise RuntimeError(f"{docx_path} not found")
+        output_file = self.sources[kind]["converter"].process_document(docx_path)
+        if not output_file:
+            raise RuntimeError(f"Failed to convert {docx_path}")
+        return {"output": output_file}
+
+    def index_entry(self, kind, json_file):
+        """The document's current index entry, or a fresh one built from the converted JSON"""
+        import jsonl_io
+        source = self.sources[kind]
+        builder = source["builder"]
+        index_file = json_file.replace(".json", ".txt") if kind == "policy" else json_file
+        if os.path.exists(builder.OUTPUT_FILE):
+            for entry in jsonl_io.read_index_entries(builder.OUTPUT_FILE, source["index_key"]):
+                if entry.get("File") == index_file:
+                    return entry
+        with open(os.path.join(source["converter"].OUTPUT_DIR, json_file), 'r', encoding='utf-8') as f:
+            document_json = json.load(f)
+        return builder.build_entry(json_file, source["record"].from_json(document_json), {})
+
+    def run_enrich(self, kind, docx_path):
+        if kind == "policy":
+            from generate_ai_questions import enrich_policy as enrich
+        else:
+            from generate_guide_ai_questions import enrich_guide as enrich
+        entry = self.index_entry(kind, document_name(docx_path))
+        result = enrich(entry, self.get_client())
+        if result is False:
+            raise RuntimeError("No valid questions generated")
+        if result is None:
+            return {"File": entry.get("File"), "skipped": True}
+        return {"File": entry.get("File"), "fields": {field: entry[field] for field in ENRICH_FIELDS if field in entry}}
+
+    def run_upload(self, kind, docx_path):
+        import sync_vector_store
+        if self.store is None:
+            vector_store_id = sync_vector_store.load_vector_store_id()
+            if not vector_store_id:
+                raise RuntimeError("VECTOR_STORE_ID is not set")
+            self.store = sync_vector_store.VectorStoreSync(self.get_client(), vector_store_id)
+
+        json_file = document_name(docx_path)
+        path = os.path.join(self.sources[kind]["converter"].OUTPUT_DIR, json_file)
+        content_hash = sync_vector_store.content_hash(path)
+        manifest = sync_vector_store.load_manifest(sync_vector_store.MANIFEST_FILE)
+        old_record = manifest["files"].get(json_file)
+        if old_record and old_record.get("content_hash") == content_hash:
+            return {"File": json_file, "skipped": True}
+
+        file_id = self.store.upload(json_file, path)
+        # Replace: only remove the old copy once the new one is attached
+        if old_record:
+            try:
+                self.store.delete(json_file, old_record["file_id"])
+            except Exception as e:
+                print(f"  Warning: Could not remove previous copy {old_record['file_id']} of {json_file}: {e}")
+        return {"File": json_file, "record": {"file_id": file_id, "content_hash": content_hash,
+                                              "uploaded_at": time.strftime("%Y-%m-%dT%H:%M:%S")}}
+
+def work(queue_path=QUEUE_FILE, stages=None, keep_polling=False):
+    """Claim and run tasks until none are left (or forever with keep_polling); returns tasks completed"""
+    connection = connect(queue_path)
+    runner = TaskRunner()
+    owner = worker_id()
+    completed = 0
+    busy = False
+    while True:
+        task = claim(connection, owner, stages)
+        if task is None:
+            if not keep_polling and not has_open_work(connection, stages):
+                break
+            # A drained batch is one run for the LLM_RUN_* ceilings of a polling worker
+            if busy and "llm_budget" in sys.modules:
+                sys.modules["llm_budget"].end_run()
+            busy = False
+            time.sleep(POLL_SECONDS)
+            continue
+        busy = True
+
+        print(f"[{owner}] {task['stage']} {task['kind']}: {task['target']} (attempt {task['attempts'] + 1})")
+        beat = Heartbeat(queue_path, task["id"], owner)
+        beat.start()
+        try:
+            result = runner.run(task)
+        except Exception as e:
+            beat.stop()
+            print(f"  ✗ {task['stage']} {task['target']}: {e}")
+            fail(connection, task["id"], owner, str(e))
+            continue
+        beat.stop()
+        if not beat.lost and complete(connection, task["id"], owner, result):
+            completed += 1
+    connection.close()
+    return completed
+
+def run_workers(count, queue_path=QUEUE_FILE, stages=None, keep_polling=False):
+    """Fork `count` local worker processes and wait for them"""
+    if count <= 1 or not hasattr(os, "fork"):
+        print(f"Completed {work(queue_path, stages, keep_polling)} tasks")
+        return
+
+    children = []
+    for _ in range(count):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            completed = work(queue_path, stages, keep_polling)
+            print(f"[{worker_id()}] Completed {completed} tasks")
+            # os._exit skips atexit handlers, so print the LLM usage summary here
+            if "llm_budget" in sys.modules:
+                sys.modules["llm_budget"].print_summary()
+            os._exit(0)
+        children.append(pid)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        # Leases of interrupted tasks expire and the tasks are picked up again later
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+def collect(connection):
+    """Apply finished enrich and upload results to the indexes and manifest; returns counts"""
+    import jsonl_io
+    import watch_documents
+    import sync_vector_store
+
+    rows = connection.execute(
+        "SELECT id, kind, stage, result FROM tasks WHERE status = 'done' AND collected = 0 "
+        "AND stage IN ('enrich', 'upload') ORDER BY id").fetchall()
+    counts = {"enrich": 0, "upload": 0}
+    missing = set()
+
+    for kind, source in watch_documents.SOURCES.items():
+        results = {}
+        for row in rows:
+            result = json.loads(row["result"])
+            if row["kind"] == kind and row["stage"] == "enrich" and "fields" in result:
+                results[result["File"]] = result["fields"]
+        if not results:
+            continue
+        index_file = source["builder"].OUTPUT_FILE
+        entries = list(jsonl_io.read_index_entries(index_file, source["index_key"])) \
+            if os.path.exists(index_file) else []
+        for entry in entries:
+            if entry.get("File") in results:
+                entry.update(results.pop(entry["File"]))
+                counts["enrich"] += 1
+        if results:
+            missing.update((kind, file_name) for file_name in results)
+            print(f"Warning: {len(results)} enriched {kind} documents are not in {index_file} yet; "
+                  f"rebuild the index and collect again")
+        jsonl_io.write_index_entries(index_file, source["index_key"], entries)
+
+    uploads = [json.loads(row["result"]) for row in rows if row["stage"] == "upload"]
+    uploads = [result for result in uploads if "record" in result]
+    if uploads:
+        manifest = sync_vector_store.load_manifest(sync_vector_store.MANIFEST_FILE)
+        for result in uploads:
+            manifest["files"][result["File"]] = result["record"]
+        sync_vector_store.save_manifest(sync_vector_store.MANIFEST_FILE, manifest)
+        counts["upload"] = len(uploads)
+
+    # Enrich results whose entry was missing stay uncollected for the next run
+    collected = [row["id"] for row in rows
+                 if row["stage"] == "upload" or (row["kind"], json.loads(row["result"]).get("File")) not in missing]
+    connection.executemany("UPDATE tasks SET collected = 1 WHERE id = ?", [(i,) for i in collected])
+    return counts
+
+def status(connection):
+    now = time.time()
+    print(f"{'stage':<8} {'pending':>8} {'leased':>7} {'done':>6} {'failed':>7}")
+    for stage in STAGES:
+        counts = dict(connection.execute(
+            "SELECT status, COUNT(*) FROM tasks WHERE stage = ? GROUP BY status", (stage,)).fetchall())
+        print(f"{stage:<8} {counts.get('pending', 0):>8} {counts.get('leased', 0):>7} "
+              f"{counts.get('done', 0):>6} {counts.get('failed', 0):>7}")
+    for row in connection.execute("SELECT * FROM tasks WHERE status = 'leased' ORDER BY id"):
+        state = "EXPIRED" if row["lease_expires"] < now else f"{row['lease_expires'] - now:.0f}s left"
+        print(f"  leased  {row['stage']} {row['target']} by {row['lease_owner']} ({state})")
+    for row in connection.execute("SELECT * FROM tasks WHERE status = 'failed' ORDER BY id"):
+        print(f"  failed  {row['stage']} {row['target']} after {row['attempts']} attempts: {row['error']}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distributed conversion, enrichment and upload work queue")
+    parser.add_argument("command", choices=("enqueue", "work", "status", "collect", "retry"))
+    parser.add_argument("--queue", default=QUEUE_FILE, help="Queue database (default: %(default)s)")
+    parser.add_argument("--kind", choices=("policy", "guide", "all"), default="all",
+                        help="Documents to enqueue (default: %(default)s)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help="Comma-separated stages to enqueue or work on (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1, help="Local worker processes for work (default: %(default)s)")
+    parser.add_argument("--keep-polling", action="store_true",
+                        help="Keep waiting for new tasks instead of exiting when the queue is empty")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        print(f"Error: Unknown stages: {', '.join(unknown)} (expected {', '.join(STAGES)})")
+        sys.exit(1)
+
+    if args.command == "work":
+        run_workers(args.workers, args.queue, stages, args.keep_polling)
+        return
+
+    connection = connect(args.queue)
+    if args.command == "enqueue":
+        import watch_documents
+        kinds = list(watch_documents.SOURCES) if args.kind == "all" else [args.kind]
+        directories = {}
+        for kind in kinds:
+            input_dir = watch_documents.SOURCES[kind]["input_dir"]
+            if not os.path.isdir(input_dir):
+                print(f"SKIPPING: {input_dir} not found")
+                continue
+            directories[kind] = input_dir
+        # Largest documents first, so the long conversions start early and workers finish together
+        catalog = doc_catalog.scan(directories, doc_catalog.load_catalog())
+        count = 0
+        for path in doc_catalog.largest_first(catalog, catalog):
+            enqueue(connection, catalog[path]["kind"], path, stages)
+            count += 1
+        print(f"Enqueued {', '.join(stages)} for {count} documents in {args.queue}")
+    elif args.command == "status":
+        status(connection)
+    elif args.command == "collect":
+        counts = collect(connection)
+        print(f"Applied {counts['enrich']} enrichment results and {counts['upload']} upload records")
+    elif args.command == "retry":
+        cursor = connection.execute(
+            "UPDATE tasks SET status = 'pending', attempts = 0, available_at = 0, error = NULL, updated_at = ? "
+            "WHERE status = 'failed'", (time.time(),))
+        print(f"Requeued {cursor.rowcount} failed tasks")
+    connection.close()
+
+if __name__ == "__main__":
+    main()